@@ -1,20 +1,55 @@
 import os
+import math
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk, messagebox, Scale, filedialog
 from tkinter import messagebox, filedialog
 import pywinstyles
 import json
+import time
 import threading
-import sounddevice as sd
-import soundfile as sf
-import numpy as np
-import requests
-import re
-from urllib.parse import quote
+import queue
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from audio_engine import SoundDevice, MixerEngine, SAMPLE_FORMATS, DEFAULT_SAMPLE_FORMAT, take_level
+from pcm_cache import PCMCache, DEFAULT_CACHE_MB
+from library import LibraryIndex, TrackSearch
+from lyrics_index import LyricsIndex
+from library_watcher import LibraryWatcher
+from waveform import load_pyramid, combined_envelope, envelope_points
+from chord_sheet import SheetCache, insert_args
+from lrc import LRC_FILE, SyncedLyrics, format_timestamp, has_timestamps, leading_tags
+from genius import (GeniusClient, LyricsNotFound, LyricsCache, TokenBucket,
+                    BulkLyricsFetch, parse_song_info)
 
 SETTINGS_FILE = "settings.json"
 DEFAULT_AUDIO_DIR = "audio"
+SEARCH_PLACEHOLDER = "Search..."
+# Milliseconds to wait after the last keystroke before searching
+SEARCH_DEBOUNCE_MS = 150
+# How often the Tk thread picks up song folder changes found by the library watcher
+WATCH_POLL_MS = 500
+WAVEFORM_HEIGHT = 60
+STEM_WAVEFORM_WIDTH = 120
+STEM_WAVEFORM_HEIGHT = 18
+WAVEFORM_COLOR = "#3b8ed0"
+# UI tick interval (ms): while playing, while only auto-scroll/diagnostics need it,
+# and while the window is minimized
+TICK_MS = 50
+IDLE_TICK_MS = 250
+HIDDEN_TICK_MS = 1000
+DIAGNOSTICS_INTERVAL = 0.5
+# Share of the lyrics scrolled per second at full auto-scroll speed
+AUTO_SCROLL_RATE = 1 / 600
+# Level meters: bar sizes, and the level (dB) drawn as an empty bar
+STEM_METER_WIDTH = 60
+STEM_METER_HEIGHT = 10
+MASTER_METER_WIDTH = 100
+MASTER_METER_HEIGHT = 14
+METER_FLOOR_DB = -60.0
+METER_COLOR = "#2fa84f"
+METER_PEAK_COLOR = "#e0c040"
+METER_CLIP_COLOR = "#e04040"
 styles = ["Choose Style", "dark", "mica", "aero", "transparent", "acrylic", "win7",
           "inverse", "popup", "native", "optimised", "light"]
 
@@ -29,193 +64,43 @@ class TaggedCTkTextbox(ctk.CTkTextbox):
             super().insert(index, text)
 
 
-class SoundDevice:
-    def __init__(self, file_path):
-        self.file_path = file_path
-        self.data, self.samplerate = sf.read(file_path, always_2d=True)
-        self.playing = False
-        self.paused = False
-        self.volume = 1.0
-        self.stream = None
-        self.position = 0
-        self.thread = None
-        # Total duration in seconds
-        self.duration = len(self.data) / self.samplerate
-        # For effects
-        self.reverb_amount = 0.0
-        self.delay_amount = 0.0
-        self.eq_low = 1.0
-        self.eq_mid = 1.0
-        self.eq_high = 1.0
-        self.effects_enabled = True  # Default to off
-        self.eq_enabled = True       # Default to off
-
-    def play(self):
-        if self.paused:
-            self.paused = False
-            self.playing = True
-            return
-
-        if self.playing:
-            return
-
-        self.playing = True
-        self.thread = threading.Thread(target=self._play_audio)
-        self.thread.daemon = True
-        self.thread.start()
-
-    # Add this new method for seeking
-
-    def seek(self, position_percent):
-        """Seek to a position in the audio file based on percentage (0.0-1.0)"""
-        if position_percent < 0.0:
-            position_percent = 0.0
-        elif position_percent > 1.0:
-            position_percent = 1.0
-
-        # Convert percentage to frames
-        new_position = int(len(self.data) * position_percent)
-        self.position = new_position
-
-    # Add this method to get current position in seconds
-    def get_position_seconds(self):
-        """Get current playback position in seconds"""
-        return self.position / self.samplerate
-
-    # Add this method to get duration in seconds
-    def get_duration_seconds(self):
-        """Get total duration in seconds"""
-        return self.duration
-
-    # Add this method to format time as MM:SS
-    def format_time(self, seconds):
-        """Format seconds as MM:SS"""
-        minutes = int(seconds // 60)
-        seconds = int(seconds % 60)
-        return f"{minutes:02d}:{seconds:02d}"
-
-    # Update the _play_audio method to apply effects
-    def _play_audio(self):
-        chunk_size = 2048  # You can adjust this for performance
-        # At initialization, pre-allocate buffers
-        self.reverb_buffer = np.zeros_like(self.data[:chunk_size])
-        self.delay_buffer = np.zeros_like(self.data[:chunk_size])
-
-        def callback(outdata, frames, time, status):
-            if self.paused:
-                outdata.fill(0)
-                return
-
-            if self.position >= len(self.data):
-                self.playing = False
-                self.position = 0
-                raise sd.CallbackStop
-
-            end_pos = min(self.position + frames, len(self.data))
-            current_chunk = self.data[self.position:end_pos]
-
-            # Apply effects if enabled
-            if self.effects_enabled:
-                # Simple reverb effect (very basic)
-                if self.reverb_amount > 0:
-                    # 100ms reverb tail
-                    reverb_frames = int(0.1 * self.samplerate)
-                    if self.position > reverb_frames:
-                        reverb_pos = self.position - reverb_frames
-                        reverb_end = min(reverb_pos + frames, len(self.data))
-                        reverb_chunk = self.data[reverb_pos:reverb_end]
-
-                        if len(reverb_chunk) == len(current_chunk):
-                            current_chunk = current_chunk + \
-                                (reverb_chunk * self.reverb_amount)
-
-                # Simple delay effect
-                if self.delay_amount > 0:
-                    delay_frames = int(0.3 * self.samplerate)  # 300ms delay
-                    if self.position > delay_frames:
-                        delay_pos = self.position - delay_frames
-                        delay_end = min(delay_pos + frames, len(self.data))
-                        delay_chunk = self.data[delay_pos:delay_end]
-
-                        if len(delay_chunk) == len(current_chunk):
-                            current_chunk = current_chunk + \
-                                (delay_chunk * self.delay_amount)
-
-            # Apply EQ if enabled
-            if self.eq_enabled:
-                if self.eq_low != 1.0 or self.eq_mid != 1.0 or self.eq_high != 1.0:
-                    if current_chunk.shape[1] >= 2:  # Stereo
-                        current_chunk[:, 0] *= self.eq_low
-                        current_chunk[:, 1] *= self.eq_high
-                    current_chunk *= self.eq_mid
-
-            # Pad if we're at the end of the file
-            if len(current_chunk) < frames:
-                outdata[:len(current_chunk)] = current_chunk * self.volume
-                outdata[len(current_chunk):].fill(0)
-                self.playing = False
-                self.position = 0
-                raise sd.CallbackStop
-            else:
-                outdata[:] = current_chunk * self.volume
-                self.position += frames
-
-        try:
-            stream = sd.OutputStream(
-                samplerate=self.samplerate,
-                blocksize=chunk_size,
-                channels=self.data.shape[1],
-                callback=callback
-            )
-            stream.start()
-
-            # Use an Event to wait instead of polling
-            finished = threading.Event()
-            while self.playing and not finished.is_set():
-                finished.wait(0.1)  # More efficient waiting
-
-            stream.stop()
-            stream.close()
-        except Exception as e:
-            print(f"Audio playback error: {e}")
-            self.playing = False
-            self.position = 0
+class LevelMeter(tk.Canvas):
+    """Horizontal RMS bar with a peak marker, on a dB scale.
 
-    def pause(self):
-        self.paused = True
+    The items are moved rather than redrawn, and only when a bar moves a pixel.
+    """
 
-    def unpause(self):
-        self.paused = False
+    def __init__(self, master, width, height):
+        super().__init__(master, width=width, height=height, bg="#1d1e1e", highlightthickness=0)
+        self.meter_width = width
+        self.meter_height = height
+        self.rms_bar = self.create_rectangle(0, 0, 0, height, fill=METER_COLOR, width=0)
+        self.peak_marker = self.create_line(-1, 0, -1, height, fill=METER_PEAK_COLOR, width=2)
+        self.shown = (0, 0, False)
 
-    def stop(self):
-        self.playing = False
-        self.paused = False
-        self.position = 0
+    def level_x(self, level):
+        if level <= 0:
+            return 0
+        fraction = 1.0 - 20 * math.log10(level) / METER_FLOOR_DB
+        return round(max(0.0, min(1.0, fraction)) * self.meter_width)
 
-    def set_volume(self, volume):
-        self.volume = float(volume)
-
-    def get_volume(self):
-        return self.volume
-
-    # Add methods for effects
-    def set_reverb(self, amount):
-        """Set reverb amount (0.0 - 1.0)"""
-        self.reverb_amount = max(0.0, min(1.0, amount))
-
-    def set_delay(self, amount):
-        """Set delay amount (0.0 - 1.0)"""
-        self.delay_amount = max(0.0, min(1.0, amount))
+    def show(self, peak, rms):
+        shown = (self.level_x(rms), self.level_x(peak), peak >= 1.0)
+        if shown == self.shown:
+            return
+        rms_x, peak_x, clipped = shown
+        self.coords(self.rms_bar, 0, 0, rms_x, self.meter_height)
+        # A silent peak sits just off the left edge
+        self.coords(self.peak_marker, peak_x - 1, 0, peak_x - 1, self.meter_height)
+        if clipped != self.shown[2]:
+            self.itemconfigure(self.peak_marker, fill=METER_CLIP_COLOR if clipped else METER_PEAK_COLOR)
+        self.shown = shown
 
-    def set_eq(self, low=None, mid=None, high=None):
-        """Set EQ bands (0.0 - 2.0 for each band)"""
-        if low is not None:
-            self.eq_low = max(0.0, min(2.0, low))
-        if mid is not None:
-            self.eq_mid = max(0.0, min(2.0, mid))
-        if high is not None:
-            self.eq_high = max(0.0, min(2.0, high))
 
+def close_loaded_stem(future):
+    """Done-callback for decodes nobody is waiting for any more"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
 
 
 class AudioMixerApp(ctk.CTk):
@@ -226,6 +111,33 @@ class AudioMixerApp(ctk.CTk):
         self.title("Audio Mixer")
         self.audio_files = []
         self.audio_controls = {}
+        self.engine = MixerEngine()
+        # Stems are decoded in parallel; results come back to the Tk thread via load_queue
+        self.load_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+        self.load_queue = queue.Queue()
+        self.load_generation = 0
+        self.load_futures = set()  # Decodes of the current song not yet taken off load_queue
+        self.pending_stems = 0
+        self.load_errors = []
+        # Song folders are read from a persistent index; rescans run on load_executor
+        self.library = LibraryIndex()
+        self.library_scan = None
+        # Every song keeps one Treeview row; searching only detaches and reattaches rows
+        self.track_items = {}
+        self.track_search = TrackSearch()
+        self.search_timer = None
+        # Full-text index over lyrics.txt/chords.txt, kept in step with the library index
+        self.lyrics_index = LyricsIndex()
+        self.lyrics_results_lines = {}
+        # Picks up songs added, removed or edited outside the app
+        self.library_watcher = LibraryWatcher(self.library, self.lyrics_index)
+        # Setlist: the song after the current one is decoded ahead and queued in the engine
+        self.setlist = []
+        self.setlist_index = None
+        self.setlist_crossfade = 0.0
+        self.preload_generation = 0
+        self.preloaded = None
+        self.song_serial = 0
         self.is_paused = False
         self.genius_api_key = ""
         self.current_theme = tk.StringVar(value="Choose Style")
@@ -234,13 +146,27 @@ class AudioMixerApp(ctk.CTk):
         
         self.auto_scroll_active = False
         self.current_file = "lyrics.txt"  # Default file type
+        self.sheet_cache = SheetCache()  # Parsed lyrics/chords files, reused until they change
+        # Time-tagged lines of the shown text; ui_tick highlights the one being sung
+        self.synced_lyrics = None
+        self.synced_index = -1
 
         self.effects_enabled = True  # Default to off
         self.eq_enabled = True       # Default to off
+        self.stream_from_disk = False  # Decode stems on demand instead of into RAM
+        self.cache_max_mb = DEFAULT_CACHE_MB  # Size limit of the decoded-PCM cache
+        self.sample_format = DEFAULT_SAMPLE_FORMAT  # Stem storage precision
 
         # Genius API configuration - you'll need to update these values with your actual API key
         self.genius_api_key = ""  # Will store in settings
         self.genius_api_url = "https://api.genius.com"
+        # Lyrics are fetched on their own workers so a slow network never waits behind decoding
+        self.fetch_executor = ThreadPoolExecutor(max_workers=4)
+        self.genius = None
+        self.lyrics_fetch = None  # Cancel event of the fetch in progress
+        self.lyrics_cache = LyricsCache()
+        self.genius_rate_limit = TokenBucket()
+        self.bulk_fetch = None
 
 
 
@@ -269,6 +195,7 @@ class AudioMixerApp(ctk.CTk):
 
         self.load_settings()
         self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.pcm_cache = PCMCache(max_mb=self.cache_max_mb)
 
         self.dir_frame = ctk.CTkFrame(self.left_frame)
         self.dir_frame.pack(fill="x", pady=5)
@@ -279,6 +206,21 @@ class AudioMixerApp(ctk.CTk):
         self.select_dir_button = ctk.CTkButton(self.dir_frame, text="Select Directory", command=self.select_directory)
         self.select_dir_button.pack(side="right", padx=5)
 
+        self.stream_toggle = ctk.CTkCheckBox(self.dir_frame, text="Stream from disk",
+                                             command=self.toggle_streaming)
+        if self.stream_from_disk:
+            self.stream_toggle.select()
+        self.stream_toggle.pack(side="right", padx=5)
+
+        self.purge_cache_button = ctk.CTkButton(self.dir_frame, width=30, text="Purge Cache",
+                                                command=self.purge_cache)
+        self.purge_cache_button.pack(side="right", padx=5)
+
+        self.sample_format_menu = ctk.CTkOptionMenu(self.dir_frame, width=80, values=list(SAMPLE_FORMATS),
+                                                    command=self.set_sample_format)
+        self.sample_format_menu.set(self.sample_format)
+        self.sample_format_menu.pack(side="right", padx=5)
+
         self.controls_frame = ctk.CTkFrame(self.left_frame)
         self.controls_frame.pack(fill="x", pady=5)
 
@@ -290,6 +232,33 @@ class AudioMixerApp(ctk.CTk):
         self.master_pause_button.pack(side="left", padx=5)
         self.master_stop_button.pack(side="left", padx=5)
 
+        # Shown only while a song's stems are being decoded
+        self.load_progress = ctk.CTkProgressBar(self.controls_frame, width=120)
+        self.load_progress.set(0)
+        self.load_status_label = ctk.CTkLabel(self.controls_frame, text="")
+
+        self.diagnostics_toggle = ctk.CTkCheckBox(self.controls_frame, text="Diagnostics",
+                                                  command=self.toggle_diagnostics)
+        self.diagnostics_toggle.pack(side="right", padx=5)
+
+        # Audio callback health, shown below the seekbar while Diagnostics is checked
+        self.diagnostics_frame = ctk.CTkFrame(self.left_frame)
+        self.diagnostics_label = ctk.CTkLabel(self.diagnostics_frame, text="", anchor="w",
+                                              font=("Courier", 12))
+        self.diagnostics_label.pack(side="left", fill="x", expand=True, padx=5)
+        self.diagnostics_reset_button = ctk.CTkButton(self.diagnostics_frame, width=30, text="Reset",
+                                                      command=self.engine.reset_diagnostics)
+        self.diagnostics_reset_button.pack(side="right", padx=5)
+
+
+        # Overview of the whole song, drawn from the stems' peak pyramids; click to seek
+        self.waveform_canvas = tk.Canvas(self.left_frame, height=WAVEFORM_HEIGHT, bg="#1d1e1e",
+                                         highlightthickness=0)
+        self.waveform_canvas.pack(fill=tk.X, padx=5, pady=(5, 0))
+        self.waveform_canvas.bind("<Configure>", self.schedule_waveform_redraw)
+        self.waveform_canvas.bind("<Button-1>", self.seek_from_waveform)
+        self.stem_peaks = {}  # SoundDevice -> PeakPyramid
+        self.waveform_redraw_timer = None
 
         self.master_seekbar_frame = ctk.CTkFrame(self.left_frame)
         self.master_seekbar_frame.pack(fill=tk.X, pady=5)
@@ -303,7 +272,23 @@ class AudioMixerApp(ctk.CTk):
         self.total_time_label = ctk.CTkLabel(self.master_seekbar_frame, text="00:00")
         self.total_time_label.pack(side=tk.RIGHT, padx=5)
 
-        self.update_timer = None
+        # While paused, dragging the seekbar plays short grains so you can hear where you are
+        self.scrub_toggle = ctk.CTkCheckBox(self.master_seekbar_frame, text="Scrub", width=60)
+        self.scrub_toggle.pack(side=tk.RIGHT, padx=5)
+
+        # Output level, metered in the audio callback
+        self.master_level = LevelMeter(self.master_seekbar_frame, MASTER_METER_WIDTH, MASTER_METER_HEIGHT)
+        self.master_level.pack(side=tk.RIGHT, padx=5)
+        self.meters_lit = False
+
+        # One timer drives every periodic display update; see ui_tick
+        self.tick_timer = None
+        self.last_tick = time.monotonic()
+        self.next_diagnostics = 0.0
+        self.shown_times = (None, None)
+        self.shown_playhead = None
+        self.scroll_position = 0.0
+        self.bind("<Map>", self.on_map)
 
 
 
@@ -330,6 +315,57 @@ class AudioMixerApp(ctk.CTk):
                                            command=self.set_delay_all) #ctk slider
         self.delay_slider.pack(side=ctk.LEFT, fill=ctk.X, padx=5)
 
+        self.reverb_params_frame = ctk.CTkFrame(self.effects_frame) #ctk frame
+        self.reverb_params_frame.pack(fill=ctk.X, pady=2)
+
+        self.room_size_label = ctk.CTkLabel(self.reverb_params_frame, text="Room:") #ctk label
+        self.room_size_label.pack(side=ctk.LEFT, padx=5)
+
+        self.room_size_slider = ctk.CTkSlider(self.reverb_params_frame, from_=0, to=1, width=80, orientation="horizontal",
+                                              command=self.set_room_size) #ctk slider
+        self.room_size_slider.set(0.5)  # Default value
+        self.room_size_slider.pack(side=ctk.LEFT, padx=5)
+
+        self.damping_label = ctk.CTkLabel(self.reverb_params_frame, text="Damping:") #ctk label
+        self.damping_label.pack(side=ctk.LEFT, padx=5)
+
+        self.damping_slider = ctk.CTkSlider(self.reverb_params_frame, from_=0, to=1, width=80, orientation="horizontal",
+                                            command=self.set_damping) #ctk slider
+        self.damping_slider.set(0.5)  # Default value
+        self.damping_slider.pack(side=ctk.LEFT, padx=5)
+
+        self.delay_params_frame = ctk.CTkFrame(self.effects_frame) #ctk frame
+        self.delay_params_frame.pack(fill=ctk.X, pady=2)
+
+        self.delay_time_label = ctk.CTkLabel(self.delay_params_frame, text="Time: 300 ms") #ctk label
+        self.delay_time_label.pack(side=ctk.LEFT, padx=5)
+
+        self.delay_time_slider = ctk.CTkSlider(self.delay_params_frame, from_=20, to=2000, width=80, orientation="horizontal",
+                                               command=self.set_delay_time) #ctk slider
+        self.delay_time_slider.set(300)  # Default value
+        self.delay_time_slider.pack(side=ctk.LEFT, padx=5)
+
+        # Typing a tempo and pressing Enter syncs the delay to one beat
+        self.bpm_entry = ctk.CTkEntry(self.delay_params_frame, width=50, placeholder_text="BPM") #ctk Entry
+        self.bpm_entry.pack(side=ctk.LEFT, padx=5)
+        self.bpm_entry.bind("<Return>", self.sync_delay_to_bpm)
+
+        self.feedback_label = ctk.CTkLabel(self.delay_params_frame, text="Feedback:") #ctk label
+        self.feedback_label.pack(side=ctk.LEFT, padx=5)
+
+        self.feedback_slider = ctk.CTkSlider(self.delay_params_frame, from_=0, to=0.95, width=80, orientation="horizontal",
+                                             command=self.set_delay_feedback) #ctk slider
+        self.feedback_slider.set(0.35)  # Default value
+        self.feedback_slider.pack(side=ctk.LEFT, padx=5)
+
+        self.delay_wet_label = ctk.CTkLabel(self.delay_params_frame, text="Wet:") #ctk label
+        self.delay_wet_label.pack(side=ctk.LEFT, padx=5)
+
+        self.delay_wet_slider = ctk.CTkSlider(self.delay_params_frame, from_=0, to=1, width=80, orientation="horizontal",
+                                              command=self.set_delay_wet) #ctk slider
+        self.delay_wet_slider.set(1.0)  # Default value
+        self.delay_wet_slider.pack(side=ctk.LEFT, padx=5)
+
         self.eq_frame = ctk.CTkFrame(self.effects_frame) #ctk frame
         self.eq_frame.pack(fill=ctk.X, pady=2)
 
@@ -363,6 +399,7 @@ class AudioMixerApp(ctk.CTk):
 
         self.eq_toggle = ctk.CTkCheckBox(self.effects_frame, text="Enable EQ",
                                             command=self.toggle_eq) #ctk checkbutton
+        self.eq_toggle.select()  # EQ starts enabled
         self.eq_toggle.pack(side=ctk.LEFT, padx=5)
 
         self.stem_controls_frame = ctk.CTkFrame(self.left_frame, height=160)  # Set a fixed height (in pixels) #ctk frame
@@ -370,19 +407,64 @@ class AudioMixerApp(ctk.CTk):
         # Important! Prevents the frame from shrinking
         self.stem_controls_frame.pack_propagate(False)
 
+        # Setlist
+        self.setlist_frame = ctk.CTkFrame(self.left_frame)
+        self.setlist_frame.pack(fill=ctk.X, pady=5)
+
+        self.setlist_box = tk.Listbox(self.setlist_frame, height=4, activestyle="none")
+        self.setlist_box.pack(side=ctk.LEFT, expand=True, fill=ctk.X, padx=5)
+        self.setlist_box.bind("<Double-1>", self.start_setlist)
+        for song_name in self.setlist:
+            self.setlist_box.insert(tk.END, song_name)
+
+        self.setlist_buttons = ctk.CTkFrame(self.setlist_frame)
+        self.setlist_buttons.pack(side=ctk.LEFT, padx=5)
+
+        self.setlist_add_button = ctk.CTkButton(self.setlist_buttons, text="Add to Setlist", width=100,
+                                                command=self.add_to_setlist)
+        self.setlist_add_button.pack(pady=1)
+        self.setlist_remove_button = ctk.CTkButton(self.setlist_buttons, text="Remove", width=100,
+                                                   command=self.remove_from_setlist)
+        self.setlist_remove_button.pack(pady=1)
+        self.setlist_clear_button = ctk.CTkButton(self.setlist_buttons, text="Clear", width=100,
+                                                  command=self.clear_setlist)
+        self.setlist_clear_button.pack(pady=1)
+
+        self.crossfade_label = ctk.CTkLabel(self.setlist_buttons, text=f"Crossfade: {self.setlist_crossfade:.1f}s")
+        self.crossfade_label.pack()
+        self.crossfade_slider = ctk.CTkSlider(self.setlist_buttons, from_=0, to=10, width=100,
+                                              command=self.set_setlist_crossfade)
+        self.crossfade_slider.set(self.setlist_crossfade)
+        self.crossfade_slider.pack(pady=1)
+
         # Search Bar
         self.search_frame = ctk.CTkFrame(self.left_frame) #ctk frame
         self.search_frame.pack(fill=ctk.X, pady=5)
 
         self.search_entry = ctk.CTkEntry(self.search_frame) #ctk Entry
         self.search_entry.pack(side=ctk.LEFT, expand=True, fill=ctk.X, padx=5)
-        self.search_entry.insert(0, "Search...")  # Placeholder text
+        self.search_entry.insert(0, SEARCH_PLACEHOLDER)  # Placeholder text
         self.search_entry.bind("<KeyRelease>", self.search_tracks)
 
         self.clear_search_button = ctk.CTkButton(
             self.search_frame, text="X", command=self.clear_search) #ctk button
         self.clear_search_button.pack(side=ctk.RIGHT, padx=5)
 
+        self.lyrics_search_toggle = ctk.CTkCheckBox(self.search_frame, text="Lyrics",
+                                                    command=self.toggle_lyrics_search)
+        self.lyrics_search_toggle.pack(side=ctk.RIGHT, padx=5)
+
+        # Lines matched by a lyrics search, shown above the track list while searching lyrics
+        self.lyrics_results = ttk.Treeview(self.left_frame, columns=(
+            "Song", "File", "Line"), show="headings", height=6)
+        self.lyrics_results.heading("Song", text="Song")
+        self.lyrics_results.heading("File", text="File")
+        self.lyrics_results.heading("Line", text="Line")
+        self.lyrics_results.column("Song", width=150)
+        self.lyrics_results.column("File", width=70, anchor="center")
+        self.lyrics_results.column("Line", width=250)
+        self.lyrics_results.bind("<Double-Button-1>", self.open_lyrics_result)
+
         # Create a Treeview with three columns: Track Name, Lyrics, Chords
         self.track_list = ttk.Treeview(self.left_frame, columns=(
             "Track", "Lyrics", "Chords"), show="headings", height=10)
@@ -399,6 +481,7 @@ class AudioMixerApp(ctk.CTk):
         self.track_list.column("Chords", width=80, anchor="center")
 
         self.load_tracks()
+        self.after(WATCH_POLL_MS, self.poll_library_changes)
         # Bind double-click to load_stems
         self.track_list.bind("<Double-Button-1>", self.load_stems)
 
@@ -420,6 +503,10 @@ class AudioMixerApp(ctk.CTk):
         self.text_widget = self.lyrics_text._textbox
         self.text_widget.tag_configure("margin", lmargin1=20, lmargin2=20)
         self.text_widget.insert("1.0", "", "margin")
+        self.text_widget.tag_configure("timestamp", foreground="gray50")
+        self.text_widget.tag_configure("current_line", background="#44475a")
+        # Ctrl+Enter stamps the line at the cursor with the playback position
+        self.text_widget.bind("<Control-Return>", self.tap_timestamp)
 
         # Create a container frame for buttons to ensure they stay in one row
         self.lyrics_controls_frame = ctk.CTkFrame(self.lyrics_frame) #ctk frame
@@ -440,6 +527,10 @@ class AudioMixerApp(ctk.CTk):
             self.lyrics_controls_frame,  width=50, text="Fetch Lyrics", command=self.fetch_lyrics)
         self.fetch_lyrics_button.pack(side=tk.LEFT, padx=5)
 
+        self.fetch_missing_button = ctk.CTkButton(
+            self.lyrics_controls_frame, width=50, text="Fetch Missing", command=self.fetch_missing_lyrics)
+        self.fetch_missing_button.pack(side=tk.LEFT, padx=5)
+
         
         self.scroll_speed = tk.DoubleVar()
         self.scroll_speed.set(0.10)  # Default slow speed
@@ -458,6 +549,10 @@ class AudioMixerApp(ctk.CTk):
             self.lyrics_controls_frame,  width=50, text="Switch to Chords", command=self.toggle_lyrics_chords)
         self.toggle_button.pack(side=tk.LEFT, padx=5)
 
+        self.tap_button = ctk.CTkButton(
+            self.lyrics_controls_frame, width=50, text="Tap Sync", command=self.tap_timestamp)
+        self.tap_button.pack(side=tk.LEFT, padx=5)
+
         self.save_button = ctk.CTkButton(
             self.lyrics_controls_frame, width=30, text="Save", command=self.save_text)
         self.save_button.pack(side=tk.RIGHT, padx=5)
@@ -506,6 +601,13 @@ class AudioMixerApp(ctk.CTk):
                     if "genius_api_key" in settings:
                         self.genius_api_key = settings.get("genius_api_key")
 
+                    self.stream_from_disk = settings.get("stream_from_disk", False)
+                    self.cache_max_mb = settings.get("cache_max_mb", DEFAULT_CACHE_MB)
+                    if settings.get("sample_format") in SAMPLE_FORMATS:
+                        self.sample_format = settings["sample_format"]
+                    self.setlist = list(settings.get("setlist", []))
+                    self.setlist_crossfade = float(settings.get("setlist_crossfade", 0.0))
+
                     stored_dir = settings.get("audio_dir")
                     if stored_dir and os.path.exists(stored_dir):
                         self.audio_dir = stored_dir
@@ -570,7 +672,12 @@ class AudioMixerApp(ctk.CTk):
             "genius_api_key": self.genius_api_key if hasattr(self, 'genius_api_key') else "",
             "theme": self.current_theme.get(),
             "window_size": (self.winfo_width(), self.winfo_height()),
-            "column_widths": [self.left_frame.winfo_width(), self.lyrics_frame.winfo_width()]
+            "column_widths": [self.left_frame.winfo_width(), self.lyrics_frame.winfo_width()],
+            "stream_from_disk": self.stream_from_disk,
+            "cache_max_mb": self.cache_max_mb,
+            "sample_format": self.sample_format,
+            "setlist": self.setlist,
+            "setlist_crossfade": self.setlist_crossfade
         }
         
         try:
@@ -583,40 +690,34 @@ class AudioMixerApp(ctk.CTk):
         if not self.audio_files:
             return
 
-        for audio in self.audio_files:
-            audio.play()
+        self.engine.play()
         self.is_paused = False
-
-        # Start updating the seekbar
-        if self.update_timer is None:
-            self.update_seekbar()
+        self.start_ticks()
 
     def stop_all(self):
-        for audio in self.audio_files:
-            audio.stop()
+        self.engine.stop()
         self.is_paused = False
 
         # Reset seekbar and time labels
         self.seekbar.set(0)
         self.current_time_label.configure(text="00:00")
-
-        # Cancel update timer
-        if self.update_timer is not None:
-            self.after_cancel(self.update_timer)
-            self.update_timer = None
+        self.shown_times = (None, None)
+        self.shown_playhead = None
+        self.update_synced_line(0.0)
+        self.clear_meters()
 
     def pause_all(self):
         if not self.audio_files:
             return
 
         if self.is_paused:
-            for audio in self.audio_files:
-                audio.unpause()
+            self.engine.unpause()
             self.is_paused = False
+            self.start_ticks()
         else:
-            for audio in self.audio_files:
-                audio.pause()
+            self.engine.pause()
             self.is_paused = True
+            self.clear_meters()
 
 
     # def play_all(self):
@@ -657,45 +758,116 @@ class AudioMixerApp(ctk.CTk):
         label.configure(text=f"{new_volume:.1f}")
         
         
-    def update_seekbar(self):
-        """Update the seekbar and time labels based on current playback position"""
-        if not self.audio_files or not self.audio_files[0].playing:
-            # Cancel timer if not playing
-            self.update_timer = None
-            return False
-
-        # Use the first audio file as a reference for position
-        audio = self.audio_files[0]
-        current_pos = audio.get_position_seconds()
+    def start_ticks(self):
+        """Run ui_tick now unless it is already scheduled"""
+        if self.tick_timer is None:
+            self.last_tick = time.monotonic()
+            self.ui_tick()
+
+    def ui_tick(self):
+        """The one periodic UI update, fanned out to every view that needs it.
+
+        The engine clock is read once per tick. The tick runs every TICK_MS
+        while playing, IDLE_TICK_MS while only auto-scroll or diagnostics need
+        it and HIDDEN_TICK_MS while the window is minimized; it stops when
+        nothing needs it, and start_ticks brings it back.
+        """
+        self.tick_timer = None
+        now = time.monotonic()
+        elapsed = now - self.last_tick
+        self.last_tick = now
+        visible = self.winfo_viewable()
+        playing = bool(self.audio_files) and self.engine.playing and not self.engine.paused
+        diagnostics = bool(self.diagnostics_toggle.get())
+
+        if playing:
+            if self.engine.song_serial != self.song_serial:
+                # The engine moved on to the next setlist song
+                self.follow_setlist()
+            if visible:
+                position = self.engine.get_playback_seconds()
+                self.update_seekbar(position)
+                self.update_synced_line(position)
+                self.update_meters()
+        elif self.meters_lit:
+            # Playback stopped on its own at the end of the song
+            self.clear_meters()
+        # Time-synced lyrics follow the song instead
+        if self.auto_scroll_active and visible and self.synced_lyrics is None:
+            self.scroll_lyrics(elapsed)
+        if diagnostics and visible and now >= self.next_diagnostics:
+            self.next_diagnostics = now + DIAGNOSTICS_INTERVAL
+            self.update_diagnostics()
+
+        if not (playing or self.auto_scroll_active or diagnostics):
+            return
+        if not visible:
+            interval = HIDDEN_TICK_MS
+        elif playing:
+            interval = TICK_MS
+        else:
+            interval = IDLE_TICK_MS
+        self.tick_timer = self.after(interval, self.ui_tick)
+
+    def update_meters(self):
+        """Show the levels the audio callback metered since the last tick"""
+        self.master_level.show(*take_level(self.engine.master_meter))
+        for audio, controls in self.audio_controls.items():
+            controls["meter"].show(*take_level(audio.meter))
+        self.meters_lit = True
+
+    def clear_meters(self):
+        take_level(self.engine.master_meter)
+        self.master_level.show(0.0, 0.0)
+        for audio, controls in self.audio_controls.items():
+            take_level(audio.meter)
+            controls["meter"].show(0.0, 0.0)
+        self.meters_lit = False
+
+    def on_map(self, event):
+        """Back to full rate as soon as the window is restored"""
+        if event.widget is self and self.tick_timer is not None:
+            self.after_cancel(self.tick_timer)
+            self.tick_timer = None
+            self.ui_tick()
+
+    def update_seekbar(self, current_pos):
+        """Move the seekbar, playhead and time labels to the engine clock.
+
+        Widgets are only reconfigured when what they show changes: the labels
+        once a second, the seekbar and playhead once the playhead moves a pixel.
+        """
+        audio = self.engine
         total_duration = audio.get_duration_seconds()
 
-        # Check if the position has changed significantly (e.g., 1-second interval)
-        if int(current_pos) != int(getattr(self, "last_update_position", -1)):
-            self.last_update_position = int(current_pos)
-
-            # Update labels with formatted time
-            self.current_time_label.configure(text=audio.format_time(current_pos))
-            self.total_time_label.configure(
-                text=audio.format_time(total_duration))
-
-            # Update seekbar position without triggering the callback
-            if total_duration > 0:
-                position_percent = (current_pos / total_duration) * 100
-                self.seekbar.set(position_percent)
+        times = (audio.format_time(current_pos), audio.format_time(total_duration))
+        if times[0] != self.shown_times[0]:
+            self.current_time_label.configure(text=times[0])
+        if times[1] != self.shown_times[1]:
+            self.total_time_label.configure(text=times[1])
+        self.shown_times = times
+
+        if total_duration > 0:
+            fraction = min(1.0, current_pos / total_duration)
+            pixel = round(fraction * max(self.seekbar.winfo_width(), self.waveform_canvas.winfo_width()))
+            if pixel != self.shown_playhead:
+                self.shown_playhead = pixel
+                self.seekbar.set(fraction * 100)
+                self.draw_playhead(fraction)
 
-        # Schedule the next update
-        self.update_timer = self.after(100, self.update_seekbar)
-        return True
-        
-        
     def seek_position(self, position):
         """Handle seekbar movement"""
         if not self.audio_files:
             return
 
         position_percent = float(position) / 100.0
-        for audio in self.audio_files:
-            audio.seek(position_percent)
+        # The engine coalesces these, so every slider motion event can go straight through
+        self.engine.seek(position_percent, scrub=bool(self.scrub_toggle.get()))
+        seconds = position_percent * self.engine.get_duration_seconds()
+        # The tick only follows the clock while playing; paused or stopped, show the new position here
+        if not self.engine.playing or self.engine.paused:
+            self.update_seekbar(seconds)
+        self.update_synced_line(seconds)
         
     # Replace the load_stems method to use SoundDevice instead of pygame:
     def load_stems(self, event):
@@ -703,23 +875,30 @@ class AudioMixerApp(ctk.CTk):
         if not selected_item:
             return
         song_name = self.track_list.item(selected_item[0], "values")[0]  # Get track name
-        self.current_song_path = os.path.join(self.audio_dir, song_name)
-        self.current_song_name = song_name  # Store the song name for use with API
 
         if self.audio_files:
-            if self.audio_files[0].playing:
+            if self.engine.playing:
                 loadfile = messagebox.askyesno(
                     "Load Steam", "Load the selected song and stop the current steam?")
                 if loadfile:
                     self.stop_all()
                 else:
                     return
-                
+
+        self.current_song_path = os.path.join(self.audio_dir, song_name)
+        self.current_song_name = song_name  # Store the song name for use with API
+        # Picking a song by hand leaves setlist mode; start_setlist re-enters it
+        self.setlist_index = None
+        self.cancel_preload()
+        self.song_serial = self.engine.song_serial
+        self.highlight_setlist()
+
         if not os.path.exists(self.current_song_path):
             messagebox.showerror("Error", "Song directory not found!")
             return
 
         # Clear lyrics
+        self.cancel_lyrics_fetch(restore=False)
         self.lyrics_text.delete("1.0", tk.END)
         self.load_text()  # Load the selected file (lyrics or chords)
 
@@ -729,11 +908,8 @@ class AudioMixerApp(ctk.CTk):
         self.total_time_label.configure(text="00:00")
 
         # Clear previous stems
-        for widget in self.stem_controls_frame.winfo_children():
-            widget.destroy()
-
-        self.audio_files = []
-        self.audio_controls = {}
+        self.clear_stem_rows()
+        self.engine.load([])
 
         # Reset effects sliders
         self.reverb_slider.set(0)
@@ -741,63 +917,405 @@ class AudioMixerApp(ctk.CTk):
         self.eq_low_slider.set(1.0)
         self.eq_mid_slider.set(1.0)
         self.eq_high_slider.set(1.0)
+        self.engine.set_eq(low=1.0, mid=1.0, high=1.0)
+
+        # Any results still arriving for a previous song are discarded
+        self.discard_stem_loads()
+        generation = self.load_generation
+        self.load_progress.pack_forget()
+        self.load_status_label.pack_forget()
+
+        stems = self.list_stems(self.current_song_path)
+        self.pending_stems = len(stems)
+        self.load_errors = []
+        if not stems:
+            return
+
+        self.set_playback_enabled(False)
+        self.load_progress.set(0)
+        self.load_progress.pack(side="left", padx=5)
+        self.load_status_label.configure(text=f"Loading 0/{len(stems)}")
+        self.load_status_label.pack(side="left", padx=5)
+
+        for stem in stems:
+            file_path = os.path.join(self.current_song_path, stem)
+            future = self.load_executor.submit(SoundDevice, file_path, streaming=self.stream_from_disk,
+                                               cache=self.pcm_cache, sample_format=self.sample_format)
+            future.add_done_callback(
+                lambda f, name=stem: self.load_queue.put((generation, name, f)))
+            self.load_futures.add(future)
+
+        self.after(20, self.poll_loaded_stems, generation)
+
+    def poll_loaded_stems(self, generation):
+        """Add a row for every stem that finished decoding since the last poll"""
+        if generation != self.load_generation:
+            # A newer song took over; its own poll loop handles the queue
+            return
+
+        while True:
+            try:
+                result_generation, stem, future = self.load_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if result_generation != generation:
+                continue  # Closed by discard_stem_loads
+
+            self.load_futures.discard(future)
+            error = future.exception()
+            self.pending_stems -= 1
+            if error is not None:
+                self.load_errors.append(f"{stem}: {error}")
+            else:
+                self.add_stem_row(future.result(), stem)
+
+            total = len(self.audio_files) + len(self.load_errors) + self.pending_stems
+            done = total - self.pending_stems
+            self.load_progress.set(done / total)
+            self.load_status_label.configure(text=f"Loading {done}/{total}")
+
+        if self.pending_stems > 0:
+            self.after(20, self.poll_loaded_stems, generation)
+            return
+
+        self.load_progress.pack_forget()
+        self.load_status_label.pack_forget()
+        if self.load_errors:
+            messagebox.showerror("Error", "Failed to load stems:\n" + "\n".join(self.load_errors))
+        try:
+            self.engine.load(self.audio_files)
+        except ValueError as e:
+            # The engine didn't take the stems, so close them here along with their rows
+            for audio in self.audio_files:
+                audio.close()
+            self.clear_stem_rows()
+            messagebox.showerror("Error", f"Cannot mix these stems: {e}")
+            return
+        self.set_playback_enabled(True)
+        if self.setlist_index is not None:
+            self.preload_next_song()
+
+    def discard_stem_loads(self):
+        """Drop the current song's unfinished decodes, closing each stem once it is ready"""
+        self.load_generation += 1
+        for future in self.load_futures:
+            future.add_done_callback(close_loaded_stem)
+        self.load_futures = set()
+
+    def list_stems(self, song_path):
+        """Stem files in a song folder, sorted"""
+        return sorted(stem for stem in os.listdir(song_path)
+                      if stem.lower().endswith((".mp3", ".wav", ".flac", ".ogg")))
+
+    def clear_stem_rows(self):
+        """Remove the stem rows and waveforms; the engine's stems are left alone"""
+        for widget in self.stem_controls_frame.winfo_children():
+            widget.destroy()
+
+        self.audio_files = []
+        self.audio_controls = {}
+        self.stem_peaks = {}
+        self.waveform_canvas.delete("all")
+
+    def add_stem_row(self, audio, stem):
+        """Create the control row for a decoded stem"""
+        self.audio_files.append(audio)
+
+        # If this is the first file, update the total time display
+        if len(self.audio_files) == 1:
+            self.total_time_label.configure(
+                text=audio.format_time(audio.get_duration_seconds()))
+
+        stem_frame = ctk.CTkFrame(self.stem_controls_frame)
+        stem_frame.pack(pady=2, fill="x")
+
+        play_button = ctk.CTkButton(stem_frame, width=30, height=15, text="Play", command=lambda a=audio: self.play_stem(a))
+        play_button.pack(side=ctk.LEFT, padx=5)
+
+        mute_button = ctk.CTkButton(stem_frame, width=30, height=15, text="Mute")
+        mute_button.configure(command=lambda a=audio,b=mute_button: self.toggle_mute(a, b))
+        mute_button.pack(side=ctk.LEFT, padx=5)
+
+        # Create a frame to hold the slider and its label
+        slider_frame = ctk.CTkFrame(stem_frame)
+        slider_frame.pack(side="left", padx=5,
+                          fill="x", expand=False)
+
+        # Create the volume slider without showing its value
+        volume_slider = ctk.CTkSlider(slider_frame, from_=0, to=1, width=60, height=15,
+                              orientation="horizontal",  # Hide the default value display
+                              command=lambda v, a=audio: self.set_volume(a, v))
+        volume_slider.set(1.0)
+        volume_slider.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        # Create a label to show the value on the right
+        volume_label = ctk.CTkLabel(slider_frame, text="1.0", height=15)
+        volume_label.pack(side="right", padx=(0, 5))
+
+        # Update the label when slider changes
+        def update_volume(v, a=audio, lbl=volume_label):
+            lbl.configure(text=f"{float(v):.1f}")
+            a.set_volume(float(v))
+
+        # Replace the original command with our new function
+        volume_slider.configure(command=update_volume)
+
+        # Bind mouse wheel for volume control with label update
+        volume_slider.bind("<MouseWheel>", lambda event, s=volume_slider, a=audio, l=volume_label:
+                           self.scroll_volume(event, s, a, l))
+
+        label = ctk.CTkLabel(stem_frame, text=stem, height=15)
+        label.pack(side="left", padx=5)
+
+        waveform = tk.Canvas(stem_frame, width=STEM_WAVEFORM_WIDTH, height=STEM_WAVEFORM_HEIGHT,
+                             bg="#1d1e1e", highlightthickness=0)
+        waveform.pack(side="right", padx=5)
+
+        meter = LevelMeter(stem_frame, STEM_METER_WIDTH, STEM_METER_HEIGHT)
+        meter.pack(side="right", padx=5)
+
+        self.audio_controls[audio] = {
+            "mute_button": mute_button,
+            "volume_slider": volume_slider,
+            "play_button": play_button,
+            "waveform": waveform,
+            "meter": meter
+        }
+
+        # Peaks come from the .peaks cache, or are computed from the decoded samples
+        future = self.load_executor.submit(load_pyramid, audio.file_path, audio.data, audio.scale)
+        self.after(50, self.poll_stem_peaks, audio, future, self.load_generation)
+
+        # Rows that appear mid-load stay disabled until every stem is ready
+        if self.pending_stems > 0:
+            play_button.configure(state="disabled")
+
+    def poll_stem_peaks(self, audio, future, generation):
+        """Draw a stem's waveform once its peak pyramid is ready"""
+        if generation != self.load_generation:
+            return
+        if not future.done():
+            self.after(50, self.poll_stem_peaks, audio, future, generation)
+            return
+        try:
+            pyramid = future.result()
+        except Exception as e:
+            print(f"Waveform error for {audio.file_path}: {e}")
+            return
+        self.stem_peaks[audio] = pyramid
+
+        canvas = self.audio_controls[audio]["waveform"]
+        canvas.create_polygon(
+            envelope_points(pyramid.envelope(STEM_WAVEFORM_WIDTH), STEM_WAVEFORM_HEIGHT),
+            fill=WAVEFORM_COLOR, outline=WAVEFORM_COLOR)
+        self.schedule_waveform_redraw()
+
+    def schedule_waveform_redraw(self, event=None):
+        """Coalesce resize events and arriving stems into one redraw"""
+        if self.waveform_redraw_timer:
+            self.after_cancel(self.waveform_redraw_timer)
+        self.waveform_redraw_timer = self.after(30, self.redraw_waveform)
+
+    def redraw_waveform(self):
+        """Draw every loaded stem's peaks against the song length"""
+        self.waveform_redraw_timer = None
+        self.waveform_canvas.delete("all")
+        width = self.waveform_canvas.winfo_width()
+        pyramids = [self.stem_peaks[audio] for audio in self.audio_files if audio in self.stem_peaks]
+        if not pyramids or width < 2:
+            return
+        frames = max(audio.frames for audio in self.audio_files)
+        envelope = combined_envelope(pyramids, width, frames)
+        self.waveform_canvas.create_polygon(envelope_points(envelope, WAVEFORM_HEIGHT),
+                                            fill=WAVEFORM_COLOR, outline=WAVEFORM_COLOR)
+        self.draw_playhead(self.seekbar.get() / 100)
+
+    def draw_playhead(self, fraction):
+        x = fraction * self.waveform_canvas.winfo_width()
+        self.waveform_canvas.delete("playhead")
+        self.waveform_canvas.create_line(x, 0, x, WAVEFORM_HEIGHT, fill="white", tags="playhead")
+
+    def seek_from_waveform(self, event):
+        """Seek to the clicked point of the overview"""
+        width = self.waveform_canvas.winfo_width()
+        if not self.audio_files or width < 2:
+            return
+        position_percent = max(0.0, min(100.0, event.x / width * 100))
+        self.seekbar.set(position_percent)
+        self.seek_position(position_percent)
+        self.draw_playhead(position_percent / 100)
+
+    # Setlist methods
+    def add_to_setlist(self):
+        """Append the songs selected in the track list"""
+        for item in self.track_list.selection():
+            song_name = self.track_list.item(item, "values")[0]
+            self.setlist.append(song_name)
+            self.setlist_box.insert(tk.END, song_name)
+        self.setlist_changed()
+
+    def remove_from_setlist(self):
+        selection = self.setlist_box.curselection()
+        if not selection:
+            return
+        index = selection[0]
+        del self.setlist[index]
+        self.setlist_box.delete(index)
+        if self.setlist_index is not None:
+            if index == self.setlist_index:
+                # The playing song was taken out; it finishes on its own
+                self.setlist_index = None
+            elif index < self.setlist_index:
+                self.setlist_index -= 1
+        self.setlist_changed()
+
+    def clear_setlist(self):
+        self.setlist = []
+        self.setlist_box.delete(0, tk.END)
+        self.setlist_index = None
+        self.setlist_changed()
+
+    def setlist_changed(self):
+        """Requeue if an edit changed which song follows the current one"""
+        self.highlight_setlist()
+        if self.preloaded != self.next_setlist_song():
+            self.preload_next_song()
+
+    def highlight_setlist(self):
+        normal = self.setlist_box.cget("background")
+        for i in range(len(self.setlist)):
+            self.setlist_box.itemconfig(i, background="#3b8ed0" if i == self.setlist_index else normal)
+
+    def next_setlist_song(self):
+        if self.setlist_index is None or self.setlist_index + 1 >= len(self.setlist):
+            return None
+        return self.setlist[self.setlist_index + 1]
+
+    def start_setlist(self, event=None):
+        """Load the double-clicked setlist song; the ones after it follow on their own"""
+        selection = self.setlist_box.curselection()
+        if not selection:
+            return
+        index = selection[0]
+        song_name = self.setlist[index]
+        item = self.track_items.get(song_name)
+        if item is None:
+            messagebox.showerror("Error", f"{song_name} is not in the library")
+            return
+        self.track_list.selection_set(item)
+        self.track_list.see(item)
+        self.load_stems(None)
+        if self.current_song_name == song_name:
+            # poll_loaded_stems preloads the next song once this one is ready
+            self.setlist_index = index
+            self.highlight_setlist()
+
+    def set_setlist_crossfade(self, value):
+        self.setlist_crossfade = round(float(value), 1)
+        self.crossfade_label.configure(text=f"Crossfade: {self.setlist_crossfade:.1f}s")
+        self.engine.set_crossfade(self.setlist_crossfade)
+
+    def cancel_preload(self):
+        """Drop the queued next song, and any decode still running for it"""
+        self.preload_generation += 1
+        self.preloaded = None
+        stems = self.engine.clear_next()
+        if stems:
+            # The callback may still be reading them; close once it has let go
+            self.after(500, self.close_stems, stems)
+
+    def close_stems(self, stems):
+        for stem in stems:
+            if stem not in self.engine.stems:
+                stem.close()
+
+    def preload_next_song(self):
+        """Decode the setlist's next song in the background and queue it in the engine"""
+        self.cancel_preload()
+        song_name = self.next_setlist_song()
+        if song_name is None or not self.audio_files:
+            return
+        song_path = os.path.join(self.audio_dir, song_name)
+        try:
+            stems = self.list_stems(song_path)
+        except OSError as e:
+            messagebox.showerror("Setlist", f"Cannot read {song_name}: {e}\n"
+                                            "Playback will stop at the end of this song.")
+            return
+        if not stems:
+            return
+        futures = [self.load_executor.submit(SoundDevice, os.path.join(song_path, stem),
+                                             streaming=self.stream_from_disk, cache=self.pcm_cache,
+                                             sample_format=self.sample_format)
+                   for stem in stems]
+        self.after(50, self.poll_preload, self.preload_generation, song_name, futures)
+
+    def poll_preload(self, generation, song_name, futures):
+        if generation != self.preload_generation:
+            # Superseded; close whatever the workers produce
+            for future in futures:
+                future.add_done_callback(close_loaded_stem)
+            return
+        if not all(future.done() for future in futures):
+            self.after(50, self.poll_preload, generation, song_name, futures)
+            return
 
-        for stem in os.listdir(self.current_song_path):
-            if stem.lower().endswith((".mp3", ".wav", ".flac", ".ogg")):
-                file_path = os.path.join(self.current_song_path, stem)
-                audio = SoundDevice(file_path)
-                self.audio_files.append(audio)
-
-                # If this is the first file, update the total time display
-                if len(self.audio_files) == 1:
-                    self.total_time_label.configure(
-                        text=audio.format_time(audio.get_duration_seconds()))
-
-                stem_frame = ctk.CTkFrame(self.stem_controls_frame)
-                stem_frame.pack(pady=2, fill="x")
-
-                play_button = ctk.CTkButton(stem_frame, width=30, height=15, text="Play", command=lambda a=audio: a.play())
-                play_button.pack(side=ctk.LEFT, padx=5)
-
-                mute_button = ctk.CTkButton(stem_frame, width=30, height=15, text="Mute")
-                mute_button.configure(command=lambda a=audio,b=mute_button: self.toggle_mute(a, b))
-                mute_button.pack(side=ctk.LEFT, padx=5)
-
-                # Create a frame to hold the slider and its label
-                slider_frame = ctk.CTkFrame(stem_frame)
-                slider_frame.pack(side="left", padx=5,
-                                  fill="x", expand=False)
-
-                # Create the volume slider without showing its value
-                volume_slider = ctk.CTkSlider(slider_frame, from_=0, to=1, width=60, height=15,
-                                      orientation="horizontal",  # Hide the default value display
-                                      command=lambda v, a=audio: self.set_volume(a, v))
-                volume_slider.set(1.0)
-                volume_slider.pack(side=tk.LEFT, fill=tk.X, expand=True)
-
-                # Create a label to show the value on the right
-                volume_label = ctk.CTkLabel(slider_frame, text="1.0", height=15)
-                volume_label.pack(side="right", padx=(0, 5))
-
-                # Update the label when slider changes
-                def update_volume(v, a=audio, lbl=volume_label):
-                    lbl.configure(text=f"{float(v):.1f}")
-                    a.set_volume(float(v))
-
-                # Replace the original command with our new function
-                volume_slider.configure(command=update_volume)
-
-                # Bind mouse wheel for volume control with label update
-                volume_slider.bind("<MouseWheel>", lambda event, s=volume_slider, a=audio, l=volume_label:
-                                   self.scroll_volume(event, s, a, l))
-
-                self.audio_controls[audio] = {
-                    "mute_button": mute_button,
-                    "volume_slider": volume_slider
-                }
-
-                label = ctk.CTkLabel(stem_frame, text=stem, height=15)
-                label.pack(side="left", padx=5)
+        stems = [future.result() for future in futures if future.exception() is None]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        try:
+            if errors:
+                raise ValueError(errors[0])
+            # The next song fades in with the sends the sliders are set to
+            self.apply_effect_sends(stems)
+            self.engine.queue_next(stems, self.setlist_crossfade)
+        except ValueError as e:
+            for stem in stems:
+                stem.close()
+            messagebox.showerror("Setlist", f"{song_name} cannot follow on: {e}\n"
+                                            "Playback will stop at the end of this song.")
+            return
+        self.preloaded = song_name
+
+    def follow_setlist(self):
+        """Show the song the engine switched to and start preloading the one after it"""
+        self.song_serial = self.engine.song_serial
+        self.close_stems(self.engine.take_finished_stems())
+        self.preloaded = None
+        song_path = os.path.dirname(self.engine.stems[0].file_path)
+        song_name = os.path.basename(song_path)
+        if self.next_setlist_song() == song_name:
+            self.setlist_index += 1
+        self.current_song_path = song_path
+        self.current_song_name = song_name
+
+        self.cancel_lyrics_fetch(restore=False)
+        self.lyrics_text.delete("1.0", tk.END)
+        self.load_text()
+
+        self.clear_stem_rows()
+        self.discard_stem_loads()
+        # Pick up any slider moves made while the song was queued
+        self.apply_effect_sends(self.engine.stems)
+        for audio in self.engine.stems:
+            self.add_stem_row(audio, os.path.basename(audio.file_path))
+        self.shown_times = (None, None)
+        self.shown_playhead = None
+        self.highlight_setlist()
+        self.preload_next_song()
+
+    def set_playback_enabled(self, enabled):
+        """Enable or disable every play control"""
+        state = "normal" if enabled else "disabled"
+        self.master_play_button.configure(state=state)
+        for controls in self.audio_controls.values():
+            controls["play_button"].configure(state=state)
+
+    def play_stem(self, audio):
+        """Switch a single stem into the mix and start the engine if needed"""
+        self.engine.play(stems=[audio])
+        self.is_paused = False
+        self.start_ticks()
     
     # Effect methods
     def set_reverb_all(self, value):
@@ -805,25 +1323,64 @@ class AudioMixerApp(ctk.CTk):
         for audio in self.audio_files:
             audio.set_reverb(float(value))
 
+    def set_room_size(self, value):
+        """Set the room size of the shared reverb"""
+        self.engine.set_reverb_room_size(float(value))
+
+    def set_damping(self, value):
+        """Set the damping of the shared reverb"""
+        self.engine.set_reverb_damping(float(value))
+
     def set_delay_all(self, value):
         """Set delay for all audio tracks"""
         for audio in self.audio_files:
             audio.set_delay(float(value))
 
+    def apply_effect_sends(self, stems):
+        """Give stems the reverb and delay sends the sliders are set to"""
+        reverb = float(self.reverb_slider.get())
+        delay = float(self.delay_slider.get())
+        for audio in stems:
+            audio.set_reverb(reverb)
+            audio.set_delay(delay)
+
+    def set_delay_time(self, value):
+        """Set the delay time in milliseconds"""
+        self.engine.set_delay_time(float(value))
+        self.delay_time_label.configure(text=f"Time: {int(float(value))} ms")
+
+    def sync_delay_to_bpm(self, event=None):
+        """Set the delay time to one beat at the tempo typed in the BPM box"""
+        try:
+            bpm = float(self.bpm_entry.get())
+        except ValueError:
+            return
+        if bpm <= 0:
+            return
+        self.engine.set_delay_tempo(bpm)
+        time_ms = self.engine.delay.time_ms
+        self.delay_time_slider.set(time_ms)
+        self.delay_time_label.configure(text=f"Time: {int(time_ms)} ms")
+
+    def set_delay_feedback(self, value):
+        """Set the delay feedback"""
+        self.engine.set_delay_feedback(float(value))
+
+    def set_delay_wet(self, value):
+        """Set the level of the delay echoes"""
+        self.engine.set_delay_wet(float(value))
+
     def set_eq_low_all(self, value):
         """Set low EQ for all audio tracks"""
-        for audio in self.audio_files:
-            audio.set_eq(low=float(value))
+        self.engine.set_eq(low=float(value))
 
     def set_eq_mid_all(self, value):
         """Set mid EQ for all audio tracks"""
-        for audio in self.audio_files:
-            audio.set_eq(mid=float(value))
+        self.engine.set_eq(mid=float(value))
 
     def set_eq_high_all(self, value):
         """Set high EQ for all audio tracks"""
-        for audio in self.audio_files:
-            audio.set_eq(high=float(value))
+        self.engine.set_eq(high=float(value))
 
     def toggle_effects(self):
         """Toggle enabling or disabling effects."""
@@ -832,56 +1389,207 @@ class AudioMixerApp(ctk.CTk):
     def toggle_eq(self):
         """Toggle enabling or disabling EQ."""
         self.eq_enabled = not self.eq_enabled
+        self.engine.eq_enabled = self.eq_enabled
+
+    def toggle_diagnostics(self):
+        """Show or hide the audio diagnostics panel"""
+        if self.diagnostics_toggle.get():
+            self.diagnostics_frame.pack(fill="x", pady=5, after=self.master_seekbar_frame)
+            self.next_diagnostics = 0.0
+            self.start_ticks()
+        else:
+            self.diagnostics_frame.pack_forget()
+
+    def update_diagnostics(self):
+        """Refresh the xrun counts and callback timings; ui_tick calls this twice a second"""
+        stats = self.engine.get_diagnostics()
+        text = (f"callback p50 {stats['p50_ms']:.2f} ms  p99 {stats['p99_ms']:.2f} ms  "
+                f"max {stats['max_ms']:.2f} ms / {stats['budget_ms']:.1f} ms budget   "
+                f"underflows {stats['underflows']}  overflows {stats['overflows']}  "
+                f"late {stats['late']}  disk underruns {stats['stream_underruns']}")
+        if stats["last_error"]:
+            text += f"\nlast error: {stats['last_error']}"
+        if text != self.diagnostics_label.cget("text"):
+            self.diagnostics_label.configure(text=text)
+
+    def purge_cache(self):
+        """Delete every decoded stem from the PCM cache"""
+        if not messagebox.askyesno("Purge Cache", "Delete all cached decoded stems?"):
+            return
+        freed = self.pcm_cache.purge()
+        messagebox.showinfo("Purge Cache", f"Freed {freed / (1024 * 1024):.1f} MB")
+
+    def set_sample_format(self, sample_format):
+        """Choose float32 or int16 stem storage. Applies to the next song loaded."""
+        self.sample_format = sample_format
+        self.save_settings()
+
+    def toggle_streaming(self):
+        """Toggle streaming stems from disk. Applies to the next song loaded."""
+        self.stream_from_disk = bool(self.stream_toggle.get())
+        self.save_settings()
 
     def load_tracks(self):
         if not os.path.exists(self.audio_dir):
             messagebox.showerror("Error", "Audio directory not found!")
             return
 
-        self.all_tracks = [song for song in os.listdir(
-            self.audio_dir) if os.path.isdir(os.path.join(self.audio_dir, song))]
-        self.track_list.delete(
-            *self.track_list.get_children())  # Clear Treeview
+        # Show what the index already knows, then rescan changed folders in the background
+        self.library_watcher.stop()
+        self.library.open(self.audio_dir)
+        self.track_list.delete(*self.track_items.values())
+        self.track_items = {}
+        self.refresh_tracks()
+
+        self.library_scan = self.load_executor.submit(self.library.scan)
+        self.after(50, self.poll_library_scan, self.library_scan)
+
+    def poll_library_scan(self, future):
+        """Refresh the track list once a background rescan has finished"""
+        if future is not self.library_scan:
+            return  # Superseded by a newer scan
+        if not future.done():
+            self.after(50, self.poll_library_scan, future)
+            return
+        try:
+            changed = future.result()
+        except Exception as e:
+            print(f"Library scan error: {e}")
+            return
+        if changed:
+            self.refresh_tracks(changed)
+        self.load_executor.submit(self.lyrics_index.sync, self.library.audio_dir,
+                                  self.library.songs, changed)
+        # From here on the watcher keeps the list current
+        self.library_watcher.start(self.library.audio_dir)
+
+    def poll_library_changes(self):
+        """Apply the batches of changed song folders reported by the library watcher"""
+        changed = set()
+        while True:
+            try:
+                changed |= self.library_watcher.changes.get_nowait()
+            except queue.Empty:
+                break
+        if changed:
+            self.refresh_tracks(sorted(changed))
+        self.after(WATCH_POLL_MS, self.poll_library_changes)
+
+    def track_values(self, track):
+        """Treeview row for a song, taken from the library index"""
+        song = self.library.get(track)
+        has_lyrics = "✔" if song and song["lyrics"] else "✘"
+        has_chords = "✔" if song and song["chords"] else "✘"
+        return (track, has_lyrics, has_chords)
+
+    def refresh_tracks(self, changed=None):
+        """Sync the Treeview rows with the library index, touching only the changed songs"""
+        if changed is None:
+            self.all_tracks = self.library.names()
+            present = set(self.all_tracks)
+            for track in [track for track in self.track_items if track not in present]:
+                self.track_list.delete(self.track_items.pop(track))
+            for track in self.all_tracks:
+                if track in self.track_items:
+                    self.track_list.item(self.track_items[track], values=self.track_values(track))
+                else:
+                    self.track_items[track] = self.track_list.insert(
+                        "", tk.END, values=self.track_values(track))
+            self.track_search.build(self.all_tracks)
+            self.apply_search()
+            return
 
-        for track in self.all_tracks:
-            track_path = os.path.join(self.audio_dir, track)
-            has_lyrics = "✔" if os.path.exists(
-                os.path.join(track_path, "lyrics.txt")) else "✘"
-            has_chords = "✔" if os.path.exists(
-                os.path.join(track_path, "chords.txt")) else "✘"
+        songs = self.library.songs
+        removed = {track for track in changed if track in self.track_items and track not in songs}
+        added = sorted((track for track in changed if track in songs and track not in self.track_items),
+                       key=str.lower)
+        for track in changed:
+            if track in songs and track in self.track_items:
+                self.track_list.item(self.track_items[track], values=self.track_values(track))
+        for track in removed:
+            self.track_list.delete(self.track_items.pop(track))
+        if removed:
+            self.all_tracks = [track for track in self.all_tracks if track not in removed]
+        if added:
+            self.all_tracks = list(heapq.merge(self.all_tracks, added, key=str.lower))
+        self.track_search.remove(removed)
+        self.track_search.add(added)
+
+        query = self.search_query()
+        if query and not self.lyrics_search_toggle.get():
+            for track in added:
+                self.track_items[track] = self.track_list.insert("", tk.END, values=self.track_values(track))
+            self.show_tracks(self.track_search.search(query))
+        elif added:
+            # Every row is shown in library order; slot the new ones into place
+            added = set(added)
+            for index, track in enumerate(self.all_tracks):
+                if track in added:
+                    self.track_items[track] = self.track_list.insert(
+                        "", index, values=self.track_values(track))
+
+    def show_tracks(self, tracks):
+        """Show only the given songs, in order. Hidden rows are detached, not deleted."""
+        self.track_list.set_children("", *(self.track_items[track] for track in tracks))
 
-            self.track_list.insert("", tk.END, values=(
-                track, has_lyrics, has_chords))  # Insert row
-        
     def search_tracks(self, event):
-        """Filter playlist based on search input."""
-        query = self.search_entry.get().strip().lower()
-
-        # Clear the Treeview (correct way)
-        for item in self.track_list.get_children():
-            self.track_list.delete(item)
+        """Filter playlist based on search input, once typing pauses"""
+        if self.search_timer:
+            self.after_cancel(self.search_timer)
+        self.search_timer = self.after(SEARCH_DEBOUNCE_MS, self.apply_search)
+
+    def search_query(self):
+        query = self.search_entry.get().strip()
+        return "" if query == SEARCH_PLACEHOLDER else query
+
+    def apply_search(self):
+        self.search_timer = None
+        query = self.search_query()
+        if self.lyrics_search_toggle.get():
+            self.show_lyrics_results(query)
+        elif query:
+            self.show_tracks(self.track_search.search(query))
+        else:
+            self.show_tracks(self.all_tracks)
 
-        if query == "":
-            # Restore original list
-            for track in self.all_tracks:
-                track_path = os.path.join(self.audio_dir, track)
-                has_lyrics = "✔" if os.path.exists(
-                    os.path.join(track_path, "lyrics.txt")) else "✘"
-                has_chords = "✔" if os.path.exists(
-                    os.path.join(track_path, "chords.txt")) else "✘"
-                self.track_list.insert("", tk.END, values=(
-                    track, has_lyrics, has_chords))
+    def toggle_lyrics_search(self):
+        """Switch the search bar between song names and lyrics/chords text"""
+        if self.lyrics_search_toggle.get():
+            self.show_tracks(self.all_tracks)
+            self.lyrics_results.pack(fill=tk.X, pady=(0, 5), before=self.track_list)
         else:
-            filtered_tracks = [
-                track for track in self.all_tracks if query in track.lower()]
-            for track in filtered_tracks:
-                track_path = os.path.join(self.audio_dir, track)
-                has_lyrics = "✔" if os.path.exists(
-                    os.path.join(track_path, "lyrics.txt")) else "✘"
-                has_chords = "✔" if os.path.exists(
-                    os.path.join(track_path, "chords.txt")) else "✘"
-                self.track_list.insert("", tk.END, values=(
-                    track, has_lyrics, has_chords))
+            self.lyrics_results.pack_forget()
+        self.apply_search()
+
+    def show_lyrics_results(self, query):
+        """List every matching line; use quotes for phrases, e.g. "amazing grace" """
+        self.lyrics_results.delete(*self.lyrics_results.get_children())
+        self.lyrics_results_lines = {}
+        for song, file_name, line_number, line in self.lyrics_index.search(query):
+            item = self.lyrics_results.insert("", tk.END, values=(song, file_name[:-len(".txt")], line))
+            self.lyrics_results_lines[item] = (song, file_name, line_number)
+
+    def open_lyrics_result(self, event):
+        """Load the song of a lyrics search hit and scroll to the matching line"""
+        selected_item = self.lyrics_results.selection()
+        if not selected_item or selected_item[0] not in self.lyrics_results_lines:
+            return
+        song, file_name, line_number = self.lyrics_results_lines[selected_item[0]]
+
+        song_path = os.path.join(self.audio_dir, song)
+        if getattr(self, "current_song_path", None) != song_path and song in self.track_items:
+            self.track_list.selection_set(self.track_items[song])
+            self.track_list.see(self.track_items[song])
+            self.load_stems(None)
+            if getattr(self, "current_song_path", None) != song_path:
+                return  # The user kept the current song playing
+        if file_name != self.current_file:
+            self.toggle_lyrics_chords()
+
+        self.text_widget.tag_remove("search_hit", "1.0", tk.END)
+        self.text_widget.tag_add("search_hit", f"{line_number}.0", f"{line_number}.end")
+        self.text_widget.tag_configure("search_hit", background="#44475a")
+        self.text_widget.see(f"{line_number}.0")
 
     def request_genius_api_key(self):
         """Prompt the user to enter their Genius API key"""
@@ -962,22 +1670,7 @@ class AudioMixerApp(ctk.CTk):
 
     def parse_song_info(self, song_name):
         """Try to extract artist and title from directory name"""
-        # Common patterns: "Artist - Title", "Artist_-_Title", "Artist__Title"
-        patterns = [
-            r"(.+)\s*-\s*(.+)",    # Artist - Title
-            r"(.+)_-_(.+)",        # Artist_-_Title
-            r"(.+)__(.+)",         # Artist__Title
-            r"(.+)–(.+)",          # Artist–Title (en dash)
-            r"(.+)—(.+)"           # Artist—Title (em dash)
-        ]
-
-        for pattern in patterns:
-            match = re.match(pattern, song_name)
-            if match:
-                return match.group(1).strip(), match.group(2).strip()
-
-        # If no patterns match, return None
-        return None
+        return parse_song_info(song_name)
 
     def ask_song_details(self):
         """Prompt user to enter artist and song title manually"""
@@ -1043,140 +1736,117 @@ class AudioMixerApp(ctk.CTk):
             return result
         return None
 
-    def search_genius_lyrics(self, artist, title):
-        """Search Genius API for lyrics"""
-        search_term = f"{artist} {title}"
-        encoded_term = quote(search_term)
-
-        search_url = f"{self.genius_api_url}/search?q={encoded_term}"
-        headers = {"Authorization": f"Bearer {self.genius_api_key}"}
-
-        try:
-            # Display loading indication
-            self.lyrics_text.delete("1.0", tk.END)
-            self.lyrics_text.insert("1.0", "Searching for lyrics...", "margin")
-            self.lyrics_text.update()
-
-            response = requests.get(search_url, headers=headers)
-            if response.status_code != 200:
-                messagebox.showerror(
-                    "API Error", f"Error contacting Genius API: {response.status_code}")
-                return
+    def genius_client(self):
+        """Shared client, so its pooled connections are reused; rebuilt when the key changes"""
+        if self.genius is None or self.genius.api_key != self.genius_api_key:
+            if self.genius is not None:
+                self.genius.close()
+            self.genius = GeniusClient(self.genius_api_key, self.genius_api_url,
+                                       cache=self.lyrics_cache, rate_limiter=self.genius_rate_limit)
+        return self.genius
 
-            data = response.json()
-            hits = data.get("response", {}).get("hits", [])
-
-            if not hits:
-                messagebox.showinfo(
-                    "Not Found", f"No lyrics found for {artist} - {title}")
-                return
-
-            # Find the best match
-            best_match = None
-            for hit in hits:
-                hit_type = hit.get("type")
-                result = hit.get("result", {})
-
-                if hit_type == "song":
-                    best_match = result
-                    break
+    def search_genius_lyrics(self, artist, title):
+        """Fetch lyrics on a worker thread; poll_lyrics_fetch shows the result"""
+        self.cancel_lyrics_fetch(restore=False)
+        cancelled = threading.Event()
+        self.lyrics_fetch = cancelled
 
-            if not best_match:
-                messagebox.showinfo(
-                    "Not Found", f"No song match found for {artist} - {title}")
-                return
+        # Display loading indication
+        self.lyrics_text.delete("1.0", tk.END)
+        self.lyrics_text.insert("1.0", "Searching for lyrics...", "margin")
+        self.fetch_lyrics_button.configure(text="Cancel", command=self.cancel_lyrics_fetch)
 
-            # Get the song URL and extract lyrics
-            song_url = best_match.get("url")
-            if not song_url:
-                messagebox.showerror("Error", "Couldn't find song URL")
-                return
+        future = self.fetch_executor.submit(self.genius_client().fetch, artist, title, cancelled)
+        self.after(100, self.poll_lyrics_fetch, future, cancelled)
 
-            self.extract_lyrics_from_url(song_url)
+    def cancel_lyrics_fetch(self, restore=True):
+        """Stop waiting for the fetch in progress; its worker gives up at the next check"""
+        if self.lyrics_fetch is None:
+            return
+        self.lyrics_fetch.set()
+        self.lyrics_fetch = None
+        self.fetch_lyrics_button.configure(text="Fetch Lyrics", command=self.fetch_lyrics)
+        if restore:
+            self.lyrics_text.delete("1.0", tk.END)
+            self.load_text()
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to search lyrics: {str(e)}")
+    def poll_lyrics_fetch(self, future, cancelled):
+        if cancelled.is_set():
+            return
+        if not future.done():
+            self.after(100, self.poll_lyrics_fetch, future, cancelled)
+            return
+        self.lyrics_fetch = None
+        self.fetch_lyrics_button.configure(text="Fetch Lyrics", command=self.fetch_lyrics)
 
-    def extract_lyrics_from_url(self, url):
-        """Extract lyrics from a Genius song page"""
         try:
-            # Display loading message
+            full_content = future.result()
+        except LyricsNotFound as e:
             self.lyrics_text.delete("1.0", tk.END)
-            self.lyrics_text.insert("1.0", "Extracting lyrics...", "margin")
-            self.lyrics_text.update()
-
-            # Make request to the song page
-            response = requests.get(url)
-            if response.status_code != 200:
-                messagebox.showerror(
-                    "Error", f"Failed to access lyrics page: {response.status_code}")
-                return
-
-            # Extract lyrics using regex
-            html_content = response.text
-
-            # Extract song metadata - improved patterns
-            # Title pattern
-            title_pattern = r'<title>(.+?) Lyrics \|'
-            title_match = re.search(title_pattern, html_content)
-            title = title_match.group(1) if title_match else "Unknown Title"
-
-            # Add source link at the bottom
-            lyrics_source = f"Source: {url}"
-
-            # Prepare metadata header
-            metadata = f"Title: {title}\n{lyrics_source}\n\n"
-
-            # Rest of the function remains the same
-            lyrics_pattern = r'<div class="Lyrics__Container-sc-\w+\s+">(.+?)</div>'
-            lyrics_matches = re.findall(
-                lyrics_pattern, html_content, re.DOTALL)
-
-            if not lyrics_matches:
-                # Try alternate pattern
-                lyrics_pattern = r'<div data-lyrics-container="true"[^>]*>(.+?)</div>'
-                lyrics_matches = re.findall(
-                    lyrics_pattern, html_content, re.DOTALL)
-
-            if not lyrics_matches:
-                messagebox.showerror(
-                    "Error", "Could not extract lyrics from the page")
-                return
-
-            # Combine all lyrics sections
-            raw_lyrics = "".join(lyrics_matches)
+            self.load_text()
+            messagebox.showinfo("Not Found", str(e))
+            return
+        except Exception as e:
+            # GeniusError, or anything unexpected from the worker
+            self.lyrics_text.delete("1.0", tk.END)
+            self.load_text()
+            messagebox.showerror("Error", f"Failed to fetch lyrics: {e}")
+            return
 
-            # Clean up HTML
-            # Remove HTML tags
-            clean_lyrics = re.sub(r'<[^>]+>', '\n', raw_lyrics)
+        # Display lyrics in the text widget
+        self.lyrics_text.delete("1.0", tk.END)
+        self.lyrics_text.insert("1.0", full_content, "margin")
 
-            # Fix common issues
-            # Remove excessive newlines
-            clean_lyrics = re.sub(r'\n{3,}', '\n\n', clean_lyrics)
-            # Replace &amp; with &
-            clean_lyrics = re.sub(r'&amp;', '&', clean_lyrics)
-            # Replace &quot; with "
-            clean_lyrics = re.sub(r'&quot;', '"', clean_lyrics)
-            # Replace &#x27; with apostrophe
-            clean_lyrics = re.sub(r'&#x27;', "'", clean_lyrics)
+        # Offer to save the lyrics
+        save = messagebox.askyesno(
+            "Save Lyrics", "Save these lyrics to file?")
+        if save:
+            self.current_file = "lyrics.txt"
+            self.save_text()
 
-            # Combine metadata, lyrics and footer
-            full_content = metadata + clean_lyrics
+    def fetch_missing_lyrics(self):
+        """Start fetching lyrics for every song without a lyrics.txt, or stop the running job"""
+        if self.bulk_fetch is not None:
+            self.bulk_fetch.cancel()
+            self.fetch_missing_button.configure(text="Stopping...", state="disabled")
+            return
 
-            # Display lyrics in the text widget
-            self.lyrics_text.delete("1.0", tk.END)
-            self.lyrics_text.insert("1.0", full_content, "margin")
+        if not self.genius_api_key:
+            self.request_genius_api_key()
+            return
 
-            # Offer to save the lyrics
-            save = messagebox.askyesno(
-                "Save Lyrics", "Save these lyrics to file?")
-            if save:
-                self.current_file = "lyrics.txt"
-                self.save_text()
+        job = BulkLyricsFetch(self.genius_client(), self.audio_dir, self.library.songs)
+        if not job.total:
+            messagebox.showinfo("Fetch Missing Lyrics", "Every song already has lyrics or was tried before.")
+            return
+        self.bulk_fetch = job
+        job.start()
+        self.fetch_missing_button.configure(text=f"Stop (0/{job.total})")
+        self.after(500, self.poll_bulk_fetch, job)
+
+    def poll_bulk_fetch(self, job):
+        """Show the job's progress; saved files reach the song list through the library watcher"""
+        if not job.done():
+            if not job.cancelled.is_set():
+                self.fetch_missing_button.configure(text=f"Stop ({job.finished}/{job.total})")
+            self.after(500, self.poll_bulk_fetch, job)
+            return
 
-        except Exception as e:
-            messagebox.showerror(
-                "Error", f"Failed to extract lyrics: {str(e)}")
+        self.bulk_fetch = None
+        self.fetch_missing_button.configure(text="Fetch Missing", state="normal")
+        counts = job.summary()
+        message = (f"Saved lyrics for {len(job.saved)} songs.\n"
+                   f"Not found: {counts.get('not found', 0)}, "
+                   f"name not 'Artist - Title': {counts.get('unparsed', 0)}, "
+                   f"failed: {counts.get('failed', 0)}.")
+        if job.resumed:
+            message += f"\nResumed a previous run ({job.resumed} songs already done)."
+        if job.cancelled.is_set():
+            message += "\nStopped; fetching again resumes where this left off."
+        if job.errors:
+            message += (f"\n\n{len(job.errors)} errors; songs Genius could not be reached for "
+                        f"are retried next time:\n" + "\n".join(job.errors[:10]))
+        messagebox.showinfo("Fetch Missing Lyrics", message)
 
     def on_mouse_wheel(self, event):
         # Determine the direction and amount to scroll
@@ -1202,22 +1872,16 @@ class AudioMixerApp(ctk.CTk):
 
     def update_scroll_speed(self, value):
         """Updates the scroll speed while adjusting the slider."""
-        if self.auto_scroll_active:
-            self.auto_scroll_lyrics()  # Restart scrolling with new speed
-
-    def auto_scroll_lyrics(self):
-        if self.auto_scroll_active:
-            speed = self.scroll_speed.get()  # Get speed from slider (0.1 to 5)
+        # scroll_lyrics reads the slider on every tick, so there is nothing to restart
 
-            # Convert speed into a smooth movement value
-            scroll_amount = speed / 200  # Adjust for fine control
-            # Scroll by a small fraction of the text height
-            self.lyrics_text.yview_moveto(
-                self.lyrics_text.yview()[0] + scroll_amount)
-
-            # Adjust timing dynamically for smooth effect
-            # 30ms for smoother motion
-            self.after(3000, self.auto_scroll_lyrics)
+    def scroll_lyrics(self, elapsed):
+        """Advance the auto-scroll by the time since the last tick"""
+        top = self.lyrics_text.yview()[0]
+        # Follow a manual scroll; otherwise keep the sub-pixel part Tk rounds away
+        if abs(top - self.scroll_position) > 0.005:
+            self.scroll_position = top
+        self.scroll_position = min(1.0, self.scroll_position + self.scroll_speed.get() * AUTO_SCROLL_RATE * elapsed)
+        self.lyrics_text.yview_moveto(self.scroll_position)
 
     def toggle_auto_scroll(self):
         if self.auto_scroll_active:
@@ -1226,25 +1890,18 @@ class AudioMixerApp(ctk.CTk):
         else:
             self.auto_scroll_active = True
             self.scroll_button.configure(text="Stop Auto-Scroll")
-            self.auto_scroll_lyrics()  # Start scrolling
+            self.scroll_position = self.lyrics_text.yview()[0]
+            self.start_ticks()
 
     def clear_search(self):
         """Reset search and restore full track list."""
+        if self.search_timer:
+            self.after_cancel(self.search_timer)
+            self.search_timer = None
         self.search_entry.delete(0, tk.END)
 
-        # Clear the Treeview (correct way)
-        for item in self.track_list.get_children():
-            self.track_list.delete(item)
-
         # Restore all tracks
-        for track in self.all_tracks:
-            track_path = os.path.join(self.audio_dir, track)
-            has_lyrics = "✔" if os.path.exists(
-                os.path.join(track_path, "lyrics.txt")) else "✘"
-            has_chords = "✔" if os.path.exists(
-                os.path.join(track_path, "chords.txt")) else "✘"
-            self.track_list.insert("", tk.END, values=(
-                track, has_lyrics, has_chords))
+        self.show_tracks(self.all_tracks)
 
 
     def toggle_lyrics_chords(self):
@@ -1292,18 +1949,65 @@ class AudioMixerApp(ctk.CTk):
         file_path = os.path.join(self.current_song_path, self.current_file)
         self.set_font_size()  # Ensure font size is consistent
 
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as file:
-                lines = file.readlines()
-                for line in lines:
-                    # Check if the line is a chord line using regex
-                    chord_line_pattern = r"^\s*([A-G][#b]?(m7|M7|m|dim|aug|sus2|sus4|add9|6|7|9|11|13|/|2| - )?(\s*\(x\))?(\s*\(4x\))?(\s*\(4x\))?(\s*\(hold\))?\s*)+$"
-                    if re.match(chord_line_pattern, line):
-                        self.text_widget.insert(tk.END, line, "chord")
-                    elif any(keyword.lower() in line.strip().lower() for keyword in ["chorus", "intro", "outro", "verse", "adlib", "instrumental", "interlude", "refrain", "bridge", "coda"]):
-                        self.text_widget.insert(tk.END, line, "section")
-                    else:
-                        self.lyrics_text.insert(tk.END, line, "lyrics")
+        spans = self.sheet_cache.load(file_path)
+        if self.current_file == "lyrics.txt" and not any(has_timestamps(text) for _, text in spans or ()):
+            # A timed lyrics.lrc is shown in place of untimed lyrics; saving keeps it in lyrics.txt
+            spans = self.sheet_cache.load(os.path.join(self.current_song_path, LRC_FILE)) or spans
+        if spans:
+            # One insert call with a tag per chord/section/lyric run
+            self.text_widget.insert(tk.END, *insert_args(spans))
+        self.refresh_synced_lyrics()
+
+    def refresh_synced_lyrics(self):
+        """Reread the time tags of the shown text and dim them"""
+        self.synced_lyrics = SyncedLyrics.parse(self.lyrics_text.get("1.0", "end-1c"))
+        self.synced_index = -1
+        self.text_widget.tag_remove("timestamp", "1.0", tk.END)
+        self.text_widget.tag_remove("current_line", "1.0", tk.END)
+        if self.synced_lyrics is None:
+            return
+        for line, end in zip(self.synced_lyrics.lines, self.synced_lyrics.tag_ends):
+            self.text_widget.tag_add("timestamp", f"{line}.0", f"{line}.{end}")
+        self.text_widget.tag_raise("timestamp")
+        self.text_widget.tag_raise("current_line")
+        if self.audio_files:
+            self.update_synced_line(self.engine.get_playback_seconds())
+
+    def update_synced_line(self, position):
+        """Highlight the lyric line being sung at `position` and scroll it into view"""
+        if self.synced_lyrics is None:
+            return
+        index = self.synced_lyrics.index_at(position)
+        if index == self.synced_index:
+            return
+        self.synced_index = index
+        self.text_widget.tag_remove("current_line", "1.0", tk.END)
+        if index >= 0:
+            line = self.synced_lyrics.lines[index]
+            self.text_widget.tag_add("current_line", f"{line}.0", f"{line}.end")
+            self.text_widget.see(f"{line}.0")
+
+    def tap_timestamp(self, event=None):
+        """Stamp the line at the cursor with the playback position and move to the next line.
+
+        Tapping along while the song plays writes the sync points; Save stores them.
+        """
+        if not self.audio_files:
+            return "break"
+        line = int(self.text_widget.index("insert").split(".")[0])
+        text = self.text_widget.get(f"{line}.0", f"{line}.end")
+        self.text_widget.delete(f"{line}.0", f"{line}.{leading_tags(text)}")
+        self.text_widget.insert(f"{line}.0", format_timestamp(self.engine.get_playback_seconds()) + " ")
+
+        # Skip blank lines, so every tap lands on a line that is sung
+        last = int(self.text_widget.index("end-1c").split(".")[0])
+        next_line = line + 1
+        while next_line < last and not self.text_widget.get(f"{next_line}.0", f"{next_line}.end").strip():
+            next_line += 1
+        self.text_widget.mark_set("insert", f"{min(next_line, last)}.0")
+        self.text_widget.see("insert")
+        self.refresh_synced_lyrics()
+        return "break"
 
     def save_text(self):
         if not hasattr(self, 'current_song_path') or not os.path.exists(self.current_song_path):
@@ -1318,7 +2022,13 @@ class AudioMixerApp(ctk.CTk):
                 file.write(text_content)
             messagebox.showinfo(
                 "Success", f"{self.current_file} saved successfully!")
-            self.load_tracks()
+            # Only this song's row can have changed
+            song_name = os.path.basename(self.current_song_path)
+            self.library.refresh_song(song_name)
+            if song_name in self.track_items:
+                self.track_list.item(self.track_items[song_name], values=self.track_values(song_name))
+            self.lyrics_index.update_file(song_name, self.current_file, text_content,
+                                          os.stat(file_path).st_mtime_ns)
             self.load_text()
         except Exception as e:
             messagebox.showerror(
@@ -1328,6 +2038,16 @@ class AudioMixerApp(ctk.CTk):
     def on_close(self):
         self.save_column_widths()
         self.save_settings()
+        self.library_watcher.stop()
+        self.lyrics_index.save()
+        self.engine.load([])
+        self.load_executor.shutdown(wait=False)
+        self.cancel_lyrics_fetch(restore=False)
+        if self.bulk_fetch is not None:
+            # Left unfinished; the state file lets the next run resume it
+            self.bulk_fetch.cancel()
+        self.fetch_executor.shutdown(wait=False)
+        self.lyrics_cache.save()
         self.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,945 @@
+import time
+import threading
+from collections import deque
+import soundfile as sf
+import numpy as np
+from effects import Reverb, Delay, Equalizer
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    # No PortAudio (e.g. a server without a sound card); offline rendering still works
+    sd = None
+
+DEFAULT_BLOCKSIZE = 2048
+# Seconds of audio each streaming stem keeps decoded ahead of the playhead
+STREAM_BUFFER_SECONDS = 4.0
+# Frames the read-ahead thread decodes per disk read
+STREAM_READ_FRAMES = 16384
+# How far past the playhead a stream that fell behind refills from, so the
+# decoded audio lands ahead of the playhead rather than behind it again
+STREAM_SEEK_LEAD_FRAMES = 8192
+# Stem storage precisions. int16 halves memory again and is scaled in the callback.
+SAMPLE_FORMATS = ("float32", "int16")
+DEFAULT_SAMPLE_FORMAT = "float32"
+INT16_SCALE = 1.0 / 32768.0
+# How long the reverb keeps running after the last stem stops sending to it
+REVERB_TAIL_SECONDS = 5.0
+# Frames over which a seek during playback fades from the old position to the new one
+SEEK_CROSSFADE_FRAMES = 512
+# Callback timing histogram: 50 us bins up to 200 ms; slower callbacks land in the last bin
+TIMING_BIN_US = 50
+TIMING_BINS = 4000
+# Level meters accumulate [peak, sum of squares, samples] until the UI takes them
+METER_PEAK, METER_SUM_SQUARES, METER_SAMPLES = range(3)
+
+
+def format_time(seconds):
+    """Format seconds as MM:SS"""
+    minutes = int(seconds // 60)
+    seconds = int(seconds % 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class StreamingReader:
+    """Decodes a file block by block into a ring buffer ahead of the playhead.
+
+    The read-ahead thread is the only writer of write_count and the audio
+    callback the only writer of read_count, so neither side takes a lock.
+    """
+
+    def __init__(self, file_path, buffer_seconds=STREAM_BUFFER_SECONDS, dtype=DEFAULT_SAMPLE_FORMAT):
+        self.file = sf.SoundFile(file_path)
+        self.samplerate = self.file.samplerate
+        self.channels = self.file.channels
+        self.frames = self.file.frames
+        self.capacity = max(int(buffer_seconds * self.samplerate), STREAM_READ_FRAMES * 2)
+        self.ring = np.zeros((self.capacity, self.channels), dtype=dtype)
+        self.scratch = np.zeros((DEFAULT_BLOCKSIZE, self.channels), dtype=dtype)
+        # File frame that sits at ring index 0 of the current fill
+        self.base_frame = 0
+        self.read_count = 0
+        self.write_count = 0
+        self.seek_request = None
+        self.underruns = 0
+        self.closed = False
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._fill_loop, daemon=True)
+        self.thread.start()
+
+    def request_seek(self, frame):
+        """Ask the read-ahead thread to refill the buffer from `frame`"""
+        self.seek_request = frame
+        self.wake.set()
+
+    def read(self, position, frames):
+        """Copy up to `frames` buffered frames starting at `position`. Never blocks.
+
+        The engine advances the playhead by whole blocks even when a read comes
+        back short, so `position` can be ahead of the read point. Frames that
+        are already buffered are skipped over; otherwise the buffer is refilled
+        from a little past the playhead.
+        """
+        if self.seek_request is not None:
+            return self.scratch[:0]
+        expected = self.base_frame + self.read_count
+        if position != expected:
+            if expected < position < self.base_frame + self.write_count:
+                # Drop the frames the playhead has already gone past
+                self.read_count = position - self.base_frame
+            elif self.read_count == 0 and self.base_frame - STREAM_SEEK_LEAD_FRAMES <= position < self.base_frame:
+                # Refilled ahead of the playhead; silence until it gets there
+                return self.scratch[:0]
+            else:
+                self.underruns += 1
+                self.request_seek(min(position + STREAM_SEEK_LEAD_FRAMES, self.frames))
+                return self.scratch[:0]
+
+        wanted = min(frames, self.frames - position)
+        count = min(wanted, self.write_count - self.read_count)
+        if count < wanted:
+            self.underruns += 1
+        if len(self.scratch) < count:
+            self.scratch = np.zeros((count, self.channels), dtype=self.ring.dtype)
+
+        start = self.read_count % self.capacity
+        first = min(count, self.capacity - start)
+        self.scratch[:first] = self.ring[start:start + first]
+        self.scratch[first:count] = self.ring[:count - first]
+        self.read_count += count
+        self.wake.set()
+        return self.scratch[:count]
+
+    def _fill_loop(self):
+        while not self.closed:
+            pending = self.seek_request
+            if pending is not None:
+                self.file.seek(pending)
+                self.read_count = 0
+                self.write_count = 0
+                self.base_frame = pending
+                if self.seek_request == pending:
+                    self.seek_request = None
+                continue
+
+            free = self.capacity - (self.write_count - self.read_count)
+            remaining = self.frames - (self.base_frame + self.write_count)
+            count = min(free, remaining, STREAM_READ_FRAMES)
+            if count <= 0:
+                self.wake.wait(0.05)
+                self.wake.clear()
+                continue
+
+            # Read straight into the ring, split at the wrap point
+            start = self.write_count % self.capacity
+            count = min(count, self.capacity - start)
+            got = self.file.read(count, always_2d=True, out=self.ring[start:start + count])
+            if len(got) == 0:
+                # The header overstated the length; stop where the data ends
+                self.frames = self.base_frame + self.write_count
+                continue
+            if self.seek_request is None:
+                self.write_count += len(got)
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        self.thread.join(timeout=1.0)
+        self.file.close()
+
+
+def accumulate_level(meter, block):
+    """Fold a block's peak and energy into a meter. Runs on the audio thread.
+
+    Three passes over the block and no allocation for contiguous blocks.
+    argmax/argmin rather than max/min: ufunc reductions set up an iterator
+    that allocates on every call.
+    """
+    flat = block.reshape(-1)
+    if not flat.size:
+        return
+    peak = max(flat[flat.argmax()], -flat[flat.argmin()])
+    if peak > meter[METER_PEAK]:
+        meter[METER_PEAK] = peak
+    meter[METER_SUM_SQUARES] += np.dot(flat, flat)
+    meter[METER_SAMPLES] += flat.size
+
+
+def take_level(meter):
+    """(peak, rms) since the last call, resetting the meter.
+
+    The audio thread writes meters without a lock; a block that lands between
+    the read and the reset is lost, which a meter can afford.
+    """
+    peak, sum_squares, samples = meter.tolist()
+    meter.fill(0)
+    rms = (sum_squares / samples) ** 0.5 if samples else 0.0
+    return peak, rms
+
+
+class SoundDevice:
+    """A passive stem source. The MixerEngine pulls processed blocks from it."""
+
+    def __init__(self, file_path, streaming=False, cache=None, sample_format=DEFAULT_SAMPLE_FORMAT):
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unsupported sample format: {sample_format}")
+        self.file_path = file_path
+        self.sample_format = sample_format
+        # Factor that maps stored samples to -1.0..1.0 floats
+        self.scale = INT16_SCALE if sample_format == "int16" else 1.0
+        if streaming:
+            # Decode on demand through a bounded ring buffer
+            self.reader = StreamingReader(file_path, dtype=sample_format)
+            self.data = None
+            self.samplerate = self.reader.samplerate
+            self.frames = self.reader.frames
+            self.channels = self.reader.channels
+        else:
+            self.reader = None
+            self.data, self.samplerate = self._decode(file_path, cache)
+            self.frames = len(self.data)
+            self.channels = self.data.shape[1]
+        self._init_mix_state()
+
+    @classmethod
+    def from_array(cls, data, samplerate, name="<array>"):
+        """Wrap samples that are already decoded, shaped (frames, channels)"""
+        if data.dtype.name not in SAMPLE_FORMATS:
+            raise ValueError(f"Unsupported sample format: {data.dtype.name}")
+        stem = cls.__new__(cls)
+        stem.file_path = name
+        stem.sample_format = data.dtype.name
+        stem.scale = INT16_SCALE if stem.sample_format == "int16" else 1.0
+        stem.reader = None
+        stem.data = data
+        stem.samplerate = samplerate
+        stem.frames = len(data)
+        stem.channels = data.shape[1]
+        stem._init_mix_state()
+        return stem
+
+    def _init_mix_state(self):
+        # Float32 blocks handed to the engine; grown only if a bigger block is asked for
+        self.work = np.zeros((DEFAULT_BLOCKSIZE, self.channels), dtype=np.float32)
+        # Whether this stem contributes to the mix
+        self.playing = False
+        self.volume = 1.0
+        # Total duration in seconds
+        self.duration = self.frames / self.samplerate
+        # For effects
+        self.reverb_amount = 0.0
+        self.delay_amount = 0.0
+        self.effects_enabled = True  # Default to off
+        # Level after volume, filled by the engine; read with take_level
+        self.meter = np.zeros(3, dtype=np.float64)
+
+    def _decode(self, file_path, cache):
+        """Decode the whole file, going through the PCM cache when one is given"""
+        if cache is None or not cache.handles(file_path):
+            return sf.read(file_path, always_2d=True, dtype=self.sample_format)
+
+        cached = cache.load(file_path, self.sample_format)
+        if cached is not None:
+            return cached
+
+        data, samplerate = sf.read(file_path, always_2d=True, dtype=self.sample_format)
+        try:
+            cache.store(file_path, data, samplerate)
+        except OSError as e:
+            print(f"PCM cache write error: {e}")
+            return data, samplerate
+        # Reopen as a memmap so the samples live in the shared page cache
+        return cache.load(file_path, self.sample_format) or (data, samplerate)
+
+    def get_duration_seconds(self):
+        """Get total duration in seconds"""
+        return self.duration
+
+    def format_time(self, seconds):
+        """Format seconds as MM:SS"""
+        return format_time(seconds)
+
+    def seek(self, frame):
+        """Tell the stem the playhead jumped to `frame`"""
+        if self.reader is not None:
+            self.reader.request_seek(frame)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+
+    def read(self, position, frames):
+        """Return up to `frames` processed float32 frames starting at `position`.
+
+        The result is a view of a reused buffer, valid until the next call.
+        Effects and EQ are not applied here; the engine feeds reverb and delay
+        through sends and equalizes the master bus.
+        """
+        if self.reader is not None:
+            current_chunk = self.reader.read(position, frames)
+        else:
+            end_pos = min(position + frames, self.frames)
+            current_chunk = self.data[position:end_pos]
+
+        count = len(current_chunk)
+        if len(self.work) < count:
+            self.work = np.zeros((count, self.channels), dtype=np.float32)
+        out = self.work[:count]
+
+        # Volume and int16 scaling fold into one multiply. Casting inside a ufunc
+        # allocates a temporary, so int16 is widened with copyto and scaled in place.
+        gain = self.volume * self.scale
+        if current_chunk.dtype == np.float32:
+            np.multiply(current_chunk, gain, out=out)
+        else:
+            np.copyto(out, current_chunk, casting="unsafe")
+            np.multiply(out, gain, out=out)
+        return out
+
+    def set_volume(self, volume):
+        self.volume = float(volume)
+
+    def get_volume(self):
+        return self.volume
+
+    # Add methods for effects
+    def set_reverb(self, amount):
+        """Set reverb send amount (0.0 - 1.0)"""
+        self.reverb_amount = max(0.0, min(1.0, amount))
+
+    def set_delay(self, amount):
+        """Set delay send amount (0.0 - 1.0)"""
+        self.delay_amount = max(0.0, min(1.0, amount))
+
+
+class CallbackStats:
+    """Xrun counters and a histogram of callback durations.
+
+    The audio callback is the only writer and only bumps integers in a list
+    that is allocated up front, so it never takes a lock. Readers copy the
+    histogram and may see a block-old snapshot, which is fine for diagnostics.
+    """
+
+    def __init__(self):
+        self.histogram = [0] * TIMING_BINS
+        self.samplerate = 44100
+        self.reset()
+
+    def reset(self):
+        for i in range(TIMING_BINS):
+            self.histogram[i] = 0
+        self.callbacks = 0
+        self.underflows = 0
+        self.overflows = 0
+        self.late = 0
+        self.max_ns = 0
+        self.last_error = None
+
+    def record_status(self, status):
+        """Count the xrun flags PortAudio passes to the callback"""
+        if status.output_underflow:
+            self.underflows += 1
+        if status.output_overflow:
+            self.overflows += 1
+
+    def record(self, elapsed_ns, frames):
+        """Add one callback duration. Runs on the audio thread."""
+        self.callbacks += 1
+        index = elapsed_ns // (TIMING_BIN_US * 1000)
+        self.histogram[index if index < TIMING_BINS else TIMING_BINS - 1] += 1
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        # Slower than real time: the next block will be late unless the device buffer absorbs it
+        if elapsed_ns * self.samplerate > frames * 1000000000:
+            self.late += 1
+
+    def percentile_ms(self, fraction):
+        """Upper edge of the histogram bin holding the given fraction of callbacks"""
+        counts = np.array(self.histogram)
+        total = counts.sum()
+        if total == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(counts), fraction * total))
+        return (min(index, TIMING_BINS - 1) + 1) * TIMING_BIN_US / 1000.0
+
+    def snapshot(self):
+        """Current counters and timing percentiles as a dict"""
+        return {
+            "callbacks": self.callbacks,
+            "underflows": self.underflows,
+            "overflows": self.overflows,
+            "late": self.late,
+            "p50_ms": self.percentile_ms(0.50),
+            "p99_ms": self.percentile_ms(0.99),
+            "max_ms": self.max_ns / 1e6,
+            "last_error": self.last_error
+        }
+
+
+class QueuedSong:
+    """A setlist song waiting to follow the current one, with its crossfade.
+
+    Built completely before the engine publishes it, so the callback always
+    sees stems, length and fade curves that belong together. Only `position`
+    changes afterwards, advanced by the callback as the song fades in.
+    """
+
+    def __init__(self, stems, crossfade_frames):
+        self.stems = stems
+        self.length = max(stem.frames for stem in stems)
+        self.crossfade_frames = crossfade_frames
+        # Equal-power curves, so the level stays steady through the fade
+        curve = np.linspace(0.0, np.pi / 2, crossfade_frames, dtype=np.float32)[:, None]
+        self.fade_in = np.sin(curve)
+        self.fade_out = np.cos(curve)
+        self.position = 0
+
+
+class MixerEngine:
+    """Owns the single output stream and sums every stem from one shared playhead"""
+
+    def __init__(self, blocksize=DEFAULT_BLOCKSIZE):
+        self.blocksize = blocksize
+        self.stems = []
+        self.samplerate = 44100
+        self.channels = 2
+        self.length = 0
+        self.position = 0
+        self.playing = False
+        self.paused = False
+        self.stream = None
+        self.lock = threading.Lock()
+        # One reverb shared by all stems, fed through per-stem sends
+        self.reverb = Reverb(self.samplerate, self.channels, blocksize=blocksize)
+        self.reverb_tail = 0
+        # Likewise one delay line; the stems' direct signal is the dry path
+        self.delay = Delay(self.samplerate, self.channels)
+        self.delay_tail = 0
+        # The EQ settings are shared by every stem, so one filter on the master bus covers them all
+        self.eq = Equalizer(self.samplerate, self.channels, blocksize)
+        self.eq_enabled = True
+        self.stats = CallbackStats()
+        # Seeks requested by the UI thread as (serial, frame, scrub). The callback
+        # applies the newest one at its next block boundary, so a burst of slider
+        # events costs at most one jump per block and every stem moves together.
+        self.seek_request = None
+        self.seek_serial = 0
+        self.seek_applied = 0
+        self.fade_in = np.linspace(0.0, 1.0, SEEK_CROSSFADE_FRAMES, dtype=np.float32)[:, None]
+        self.fade_out = 1.0 - self.fade_in
+        # Scrub grains are one block long, shaped by a Hann window so they start and end silent
+        self.grain_window = np.hanning(blocksize).astype(np.float32)[:, None]
+        # Setlist: the next song (a QueuedSong), mixed in as the current song ends.
+        # The stems of songs it replaced wait in finished_stems for the Tk thread
+        # to close; deque append and popleft are atomic, so neither side locks.
+        # song_serial counts the switches so the UI can follow along.
+        self.next_song = None
+        self.finished_stems = deque()
+        self.song_serial = 0
+        # Output level, and whether the callback meters the stems and master at all
+        self.master_meter = np.zeros(3, dtype=np.float64)
+        self.metering = True
+        self._allocate(blocksize)
+
+    def _allocate(self, frames):
+        self.send = np.zeros((frames, self.channels), dtype=np.float32)
+        self.delay_send = np.zeros_like(self.send)
+        self.wet = np.zeros_like(self.send)
+        self.scaled = np.zeros_like(self.send)
+        self.fade = np.zeros((SEEK_CROSSFADE_FRAMES, self.channels), dtype=np.float32)
+        self.incoming = np.zeros_like(self.send)
+        self.incoming_send = np.zeros_like(self.send)
+        self.incoming_delay_send = np.zeros_like(self.send)
+
+    def load(self, stems):
+        """Replace the current stems. Stops playback first."""
+        self.stop()
+        for stem in self.stems + self.take_finished_stems() + (self.clear_next() or []):
+            stem.close()
+        stems = list(stems)
+        if stems:
+            self.samplerate = stems[0].samplerate
+            for stem in stems:
+                if stem.samplerate != self.samplerate:
+                    raise ValueError(
+                        f"{stem.file_path} is {stem.samplerate} Hz, expected {self.samplerate} Hz")
+            self.channels = max(stem.channels for stem in stems)
+            self.length = max(stem.frames for stem in stems)
+        else:
+            self.length = 0
+        self.reverb = Reverb(self.samplerate, self.channels, self.reverb.room_size,
+                             self.reverb.damping, blocksize=self.blocksize)
+        self.reverb_tail = 0
+        delay = self.delay
+        self.delay = Delay(self.samplerate, self.channels, delay.time_ms, delay.feedback, delay.wet)
+        self.delay_tail = 0
+        eq = self.eq
+        self.eq = Equalizer(self.samplerate, self.channels, self.blocksize)
+        self.eq.set_gains(eq.low, eq.mid, eq.high)
+        self._allocate(self.blocksize)
+        self.stats.samplerate = self.samplerate
+        # Swap the list in one assignment so the callback never sees a partial update
+        self.stems = stems
+
+    def process_block(self, outdata, frames):
+        """Mix `frames` frames from the playhead into outdata. Returns frames written.
+
+        Runs on the audio thread, so everything it touches is preallocated and
+        updated in place; no sample buffer is allocated in the steady state.
+        """
+        outdata.fill(0)
+        start = self.position
+        end = max(start, min(start + frames, self.length))
+        count = end - start
+        incoming = self.next_song
+        # With a song queued, a playhead already at the end still hands over to it
+        if count <= 0 and incoming is None:
+            return 0
+        if len(self.send) < frames:
+            self._allocate(frames)
+        send = self.send[:frames]
+        send.fill(0)
+        delay_send = self.delay_send[:frames]
+        delay_send.fill(0)
+        sending, delaying = self._mix_stems(self.stems, start, count, outdata, send, delay_send)
+        self.position = end
+
+        # A queued song joins before the buses, so it gets the reverb, delay and EQ too
+        if incoming is not None:
+            count, next_sending, next_delaying = self._mix_next_song(
+                outdata, frames, start, count, incoming)
+            sending = sending or next_sending
+            delaying = delaying or next_delaying
+
+        self._process_buses(outdata, frames, sending, delaying)
+        return count
+
+    def _mix_stems(self, stems, start, count, dry, send, delay_send):
+        """Add `count` frames of each playing stem from `start` to the dry bus and sends.
+
+        Returns whether anything was sent to the reverb and to the delay.
+        """
+        sending = False
+        delaying = False
+        metering = self.metering
+        for stem in stems:
+            if not stem.playing or start >= stem.frames:
+                continue
+            chunk = stem.read(start, count)
+            self._mix_into(dry, chunk)
+            if metering:
+                accumulate_level(stem.meter, chunk)
+
+            if stem.effects_enabled and stem.reverb_amount > 0:
+                scaled = self.scaled[:len(chunk), :chunk.shape[1]]
+                np.multiply(chunk, stem.reverb_amount, out=scaled)
+                self._mix_into(send, scaled)
+                sending = True
+
+            if stem.effects_enabled and stem.delay_amount > 0:
+                scaled = self.scaled[:len(chunk), :chunk.shape[1]]
+                np.multiply(chunk, stem.delay_amount, out=scaled)
+                self._mix_into(delay_send, scaled)
+                delaying = True
+        return sending, delaying
+
+    def process_tail(self, outdata, frames):
+        """Render the reverb and delay tails after the stems have ended.
+
+        Returns False once there is no tail left to render.
+        """
+        outdata.fill(0)
+        if self.reverb_tail <= 0 and self.delay_tail <= 0:
+            return False
+        if len(self.send) < frames:
+            self._allocate(frames)
+        self.send[:frames].fill(0)
+        self.delay_send[:frames].fill(0)
+        self._process_buses(outdata, frames, False, False)
+        return True
+
+    def _process_buses(self, outdata, frames, sending, delaying):
+        """Add the reverb and delay returns to outdata, then equalize the master"""
+        send = self.send[:frames]
+        delay_send = self.delay_send[:frames]
+
+        # Keep the reverb running until its tail has died away
+        if sending:
+            self.reverb_tail = int(REVERB_TAIL_SECONDS * self.samplerate)
+        if self.reverb_tail > 0:
+            wet = self.reverb.process(send, self.wet[:frames])
+            np.add(outdata, wet, out=outdata)
+            self.reverb_tail -= frames
+
+        if delaying:
+            self.delay_tail = self.delay.tail_frames()
+        if self.delay_tail > 0:
+            echoes = self.delay.process(delay_send, self.wet[:frames])
+            np.add(outdata, echoes, out=outdata)
+            self.delay_tail -= frames
+
+        if self.eq_enabled:
+            self.eq.process(outdata[:frames])
+
+    @staticmethod
+    def _mix_into(bus, chunk):
+        """Add a stem block into a bus"""
+        n = len(chunk)
+        if chunk.shape[1] == 1:
+            # Mono stems are spread over every output channel. A broadcast add
+            # would allocate a temporary, so add one channel at a time.
+            for channel in range(bus.shape[1]):
+                np.add(bus[:n, channel], chunk[:, 0], out=bus[:n, channel])
+        else:
+            bus[:n, :chunk.shape[1]] += chunk
+
+    def _callback(self, outdata, frames, time_info, status):
+        try:
+            finished = self._render_callback(outdata, frames, status)
+        except Exception as e:
+            # PortAudio aborts the stream; keep the reason for the diagnostics panel
+            self.stats.last_error = repr(e)
+            self.playing = False
+            outdata.fill(0)
+            raise
+        if finished:
+            raise sd.CallbackStop
+
+    def _render_callback(self, outdata, frames, status):
+        """Fill one block. Returns True once the song has ended."""
+        started = time.perf_counter_ns()
+        if status:
+            self.stats.record_status(status)
+        request = self.seek_request
+        seeking = request is not None and request[0] != self.seek_applied
+        if seeking:
+            self.seek_applied, frame, scrub = request
+
+        if self.paused or not self.playing:
+            outdata.fill(0)
+            if seeking:
+                self._move_playhead(frame)
+                if scrub and self.paused:
+                    self._play_grain(outdata, frames)
+            return False
+
+        if self.position >= self.length and self.next_song is None and not seeking:
+            # Past the end of the longest stem; let the reverb and delay ring out
+            written = frames if self.process_tail(outdata, frames) else 0
+        else:
+            fade_frames = min(frames, SEEK_CROSSFADE_FRAMES)
+            if seeking:
+                # Render the start of the block from the old position to fade out from,
+                # old echoes included, then clear the tails so they stop at the jump.
+                # The EQ keeps its state; it holds no echoes.
+                self.process_block(self.fade[:fade_frames], fade_frames)
+                self._seek_stems(frame)
+                self._clear_tails()
+            written = self.process_block(outdata, frames)
+            if seeking:
+                self._crossfade(outdata, fade_frames)
+        if self.metering:
+            accumulate_level(self.master_meter, outdata)
+        self.stats.record(time.perf_counter_ns() - started, frames)
+        if written < frames and self.reverb_tail <= 0 and self.delay_tail <= 0:
+            # The song and its effect tails are over
+            self.playing = False
+            self._move_playhead(0)
+            return True
+        return False
+
+    def _mix_next_song(self, outdata, frames, block_start, written, incoming):
+        """Bring in the queued song over the end of the current one.
+
+        The current song fades out and the next fades in over the last
+        crossfade_frames (equal power); with no crossfade the next song simply
+        starts at the first frame after the current one ends. The fades apply
+        to the dry mix and to both effect sends. Once the current song is over
+        the stems are swapped. Returns (frames written, sending, delaying).
+        """
+        fade_start = self.length - incoming.crossfade_frames
+        # A block ending exactly on the last frame still hands over, or the stream would stop
+        if block_start + frames <= fade_start and block_start + frames < self.length:
+            return written, False, False
+
+        # Block offsets where the next song starts and where the current one ends
+        first = max(0, fade_start - block_start)
+        current_end = max(first, min(frames, self.length - block_start))
+        count = frames - first
+        mix = self.incoming[:count]
+        mix.fill(0)
+        send = self.incoming_send[:count]
+        send.fill(0)
+        delay_send = self.incoming_delay_send[:count]
+        delay_send.fill(0)
+        sending, delaying = self._mix_stems(incoming.stems, incoming.position, count, mix, send, delay_send)
+
+        buses = ((outdata, mix), (self.send, send), (self.delay_send, delay_send))
+        fading = current_end - first
+        if fading > 0:
+            ramp = slice(block_start + first - fade_start, block_start + current_end - fade_start)
+            fade_out = incoming.fade_out[ramp]
+            fade_in = incoming.fade_in[ramp]
+            for bus, incoming_bus in buses:
+                out = bus[first:current_end]
+                np.multiply(out, fade_out, out=out)
+                np.multiply(incoming_bus[:fading], fade_in, out=incoming_bus[:fading])
+        for bus, incoming_bus in buses:
+            np.add(bus[first:frames], incoming_bus, out=bus[first:frames])
+        incoming.position += count
+
+        if block_start + frames >= self.length:
+            # The current song is over. The Tk thread closes its stems.
+            self.finished_stems.append(self.stems)
+            self.next_song = None
+            self.stems = incoming.stems
+            self.length = incoming.length
+            self.position = incoming.position
+            self.song_serial += 1
+        return frames, sending, delaying
+
+    def queue_next(self, stems, crossfade_seconds=0.0):
+        """Queue already decoded stems to follow the current song.
+
+        They must match the current sample rate and fit in the open stream's
+        channels, since the switch happens inside the running stream.
+        """
+        stems = list(stems)
+        if not stems:
+            raise ValueError("No stems to queue")
+        for stem in stems:
+            if stem.samplerate != self.samplerate:
+                raise ValueError(
+                    f"{stem.file_path} is {stem.samplerate} Hz, the playing song is {self.samplerate} Hz")
+            if stem.channels > self.channels:
+                raise ValueError(
+                    f"{stem.file_path} has {stem.channels} channels, the playing song has {self.channels}")
+            stem.playing = True
+        # Replacing the queued song is one assignment, never a clear and a re-queue,
+        # so the callback can't find nothing queued at the end of the song
+        self.next_song = self._queued_song(stems, crossfade_seconds)
+
+    def _queued_song(self, stems, crossfade_seconds):
+        longest = max(stem.frames for stem in stems)
+        crossfade = int(crossfade_seconds * self.samplerate)
+        return QueuedSong(stems, max(0, min(crossfade, self.length, longest)))
+
+    def set_crossfade(self, crossfade_seconds):
+        """Change the queued song's crossfade, unless either fade would already have begun.
+
+        Returns whether the new crossfade applies.
+        """
+        queued = self.next_song
+        if queued is None:
+            return False
+        song = self._queued_song(queued.stems, crossfade_seconds)
+        fade_start = self.length - max(queued.crossfade_frames, song.crossfade_frames)
+        if queued.position or self.position >= fade_start:
+            return False
+        self.next_song = song
+        return True
+
+    def clear_next(self):
+        """Unqueue the next song. Returns its stems for the caller to close."""
+        queued = self.next_song
+        self.next_song = None
+        return queued.stems if queued is not None else None
+
+    def take_finished_stems(self):
+        """Stems of songs the setlist has moved past, for closing off the audio thread"""
+        stems = []
+        while True:
+            try:
+                stems.extend(self.finished_stems.popleft())
+            except IndexError:
+                return stems
+
+    def _crossfade(self, outdata, frames):
+        """Blend the block rendered from the old position into the start of outdata"""
+        out = outdata[:frames]
+        fade = self.fade[:frames]
+        np.multiply(out, self.fade_in[:frames], out=out)
+        np.multiply(fade, self.fade_out[:frames], out=fade)
+        np.add(out, fade, out=out)
+
+    def _play_grain(self, outdata, frames):
+        """Play one windowed block from the playhead, then return to it"""
+        if frames > len(self.grain_window):
+            return
+        start = self.position
+        self.process_block(outdata, frames)
+        np.multiply(outdata, self.grain_window[:frames], out=outdata)
+        self._seek_stems(start)
+
+    def _open_stream(self):
+        self._close_stream()
+        # A seek the last stream stopped before reaching is applied here
+        request = self.seek_request
+        self.seek_request = None
+        if request is not None and request[0] != self.seek_applied:
+            self.seek_applied = request[0]
+            self._move_playhead(request[1])
+        if sd is None:
+            raise RuntimeError("sounddevice/PortAudio is not available")
+        self.stream = sd.OutputStream(
+            samplerate=self.samplerate,
+            blocksize=self.blocksize,
+            channels=self.channels,
+            callback=self._callback
+        )
+        self.stream.start()
+
+    def _close_stream(self):
+        if self.stream is not None:
+            try:
+                self.stream.stop()
+                self.stream.close()
+            except Exception as e:
+                print(f"Audio stream close error: {e}")
+            self.stream = None
+
+    def play(self, stems=None):
+        """Start playback. `stems` limits which stems are switched on (default: all)."""
+        if not self.stems:
+            return
+        for stem in (self.stems if stems is None else stems):
+            stem.playing = True
+
+        with self.lock:
+            if self.playing:
+                self.paused = False
+                return
+            self.playing = True
+            self.paused = False
+            try:
+                self._open_stream()
+            except Exception as e:
+                print(f"Audio playback error: {e}")
+                self.stats.last_error = str(e)
+                self.playing = False
+
+    def pause(self):
+        self.paused = True
+
+    def unpause(self):
+        self.paused = False
+
+    def stop(self):
+        with self.lock:
+            self.playing = False
+            self.paused = False
+            self._close_stream()
+            self._move_playhead(0)
+            for stem in self.stems:
+                stem.playing = False
+
+    def seek(self, position_percent, scrub=False):
+        """Seek all stems to a position based on percentage (0.0-1.0).
+
+        While the stream runs the jump happens on the audio thread at the next
+        block boundary, crossfaded when playing. With `scrub` set and playback
+        paused, a short grain is played from the new position. A stream left
+        open by a song that ended on its own no longer calls back, so then the
+        playhead moves here.
+        """
+        position_percent = max(0.0, min(1.0, position_percent))
+        frame = int(self.length * position_percent)
+        if self.stream is None or not self.playing:
+            self._move_playhead(frame)
+            return
+        self.seek_serial += 1
+        self.seek_request = (self.seek_serial, frame, scrub)
+
+    def _seek_stems(self, frame):
+        self.position = frame
+        for stem in self.stems:
+            stem.seek(frame)
+        # Seeking back out of a crossfade restarts the queued song from its top
+        queued = self.next_song
+        if queued is not None and queued.position:
+            queued.position = 0
+            for stem in queued.stems:
+                stem.seek(0)
+
+    def _move_playhead(self, frame):
+        """Jump without a crossfade, clearing the effects"""
+        self._seek_stems(frame)
+        self._clear_tails()
+        self.eq.reset()
+
+    def _clear_tails(self):
+        # Effect tails from the old position would smear across the jump
+        self.reverb.reset()
+        self.reverb_tail = 0
+        self.delay.reset()
+        self.delay_tail = 0
+
+    def set_reverb_room_size(self, room_size):
+        """Set reverb room size (0.0 - 1.0)"""
+        self.reverb.set_room_size(room_size)
+
+    def set_reverb_damping(self, damping):
+        """Set reverb damping (0.0 - 1.0)"""
+        self.reverb.set_damping(damping)
+
+    def set_eq(self, low=None, mid=None, high=None):
+        """Set master EQ bands (0.0 - 2.0 for each band, 1.0 is flat)"""
+        self.eq.set_gains(low, mid, high)
+
+    def set_delay_time(self, time_ms):
+        """Set the delay time in milliseconds"""
+        self.delay.set_time(time_ms)
+
+    def set_delay_tempo(self, bpm, beats=1.0):
+        """Sync the delay time to a tempo in BPM"""
+        self.delay.set_tempo(bpm, beats)
+
+    def set_delay_feedback(self, feedback):
+        """Set the delay feedback (0.0 - 0.95)"""
+        self.delay.set_feedback(feedback)
+
+    def set_delay_wet(self, wet):
+        """Set the level of the delay echoes (0.0 - 1.0)"""
+        self.delay.set_wet(wet)
+
+    def get_diagnostics(self):
+        """Xrun counts and callback timing (p50/p99/max in ms) since the last reset"""
+        stats = self.stats.snapshot()
+        stats["budget_ms"] = self.blocksize / self.samplerate * 1000.0
+        # Streaming stems whose read-ahead fell behind and played silence
+        stats["stream_underruns"] = sum(stem.reader.underruns for stem in self.stems
+                                        if stem.reader is not None)
+        return stats
+
+    def reset_diagnostics(self):
+        self.stats.reset()
+        for stem in self.stems:
+            if stem.reader is not None:
+                stem.reader.underruns = 0
+
+    def get_position_seconds(self):
+        """Get current playback position in seconds"""
+        return self.position / self.samplerate
+
+    def get_playback_seconds(self):
+        """Position being heard now: the playhead less what is still queued in the output.
+
+        The playhead runs a buffer ahead of the speakers, so UI clocks read this
+        instead to stay in step with the audio.
+        """
+        position = self.position
+        stream = self.stream
+        if stream is not None and self.playing and not self.paused:
+            try:
+                position -= stream.latency * self.samplerate
+            except Exception:
+                pass
+        return max(0, position) / self.samplerate
+
+    def get_duration_seconds(self):
+        """Get total duration in seconds"""
+        return self.length / self.samplerate
+
+    def format_time(self, seconds):
+        """Format seconds as MM:SS"""
+        return format_time(seconds)
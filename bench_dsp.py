@@ -0,0 +1,203 @@
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import subprocess
+import tracemalloc
+import numpy as np
+from audio_engine import SoundDevice, MixerEngine, accumulate_level
+
+EFFECT_SETS = {
+    "none": (),
+    "reverb": ("reverb",),
+    "delay": ("delay",),
+    "eq": ("eq",),
+    "all": ("reverb", "delay", "eq"),
+}
+DEFAULT_STEMS = [1, 4, 8, 16]
+DEFAULT_BLOCKSIZES = [256, 512, 1024, 2048]
+DEFAULT_SAMPLERATES = [44100, 48000]
+# Seconds of synthetic audio per stem; the playhead wraps when it reaches the end
+STEM_SECONDS = 10.0
+
+
+def synthetic_stems(count, samplerate, sample_format, seed=0):
+    """Noise stems, alternating stereo and mono like a typical session"""
+    rng = np.random.default_rng(seed)
+    frames = int(STEM_SECONDS * samplerate)
+    stems = []
+    for i in range(count):
+        channels = 2 if i % 4 != 3 else 1
+        data = (rng.standard_normal((frames, channels)) * 0.1).astype(np.float32)
+        if sample_format == "int16":
+            data = (data * 32767).astype(np.int16)
+        stem = SoundDevice.from_array(data, samplerate, name=f"stem{i}")
+        stem.playing = True
+        stems.append(stem)
+    return stems
+
+
+def build_engine(stem_count, blocksize, samplerate, effects, sample_format, metering=True):
+    engine = MixerEngine(blocksize=blocksize)
+    engine.metering = metering
+    engine.load(synthetic_stems(stem_count, samplerate, sample_format))
+    for stem in engine.stems:
+        stem.playing = True
+        stem.set_reverb(0.3 if "reverb" in effects else 0.0)
+        stem.set_delay(0.3 if "delay" in effects else 0.0)
+    engine.eq_enabled = "eq" in effects
+    if "eq" in effects:
+        engine.set_eq(low=1.4, mid=0.7, high=1.2)
+    return engine
+
+
+def run_blocks(engine, outdata, blocks, times=None):
+    """Time each process_block call plus the callback's master metering, in seconds.
+
+    Pass `times` to reuse a buffer, e.g. when measuring allocations.
+    """
+    if times is None:
+        times = np.empty(blocks)
+    blocksize = len(outdata)
+    for i in range(blocks):
+        if engine.position + blocksize > engine.length:
+            engine.position = 0
+        started = time.perf_counter()
+        engine.process_block(outdata, blocksize)
+        if engine.metering:
+            accumulate_level(engine.master_meter, outdata)
+        times[i] = time.perf_counter() - started
+    return times
+
+
+def measure_allocations(engine, outdata, blocks):
+    """Peak traced bytes above the baseline while running steady-state blocks"""
+    # Allocated before tracing starts so the timings don't count as allocations
+    times = np.empty(blocks)
+    tracemalloc.start()
+    try:
+        run_blocks(engine, outdata, 2, times)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        run_blocks(engine, outdata, blocks, times)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def bench_case(stem_count, blocksize, samplerate, effect_set, args):
+    engine = build_engine(stem_count, blocksize, samplerate, EFFECT_SETS[effect_set], args.sample_format,
+                          metering=not args.no_meters)
+    outdata = np.zeros((blocksize, engine.channels), dtype=np.float32)
+    run_blocks(engine, outdata, args.warmup)
+    times = run_blocks(engine, outdata, args.blocks) * 1000.0
+
+    budget_ms = blocksize / samplerate * 1000.0
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    result = {
+        "stems": stem_count,
+        "blocksize": blocksize,
+        "samplerate": samplerate,
+        "effects": effect_set,
+        "budget_ms": round(budget_ms, 4),
+        "p50_ms": round(float(p50), 4),
+        "p90_ms": round(float(p90), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(times.max()), 4),
+        "p99_load": round(float(p99 / budget_ms), 4),
+        "over_budget": int((times > budget_ms).sum()),
+    }
+    if args.check_alloc:
+        result["alloc_peak_bytes"] = measure_allocations(engine, outdata, args.alloc_blocks)
+    return result
+
+
+def case_key(result):
+    return (result["stems"], result["blocksize"], result["samplerate"], result["effects"])
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, baseline_path):
+    """Show the p50/p99 change of every case that also appears in the baseline run"""
+    with open(baseline_path, "r") as f:
+        baseline = {case_key(r): r for r in json.load(f)["results"]}
+
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+        p50 = (result["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+        p99 = (result["p99_ms"] / old["p99_ms"] - 1) * 100 if old["p99_ms"] else 0.0
+        stems, blocksize, samplerate, effects = case_key(result)
+        print(f"  {stems:>2} stems {blocksize:>5} @ {samplerate} {effects:<6}  "
+              f"p50 {p50:+6.1f}%  p99 {p99:+6.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the mixing and effects path with synthetic stems (no audio device)")
+    parser.add_argument("--stems", type=int, nargs="+", default=DEFAULT_STEMS)
+    parser.add_argument("--blocksizes", type=int, nargs="+", default=DEFAULT_BLOCKSIZES)
+    parser.add_argument("--samplerates", type=int, nargs="+", default=DEFAULT_SAMPLERATES)
+    parser.add_argument("--effects", nargs="+", choices=list(EFFECT_SETS), default=list(EFFECT_SETS))
+    parser.add_argument("--sample-format", choices=("float32", "int16"), default="float32")
+    parser.add_argument("--no-meters", action="store_true", help="switch off level metering")
+    parser.add_argument("--blocks", type=int, default=300, help="timed blocks per case")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed blocks per case")
+    parser.add_argument("--check-alloc", action="store_true",
+                        help="also report peak traced allocation over steady-state blocks")
+    parser.add_argument("--alloc-blocks", type=int, default=50)
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    cases = itertools.product(args.stems, args.blocksizes, args.samplerates, args.effects)
+    print(f"{'stems':>5} {'block':>6} {'rate':>6} {'effects':<7} {'p50':>8} {'p99':>8} "
+          f"{'max':>8} {'budget':>8} {'load':>6}")
+    for stem_count, blocksize, samplerate, effect_set in cases:
+        result = bench_case(stem_count, blocksize, samplerate, effect_set, args)
+        results.append(result)
+        line = (f"{stem_count:>5} {blocksize:>6} {samplerate:>6} {effect_set:<7} "
+                f"{result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['max_ms']:>8.3f} "
+                f"{result['budget_ms']:>8.3f} {result['p99_load']:>6.1%}")
+        if args.check_alloc:
+            line += f" alloc {result['alloc_peak_bytes']} B"
+        print(line)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "sample_format": args.sample_format,
+            "meters": not args.no_meters,
+            "blocks": args.blocks,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {len(results)} results to {args.output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import re
+from collections import OrderedDict
+
+# Span kinds; they double as the lyrics panel's Text tag names
+CHORD = "chord"
+SECTION = "section"
+LYRIC = "lyrics"
+
+# A line made only of chords (C, F#m7, G/B, ...) with optional (x), (4x) and (hold) marks
+CHORD_LINE_PATTERN = re.compile(
+    r"^\s*([A-G][#b]?(m7|M7|m|dim|aug|sus2|sus4|add9|6|7|9|11|13|/|2| - )?"
+    r"(\s*\(x\))?(\s*\(4x\))?(\s*\(4x\))?(\s*\(hold\))?\s*)+$")
+SECTION_KEYWORDS = ("chorus", "intro", "outro", "verse", "adlib", "instrumental",
+                    "interlude", "refrain", "bridge", "coda")
+SECTION_PATTERN = re.compile("|".join(SECTION_KEYWORDS), re.IGNORECASE)
+# One line with its newline; only "\n" ends a line, as with file.readlines()
+LINE_PATTERN = re.compile(r"[^\n]*\n|[^\n]+")
+# Parsed files kept by SheetCache
+MAX_CACHED_SHEETS = 64
+
+
+def classify(line):
+    if CHORD_LINE_PATTERN.match(line):
+        return CHORD
+    if SECTION_PATTERN.search(line):
+        return SECTION
+    return LYRIC
+
+
+def parse_sheet(text):
+    """Split a lyrics/chords file into [(kind, text)] spans.
+
+    Runs of lines of the same kind are merged into one span, so a chart
+    becomes a few dozen spans however many lines it has. Joining the span
+    texts gives back the original text.
+    """
+    spans = []
+    kind = None
+    run = []
+    for line in LINE_PATTERN.findall(text):
+        line_kind = classify(line)
+        if line_kind != kind and run:
+            spans.append((kind, "".join(run)))
+            run = []
+        kind = line_kind
+        run.append(line)
+    if run:
+        spans.append((kind, "".join(run)))
+    return spans
+
+
+def insert_args(spans):
+    """Flatten spans into Text.insert's text, tags, text, tags, ... arguments"""
+    args = []
+    for kind, text in spans:
+        args.append(text)
+        args.append(kind)
+    return args
+
+
+class SheetCache:
+    """Parsed sheets keyed by path, reused while the file's mtime and size are unchanged"""
+
+    def __init__(self, max_entries=MAX_CACHED_SHEETS):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # path -> (mtime_ns, size, spans)
+
+    def load(self, path):
+        """Spans of the file at `path`, or None if it doesn't exist"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.entries.pop(path, None)
+            return None
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            self.entries.move_to_end(path)
+            return entry[2]
+
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            spans = parse_sheet(f.read())
+        self.entries[path] = (stat.st_mtime_ns, stat.st_size, spans)
+        self.entries.move_to_end(path)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return spans
@@ -0,0 +1,485 @@
+import numpy as np
+
+# Freeverb tunings, in samples at 44.1 kHz
+COMB_TUNINGS = (1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617)
+ALLPASS_TUNINGS = (556, 441, 341, 225)
+STEREO_SPREAD = 23
+FIXED_GAIN = 0.015
+SCALE_WET = 3.0
+SCALE_ROOM = 0.28
+OFFSET_ROOM = 0.7
+SCALE_DAMP = 0.4
+ALLPASS_FEEDBACK = 0.5
+# Once a decay coefficient falls below this, further scan steps change nothing audible
+SCAN_EPSILON = 1e-7
+
+
+def one_pole(x, coeff, state, out, tmp):
+    """Vectorized out[n] = (1 - coeff) * x[n] + coeff * out[n - 1], seeded with `state`.
+
+    Runs as a log-step scan (shifts of 1, 2, 4, ...) so the block never loops per sample.
+    """
+    n = len(x)
+    np.multiply(x, 1.0 - coeff, out=out)
+    out[0] += coeff * state
+    shift = 1
+    c = coeff
+    while shift < n and c > SCAN_EPSILON:
+        np.multiply(out[:n - shift], c, out=tmp[:n - shift])
+        np.add(out[shift:], tmp[:n - shift], out=out[shift:])
+        shift *= 2
+        c *= c
+    return out
+
+
+class Comb:
+    """Feedback comb filter with a low-pass damped feedback path"""
+
+    def __init__(self, size):
+        self.buffer = np.zeros(size, dtype=np.float32)
+        self.index = 0
+        self.filterstore = 0.0
+
+    def reset(self):
+        self.buffer.fill(0)
+        self.index = 0
+        self.filterstore = 0.0
+
+    def process(self, x, out, feedback, damp, filtered, tmp):
+        """Add the comb output for input x into out"""
+        size = len(self.buffer)
+        pos = 0
+        n = len(x)
+        while pos < n:
+            # Never run past the delay length or the wrap point, so every sample
+            # read from the buffer was written by an earlier sub-block
+            count = min(n - pos, size - self.index)
+            delayed = self.buffer[self.index:self.index + count]
+            np.add(out[pos:pos + count], delayed, out=out[pos:pos + count])
+
+            store = one_pole(delayed, damp, self.filterstore, filtered[:count], tmp)
+            self.filterstore = float(store[-1])
+
+            np.multiply(store, feedback, out=delayed)
+            np.add(delayed, x[pos:pos + count], out=delayed)
+
+            self.index = (self.index + count) % size
+            pos += count
+
+
+class Allpass:
+    """Schroeder allpass diffuser"""
+
+    def __init__(self, size):
+        self.buffer = np.zeros(size, dtype=np.float32)
+        self.index = 0
+
+    def reset(self):
+        self.buffer.fill(0)
+        self.index = 0
+
+    def process(self, x, bufout):
+        """Filter x in place"""
+        size = len(self.buffer)
+        pos = 0
+        n = len(x)
+        while pos < n:
+            count = min(n - pos, size - self.index)
+            delayed = self.buffer[self.index:self.index + count]
+            seg = x[pos:pos + count]
+            old = bufout[:count]
+            old[:] = delayed
+
+            np.multiply(old, ALLPASS_FEEDBACK, out=delayed)
+            np.add(delayed, seg, out=delayed)
+            np.subtract(old, seg, out=seg)
+
+            self.index = (self.index + count) % size
+            pos += count
+
+
+class Reverb:
+    """Freeverb-style stereo reverb: eight parallel combs into four allpasses per side.
+
+    All state lives in the comb and allpass buffers, so the tail carries over
+    from one block to the next.
+    """
+
+    def __init__(self, samplerate, channels=2, room_size=0.5, damping=0.5, blocksize=2048):
+        self.samplerate = samplerate
+        self.channels = channels
+        ratio = samplerate / 44100.0
+        self.banks = []
+        for side in range(min(channels, 2)):
+            spread = STEREO_SPREAD * side
+            combs = [Comb(max(1, int((t + spread) * ratio))) for t in COMB_TUNINGS]
+            allpasses = [Allpass(max(1, int((t + spread) * ratio))) for t in ALLPASS_TUNINGS]
+            self.banks.append((combs, allpasses))
+        self._allocate(blocksize)
+        self.set_room_size(room_size)
+        self.set_damping(damping)
+
+    def _allocate(self, frames):
+        self.mono = np.zeros(frames, dtype=np.float32)
+        self.side = np.zeros(frames, dtype=np.float32)
+        self.filtered = np.zeros(frames, dtype=np.float32)
+        self.tmp = np.zeros(frames, dtype=np.float32)
+
+    def set_room_size(self, room_size):
+        """Set room size (0.0 - 1.0). Larger rooms decay more slowly."""
+        self.room_size = max(0.0, min(1.0, room_size))
+        self.feedback = self.room_size * SCALE_ROOM + OFFSET_ROOM
+
+    def set_damping(self, damping):
+        """Set high-frequency damping (0.0 - 1.0)"""
+        self.damping = max(0.0, min(1.0, damping))
+        self.damp = self.damping * SCALE_DAMP
+
+    def reset(self):
+        """Silence the tail"""
+        for combs, allpasses in self.banks:
+            for comb in combs:
+                comb.reset()
+            for allpass in allpasses:
+                allpass.reset()
+
+    def process(self, send, out):
+        """Write the wet signal for the send block into out (same shape as send)"""
+        frames = len(send)
+        if len(self.mono) < frames:
+            self._allocate(frames)
+
+        # Both sides are fed the same mono sum, as in Freeverb
+        mono = self.mono[:frames]
+        # Summed a channel at a time; np.sum(axis=1) allocates a reduction iterator per call
+        np.copyto(mono, send[:, 0])
+        for channel in range(1, send.shape[1]):
+            np.add(mono, send[:, channel], out=mono)
+        mono *= FIXED_GAIN
+
+        side = self.side[:frames]
+        for channel, (combs, allpasses) in enumerate(self.banks):
+            side.fill(0)
+            for comb in combs:
+                comb.process(mono, side, self.feedback, self.damp, self.filtered, self.tmp)
+            for allpass in allpasses:
+                allpass.process(side, self.tmp)
+            np.multiply(side, SCALE_WET, out=out[:, channel])
+
+        # Outputs beyond stereo reuse the left side
+        for channel in range(len(self.banks), out.shape[1]):
+            out[:, channel] = out[:, 0]
+        return out
+
+
+class Delay:
+    """Feedback delay line over a preallocated circular buffer.
+
+    The buffer holds the processed signal (input plus fed-back echoes), so
+    each repeat is a copy of the previous one scaled by the feedback. A block
+    costs a fixed number of array operations as long as the delay is at
+    least one block long; shorter delays are processed in delay-length steps.
+    """
+
+    def __init__(self, samplerate, channels=2, time_ms=300.0, feedback=0.35,
+                 wet=1.0, dry=0.0, max_delay_ms=2000.0):
+        self.samplerate = samplerate
+        self.max_delay_ms = max_delay_ms
+        self.buffer = np.zeros((int(max_delay_ms * samplerate / 1000.0), channels), dtype=np.float32)
+        self.write_index = 0
+        self.scratch = np.zeros((0, channels), dtype=np.float32)
+        self.wet = wet
+        self.dry = dry
+        self.set_time(time_ms)
+        self.set_feedback(feedback)
+
+    def set_time(self, time_ms):
+        """Set the delay time in milliseconds"""
+        self.time_ms = max(1.0, min(self.max_delay_ms, time_ms))
+        self.delay_frames = max(1, min(len(self.buffer), int(self.time_ms * self.samplerate / 1000.0)))
+
+    def set_tempo(self, bpm, beats=1.0):
+        """Sync the delay time to a tempo; beats=0.5 gives eighth notes"""
+        if bpm > 0:
+            self.set_time(60000.0 / bpm * beats)
+
+    def set_feedback(self, feedback):
+        """Set how much of each repeat is fed back (0.0 - 0.95)"""
+        self.feedback = max(0.0, min(0.95, feedback))
+
+    def set_wet(self, wet):
+        """Set the level of the echoes (0.0 - 1.0)"""
+        self.wet = max(0.0, min(1.0, wet))
+
+    def set_dry(self, dry):
+        """Set the level of the input passed straight through (0.0 - 1.0)"""
+        self.dry = max(0.0, min(1.0, dry))
+
+    def tail_frames(self):
+        """Frames until the echoes fall below -80 dB after the input stops"""
+        if self.feedback <= 0:
+            return self.delay_frames
+        repeats = np.log(1e-4) / np.log(self.feedback)
+        return int(self.delay_frames * (repeats + 1))
+
+    def reset(self):
+        """Clear the echoes"""
+        self.buffer.fill(0)
+        self.write_index = 0
+
+    def process(self, x, out):
+        """Write dry * x + wet * echoes into out (same shape as x)"""
+        size = len(self.buffer)
+        delay = self.delay_frames
+        pos = 0
+        n = len(x)
+        if self.dry and len(self.scratch) < n:
+            self.scratch = np.zeros((n, self.buffer.shape[1]), dtype=np.float32)
+        while pos < n:
+            read_index = (self.write_index - delay) % size
+            # Stop at the delay length and at either wrap point
+            count = min(n - pos, delay, size - self.write_index, size - read_index)
+            seg = x[pos:pos + count]
+            dst = out[pos:pos + count]
+            delayed = self.buffer[read_index:read_index + count]
+            written = self.buffer[self.write_index:self.write_index + count]
+
+            np.multiply(delayed, self.wet, out=dst)
+            if self.dry:
+                dry = self.scratch[:count]
+                np.multiply(seg, self.dry, out=dry)
+                np.add(dst, dry, out=dst)
+            # Read and write regions only coincide when the delay is the full buffer,
+            # in which case the in-place multiply still reads each sample before writing it
+            np.multiply(delayed, self.feedback, out=written)
+            np.add(written, seg, out=written)
+
+            self.write_index = (self.write_index + count) % size
+            pos += count
+        return out
+
+
+# 3-band EQ corner frequencies (Hz) and the gain a slider at 0 maps to
+EQ_LOW_FREQ = 200.0
+EQ_MID_FREQ = 1000.0
+EQ_HIGH_FREQ = 4000.0
+EQ_Q = 0.707
+EQ_MIN_DB = -24.0
+# Sub-block length for the block IIR; blocks that are a multiple of it need no per-sample work
+SUB_BLOCK = 64
+
+
+def biquad(kind, freq, gain_db, samplerate, q=EQ_Q):
+    """RBJ cookbook coefficients (b0, b1, b2, a1, a2), normalized so a0 = 1"""
+    amp = 10.0 ** (gain_db / 40.0)
+    w0 = 2.0 * np.pi * freq / samplerate
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2.0 * q)
+
+    if kind == "peak":
+        b = (1 + alpha * amp, -2 * cos_w0, 1 - alpha * amp)
+        a = (1 + alpha / amp, -2 * cos_w0, 1 - alpha / amp)
+    else:
+        sqrt_amp = 2.0 * np.sqrt(amp) * alpha
+        if kind == "lowshelf":
+            b = (amp * ((amp + 1) - (amp - 1) * cos_w0 + sqrt_amp),
+                 2 * amp * ((amp - 1) - (amp + 1) * cos_w0),
+                 amp * ((amp + 1) - (amp - 1) * cos_w0 - sqrt_amp))
+            a = ((amp + 1) + (amp - 1) * cos_w0 + sqrt_amp,
+                 -2 * ((amp - 1) + (amp + 1) * cos_w0),
+                 (amp + 1) + (amp - 1) * cos_w0 - sqrt_amp)
+        elif kind == "highshelf":
+            b = (amp * ((amp + 1) + (amp - 1) * cos_w0 + sqrt_amp),
+                 -2 * amp * ((amp - 1) + (amp + 1) * cos_w0),
+                 amp * ((amp + 1) + (amp - 1) * cos_w0 - sqrt_amp))
+            a = ((amp + 1) - (amp - 1) * cos_w0 + sqrt_amp,
+                 2 * ((amp - 1) - (amp + 1) * cos_w0),
+                 (amp + 1) - (amp - 1) * cos_w0 - sqrt_amp)
+        else:
+            raise ValueError(f"Unknown biquad type: {kind}")
+
+    return (b[0] / a[0], b[1] / a[0], b[2] / a[0], a[1] / a[0], a[2] / a[0])
+
+
+def cascade_state_space(sections):
+    """Combine biquad sections into one state-space system (A, B, C, D).
+
+    Each section is in transposed direct form II, with state (z1, z2).
+    """
+    A = np.zeros((0, 0))
+    B = np.zeros(0)
+    C = np.zeros(0)
+    D = 1.0
+    for b0, b1, b2, a1, a2 in sections:
+        A2 = np.array([[-a1, 1.0], [-a2, 0.0]])
+        B2 = np.array([b1 - a1 * b0, b2 - a2 * b0])
+        C2 = np.array([1.0, 0.0])
+        # The previous output feeds this section's input
+        k = len(A)
+        A_new = np.zeros((k + 2, k + 2))
+        A_new[:k, :k] = A
+        A_new[k:, :k] = np.outer(B2, C)
+        A_new[k:, k:] = A2
+        B = np.concatenate([B, B2 * D])
+        C = np.concatenate([b0 * C, C2])
+        A = A_new
+        D = b0 * D
+    return A, B, C, D
+
+
+class BlockFilter:
+    """Runs a linear IIR filter on whole blocks with matrix products instead of a sample loop.
+
+    Within a sub-block of L samples the output is the input convolved with the
+    first L taps of the impulse response plus the decay of the incoming state,
+    both precomputed as matrices. The states that carry from one sub-block to
+    the next follow from a K x K recurrence, so the cost stays linear in the
+    block length. Every column of the block is filtered independently.
+    """
+
+    def __init__(self, A, B, C, D, sub_block=SUB_BLOCK):
+        L = sub_block
+        K = len(A)
+        self.order = K
+        self.sub_block = L
+        # powers[n] = A^n for n in 0..L
+        powers = np.empty((L + 1, K, K))
+        powers[0] = np.eye(K)
+        for n in range(1, L + 1):
+            powers[n] = powers[n - 1] @ A
+
+        # Impulse response taps h[0] = D, h[n] = C A^(n-1) B
+        h = np.empty(L)
+        h[0] = D
+        h[1:] = powers[:L - 1] @ B @ C
+        idx = np.arange(L)
+        lag = idx[:, None] - idx[None, :]
+        self.T = np.where(lag >= 0, h[np.clip(lag, 0, None)], 0.0).astype(np.float32)
+        # Output due to the state entering the sub-block, and the state leaving it
+        self.Zy = (C @ powers[:L]).astype(np.float32)
+        self.M = np.ascontiguousarray((powers[L - 1::-1] @ B).T).astype(np.float32)
+        self.powers = powers.astype(np.float32)
+        self.buffers = {}
+
+    def _buffers(self, J, columns):
+        key = (J, columns)
+        if key not in self.buffers:
+            K = self.order
+            self.buffers[key] = (
+                np.zeros((J, K, columns), dtype=np.float32),      # inputs folded into state
+                np.zeros((J + 1, K, columns), dtype=np.float32),  # entry states
+                np.zeros((J, self.sub_block, columns), dtype=np.float32),
+            )
+        return self.buffers[key]
+
+    def prepare(self, frames, columns):
+        """Precompute everything a block of this size needs, outside the audio callback"""
+        J = frames // self.sub_block
+        if J:
+            self._buffers(J, columns)
+
+    def process(self, x, out, state):
+        """Filter x (frames, columns) into out, advancing state (order, columns) in place"""
+        L = self.sub_block
+        frames, columns = x.shape
+        J = frames // L
+        main = J * L
+
+        if J:
+            U, states, zs = self._buffers(J, columns)
+            X = x[:main].reshape(J, L, columns)
+            Y = out[:main].reshape(J, L, columns)
+            np.matmul(self.T, X, out=Y)
+            np.matmul(self.M, X, out=U)
+            # Each sub-block's entry state is the previous one advanced by L samples
+            A_L = self.powers[L]
+            np.copyto(states[0], state)
+            for j in range(J):
+                np.matmul(A_L, states[j], out=states[j + 1])
+                np.add(states[j + 1], U[j], out=states[j + 1])
+            np.matmul(self.Zy, states[:J], out=zs)
+            np.add(Y, zs, out=Y)
+            state[:] = states[J]
+
+        rest = frames - main
+        if rest:
+            # A short tail uses the leading corner of the same matrices
+            xr = x[main:]
+            yr = out[main:]
+            np.matmul(self.T[:rest, :rest], xr, out=yr)
+            yr += self.Zy[:rest] @ state
+            state[:] = self.powers[rest] @ state + self.M[:, L - rest:] @ xr
+        return out
+
+
+class Equalizer:
+    """Low-shelf, peaking-mid and high-shelf EQ with filter state kept across blocks.
+
+    Gains use the mixer's slider scale: 1.0 is flat, 0.0 is EQ_MIN_DB and
+    2.0 is +6 dB. Coefficients are only rebuilt when a gain changes.
+    """
+
+    def __init__(self, samplerate, channels=2, blocksize=2048):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.low = 1.0
+        self.mid = 1.0
+        self.high = 1.0
+        self.filter = None
+        self.state = None
+        self.out = np.zeros((blocksize, channels), dtype=np.float32)
+
+    @staticmethod
+    def _to_db(gain):
+        if gain <= 0:
+            return EQ_MIN_DB
+        return max(EQ_MIN_DB, 20.0 * np.log10(gain))
+
+    def is_flat(self):
+        return self.low == 1.0 and self.mid == 1.0 and self.high == 1.0
+
+    def set_gains(self, low=None, mid=None, high=None):
+        """Set band gains (0.0 - 2.0). Rebuilds coefficients only if something changed."""
+        new = [self.low if low is None else max(0.0, min(2.0, low)),
+               self.mid if mid is None else max(0.0, min(2.0, mid)),
+               self.high if high is None else max(0.0, min(2.0, high))]
+        if new == [self.low, self.mid, self.high] and (self.filter is not None or self.is_flat()):
+            return
+        self.low, self.mid, self.high = new
+
+        if self.is_flat():
+            # Only the filter goes; the audio thread may have read it and still need the state
+            self.filter = None
+            return
+
+        sections = [
+            biquad("lowshelf", EQ_LOW_FREQ, self._to_db(self.low), self.samplerate),
+            biquad("peak", EQ_MID_FREQ, self._to_db(self.mid), self.samplerate),
+            biquad("highshelf", EQ_HIGH_FREQ, self._to_db(self.high), self.samplerate),
+        ]
+        block_filter = BlockFilter(*cascade_state_space(sections))
+        block_filter.prepare(self.blocksize, self.channels)
+        if self.state is None:
+            self.state = np.zeros((block_filter.order, self.channels), dtype=np.float32)
+        elif self.filter is None:
+            # Back from flat; don't resume from the state left when the EQ was switched off
+            self.state.fill(0)
+        # One assignment, so the audio thread sees either the old filter or the new one
+        self.filter = block_filter
+
+    def reset(self):
+        if self.state is not None:
+            self.state.fill(0)
+
+    def process(self, x):
+        """Equalize x (frames, channels) in place"""
+        block_filter = self.filter
+        if block_filter is None:
+            return x
+        if len(self.out) < len(x):
+            self.out = np.zeros((len(x), self.channels), dtype=np.float32)
+        out = self.out[:len(x)]
+        block_filter.process(x, out, self.state)
+        np.copyto(x, out)
+        return x
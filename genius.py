@@ -0,0 +1,422 @@
+import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_API_URL = "https://api.genius.com"
+# (connect, read) seconds; a stalled server fails the request instead of hanging it
+TIMEOUT = (5, 15)
+# Failed connections and these statuses are retried with exponential backoff
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Bytes read between cancellation checks while downloading a page
+CHUNK_SIZE = 16384
+
+TITLE_PATTERN = re.compile(r'<title>(.+?) Lyrics \|')
+LYRICS_PATTERNS = (
+    re.compile(r'<div class="Lyrics__Container-sc-\w+\s+">(.+?)</div>', re.DOTALL),
+    re.compile(r'<div data-lyrics-container="true"[^>]*>(.+?)</div>', re.DOTALL),
+)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+ENTITIES = (("&amp;", "&"), ("&quot;", '"'), ("&#x27;", "'"))
+# Song folder names: "Artist - Title", "Artist_-_Title", "Artist__Title" or en/em dashes
+SONG_NAME_PATTERNS = [re.compile(pattern) for pattern in (
+    r"(.+)\s*-\s*(.+)",
+    r"(.+)_-_(.+)",
+    r"(.+)__(.+)",
+    r"(.+)–(.+)",
+    r"(.+)—(.+)",
+)]
+NORMALIZE_PATTERN = re.compile(r"[\W_]+")
+
+DEFAULT_CACHE_FILE = "lyrics_cache.json"
+CACHE_VERSION = 1
+# Found lyrics are reused for a month; a search that found nothing is retried after a day
+CACHE_TTL = 30 * 24 * 3600
+MISS_TTL = 24 * 3600
+
+# Bulk fetch: songs fetched at once, and the request rate they share
+BULK_WORKERS = 4
+REQUESTS_PER_SECOND = 2.0
+REQUEST_BURST = 4
+DEFAULT_STATE_FILE = "lyrics_fetch_state.json"
+
+
+class GeniusError(Exception):
+    """A lyrics fetch failed; the message is meant for the user"""
+
+
+class LyricsNotFound(GeniusError):
+    pass
+
+
+class FetchCancelled(GeniusError):
+    pass
+
+
+def parse_song_info(song_name):
+    """(artist, title) from a song folder name, or None"""
+    for pattern in SONG_NAME_PATTERNS:
+        match = pattern.match(song_name)
+        if match:
+            return match.group(1).strip(), match.group(2).strip()
+    return None
+
+
+def cache_key(artist, title):
+    """Search cache key; case, spacing and punctuation don't matter ("AC/DC" is "ac dc")"""
+    return " - ".join(" ".join(NORMALIZE_PATTERN.sub(" ", part.lower()).split())
+                      for part in (artist, title))
+
+
+def write_json(path, data):
+    """Write JSON via a temp file, so a crash never leaves it half-written"""
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def extract_lyrics(html_content, url):
+    """Turn a Genius song page into the text shown in the lyrics panel"""
+    title_match = TITLE_PATTERN.search(html_content)
+    title = title_match.group(1) if title_match else "Unknown Title"
+    metadata = f"Title: {title}\nSource: {url}\n\n"
+
+    lyrics_matches = []
+    for pattern in LYRICS_PATTERNS:
+        lyrics_matches = pattern.findall(html_content)
+        if lyrics_matches:
+            break
+    if not lyrics_matches:
+        raise LyricsNotFound("Could not extract lyrics from the page")
+
+    clean_lyrics = TAG_PATTERN.sub("\n", "".join(lyrics_matches))
+    clean_lyrics = BLANK_LINES_PATTERN.sub("\n\n", clean_lyrics)
+    for entity, char in ENTITIES:
+        clean_lyrics = clean_lyrics.replace(entity, char)
+    return metadata + clean_lyrics
+
+
+class LyricsCache:
+    """Genius search hits and extracted lyrics, kept on disk with an expiry.
+
+    Searches are keyed by the normalized artist and title and remember the song
+    URL they found, or "" when nothing matched (kept for MISS_TTL only); lyrics
+    are keyed by that URL. Safe to share between worker threads.
+    """
+
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, ttl=CACHE_TTL, miss_ttl=MISS_TTL):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.lock = threading.Lock()
+        self.searches = {}  # cache key -> [time, song URL or ""]
+        self.pages = {}     # song URL -> [time, lyrics]
+        self.dirty = False
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.searches = data.get("searches", {})
+                self.pages = data.get("pages", {})
+        except (OSError, ValueError):
+            pass
+
+    def _lookup(self, table, key, ttl):
+        with self.lock:
+            entry = table.get(key)
+            if entry is None or time.time() - entry[0] > ttl:
+                return None
+            return entry[1]
+
+    def search(self, artist, title):
+        """Cached song URL, "" for a remembered miss, or None if not cached"""
+        url = self._lookup(self.searches, cache_key(artist, title), self.ttl)
+        if url == "" and self._lookup(self.searches, cache_key(artist, title), self.miss_ttl) is None:
+            return None
+        return url
+
+    def page(self, url):
+        return self._lookup(self.pages, url, self.ttl)
+
+    def put_search(self, artist, title, url):
+        with self.lock:
+            self.searches[cache_key(artist, title)] = [time.time(), url]
+            self.dirty = True
+
+    def put_page(self, url, lyrics):
+        with self.lock:
+            self.pages[url] = [time.time(), lyrics]
+            self.dirty = True
+
+    def save(self):
+        """Write the cache if it changed, dropping expired entries"""
+        with self.lock:
+            if not self.dirty:
+                return
+            now = time.time()
+            self.searches = {key: entry for key, entry in self.searches.items()
+                             if now - entry[0] <= (self.ttl if entry[1] else self.miss_ttl)}
+            self.pages = {key: entry for key, entry in self.pages.items() if now - entry[0] <= self.ttl}
+            data = {"version": CACHE_VERSION, "searches": self.searches, "pages": self.pages}
+            self.dirty = False
+        try:
+            write_json(self.cache_file, data)
+        except OSError as e:
+            print(f"Failed to save lyrics cache: {e}")
+
+
+class TokenBucket:
+    """Rate limit shared by threads: `rate` requests a second, in bursts of up to `capacity`"""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=REQUEST_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, cancelled):
+        """Wait for a token. Raises FetchCancelled if `cancelled` is set while waiting."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if cancelled.wait(wait):
+                raise FetchCancelled("Cancelled")
+
+
+class GeniusClient:
+    """Genius search and lyrics page download for a worker thread.
+
+    One requests.Session is shared by every fetch, so its pooled keep-alive
+    connections are reused. Each request has a timeout, and transient failures
+    are retried with backoff. Passing a threading.Event lets the caller cancel:
+    it is checked between requests and between chunks of the page. With a
+    cache, songs seen before need no requests at all; a rate limiter spaces
+    out the requests that are made.
+    """
+
+    def __init__(self, api_key, api_url=DEFAULT_API_URL, timeout=TIMEOUT, retries=RETRIES,
+                 cache=None, rate_limiter=None):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=BACKOFF_FACTOR,
+                      status_forcelist=RETRY_STATUSES, allowed_methods=("GET",),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def _get(self, url, cancelled, **kwargs):
+        """GET a URL and return its text, reading it in chunks so a cancel lands quickly"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(cancelled)
+        if cancelled.is_set():
+            raise FetchCancelled("Cancelled")
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True, **kwargs) as response:
+                if response.status_code != 200:
+                    raise GeniusError(f"{url} returned HTTP {response.status_code}")
+                chunks = []
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if cancelled.is_set():
+                        raise FetchCancelled("Cancelled")
+                    chunks.append(chunk)
+                return b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+        except requests.RequestException as e:
+            raise GeniusError(f"Could not reach {url}: {e}") from e
+
+    def search_song_url(self, artist, title, cancelled):
+        """URL of the best matching song page"""
+        text = self._get(f"{self.api_url}/search", cancelled,
+                         params={"q": f"{artist} {title}"},
+                         headers={"Authorization": f"Bearer {self.api_key}"})
+        try:
+            hits = json.loads(text).get("response", {}).get("hits", [])
+        except ValueError as e:
+            raise GeniusError(f"Unexpected reply from Genius: {e}") from e
+        if not hits:
+            raise LyricsNotFound(f"No lyrics found for {artist} - {title}")
+
+        for hit in hits:
+            if hit.get("type") == "song":
+                song_url = hit.get("result", {}).get("url")
+                if not song_url:
+                    raise GeniusError("Couldn't find song URL")
+                return song_url
+        raise LyricsNotFound(f"No song match found for {artist} - {title}")
+
+    def fetch(self, artist, title, cancelled=None):
+        """Search for a song and return its lyrics text. Runs on a worker thread."""
+        cancelled = cancelled or threading.Event()
+        cache = self.cache
+        song_url = cache.search(artist, title) if cache else None
+        if song_url == "":
+            raise LyricsNotFound(f"No lyrics found for {artist} - {title}")
+        if song_url is None:
+            try:
+                song_url = self.search_song_url(artist, title, cancelled)
+            except LyricsNotFound:
+                if cache:
+                    cache.put_search(artist, title, "")
+                raise
+            if cache:
+                cache.put_search(artist, title, song_url)
+
+        lyrics = cache.page(song_url) if cache else None
+        if lyrics is None:
+            lyrics = extract_lyrics(self._get(song_url, cancelled), song_url)
+            if cache:
+                cache.put_page(song_url, lyrics)
+        return lyrics
+
+
+class BulkLyricsFetch:
+    """Fetch lyrics for every song in the library that has no lyrics.txt.
+
+    A small pool of workers fetches songs at once, within the client's rate
+    limit. Each finished song is recorded in a state file, so a job that was
+    interrupted (stopped, or the app closed) picks up where it left off
+    instead of asking Genius again about songs it already gave up on. The
+    state file is removed when a job completes. Network errors are not
+    recorded, so those songs are tried again on resume; any other error is
+    recorded as "failed".
+    """
+
+    def __init__(self, client, root, songs, state_file=DEFAULT_STATE_FILE, workers=BULK_WORKERS):
+        self.client = client
+        self.root = os.path.abspath(root)
+        self.state_file = state_file
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.results = self._read_state()  # song -> "saved", "not found", "unparsed", "exists" or "failed"
+        missing = [song for song in sorted(songs, key=str.lower) if not songs[song].get("lyrics")]
+        self.pending = [song for song in missing if song not in self.results]
+        if not self.pending:
+            # Nothing left to resume, so start over
+            self.results = {}
+            self.pending = missing
+        self.resumed = len(self.results)
+        self.total = len(self.pending)
+        self.finished = 0
+        self.skipped = 0  # Songs dropped by a cancel
+        self.saved = []
+        self.errors = []
+
+    def _read_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("root") != self.root:
+            return {}
+        return data.get("results", {})
+
+    def start(self):
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        for song in self.pending:
+            executor.submit(self._fetch_song, song)
+        # The workers exit once every song has been handled
+        executor.shutdown(wait=False)
+
+    def cancel(self):
+        """Stop after the requests in flight; the state file stays for a resume"""
+        self.cancelled.set()
+
+    def done(self):
+        return self.finished + self.skipped >= self.total
+
+    def _skip(self):
+        with self.lock:
+            self.skipped += 1
+
+    def _fetch_song(self, song):
+        if self.cancelled.is_set():
+            self._skip()
+            return
+        try:
+            status = self._fetch_status(song)
+        except FetchCancelled:
+            self._skip()
+            return
+        except Exception as e:
+            # Anything else, e.g. an unwritable folder or a page that breaks the
+            # parser, fails just this song. It is recorded so the job still
+            # finishes and a resume moves past it.
+            self.errors.append(f"{song}: {e}")
+            status = "failed"
+        self._finish(song, status)
+
+    def _fetch_status(self, song):
+        """Fetch and save one song's lyrics; returns its status, or None to retry it next time"""
+        info = parse_song_info(song)
+        if info is None:
+            return "unparsed"
+        try:
+            lyrics = self.client.fetch(*info, cancelled=self.cancelled)
+        except LyricsNotFound:
+            return "not found"
+        except FetchCancelled:
+            raise
+        except GeniusError as e:
+            self.errors.append(f"{song}: {e}")
+            return None
+        return self._write_lyrics(song, lyrics)
+
+    def _write_lyrics(self, song, lyrics):
+        path = os.path.join(self.root, song, "lyrics.txt")
+        try:
+            # Exclusive create: lyrics written meanwhile (by hand or in the app) are kept
+            with open(path, "x", encoding="utf-8") as f:
+                f.write(lyrics.strip())
+        except FileExistsError:
+            return "exists"
+        return "saved"
+
+    def _finish(self, song, status):
+        with self.lock:
+            self.finished += 1
+            if status == "saved":
+                self.saved.append(song)
+            if status is not None:
+                self.results[song] = status
+            complete = self.finished >= self.total
+            try:
+                if complete and not self.cancelled.is_set():
+                    if os.path.exists(self.state_file):
+                        os.remove(self.state_file)
+                else:
+                    write_json(self.state_file, {"root": self.root, "results": self.results})
+            except OSError as e:
+                print(f"Failed to save lyrics fetch state: {e}")
+        if complete and self.client.cache is not None:
+            self.client.cache.save()
+
+    def summary(self):
+        counts = {}
+        for status in self.results.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
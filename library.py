@@ -0,0 +1,353 @@
+import os
+import re
+import json
+import heapq
+import threading
+import soundfile as sf
+
+DEFAULT_INDEX_FILE = "library_index.json"
+INDEX_VERSION = 1
+STEM_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg")
+# Query words shorter than this are only matched as typed; short words have too many near neighbours
+FUZZY_MIN_WORD = 4
+# Fuzzy matches shown at most, so a loose query never sorts the whole library
+FUZZY_LIMIT = 100
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def scan_song(song_path):
+    """Describe one song folder: its stems plus whether lyrics/chords exist"""
+    stems = []
+    lyrics = chords = False
+    with os.scandir(song_path) as entries:
+        for entry in entries:
+            name = entry.name
+            if name == "lyrics.txt":
+                lyrics = True
+            elif name == "chords.txt":
+                chords = True
+            elif name.lower().endswith(STEM_EXTENSIONS):
+                stems.append(stem_info(entry.path))
+    stems.sort(key=lambda stem: stem["file"])
+    return {"stems": stems, "lyrics": lyrics, "chords": chords}
+
+
+def stem_info(file_path):
+    """Read a stem's header. Unreadable files are listed without details."""
+    stem = {"file": os.path.basename(file_path),
+            "format": os.path.splitext(file_path)[1][1:].lower()}
+    try:
+        info = sf.info(file_path)
+    except Exception:
+        return stem
+    stem["samplerate"] = info.samplerate
+    stem["channels"] = info.channels
+    stem["duration"] = round(info.duration, 3)
+    return stem
+
+
+class LibraryIndex:
+    """Persistent index of the song folders in the audio directory.
+
+    Every song remembers its folder mtime, so a rescan only reads folders that
+    changed since the last run and costs one stat per unchanged song. Adding,
+    removing or renaming a file updates the folder mtime; a stem rewritten in
+    place does not, which refresh_song covers for files the app writes itself.
+    """
+
+    def __init__(self, index_file=DEFAULT_INDEX_FILE):
+        self.index_file = index_file
+        self.lock = threading.Lock()
+        self.roots = self._read()
+        self.audio_dir = None
+        self.songs = {}
+
+    def _read(self):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != INDEX_VERSION:
+            return {}
+        return data.get("roots", {})
+
+    def save(self):
+        """Write the index, via a temp file so a crash never leaves it half-written"""
+        with self.lock:
+            data = {"version": INDEX_VERSION, "roots": self.roots}
+            tmp_path = f"{self.index_file}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.index_file)
+            except OSError as e:
+                print(f"Failed to save library index: {e}")
+
+    def open(self, audio_dir):
+        """Switch to an audio directory, using what the index already knows about it"""
+        self.audio_dir = os.path.abspath(audio_dir)
+        self.songs = self.roots.get(self.audio_dir, {})
+
+    def names(self):
+        """Song folder names, sorted"""
+        return sorted(self.songs, key=str.lower)
+
+    def get(self, name):
+        return self.songs.get(name)
+
+    def scan(self):
+        """Bring the current directory up to date. Returns the names of songs
+        that were added, removed or changed. Safe to run on a worker thread."""
+        root = self.audio_dir
+        old = self.roots.get(root, {})
+        songs = {}
+        changed = []
+        with os.scandir(root) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_dir():
+                        continue
+                    mtime = entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+                song = old.get(entry.name)
+                if song is None or song["mtime"] != mtime:
+                    try:
+                        song = scan_song(entry.path)
+                    except OSError:
+                        continue
+                    song["mtime"] = mtime
+                    changed.append(entry.name)
+                songs[entry.name] = song
+        changed.extend(name for name in old if name not in songs)
+
+        if changed or root not in self.roots:
+            with self.lock:
+                self.roots[root] = songs
+                if self.audio_dir == root:
+                    self.songs = songs
+            self.save()
+        return changed
+
+    def update_songs(self, names):
+        """Rescan the named song folders whatever their mtime, adding or dropping
+        them as needed. Returns the names whose entry changed."""
+        root = self.audio_dir
+        updates = {}
+        for name in names:
+            song_path = os.path.join(root, name)
+            try:
+                song = scan_song(song_path)
+                song["mtime"] = os.stat(song_path).st_mtime_ns
+            except OSError:
+                song = None  # Removed, renamed away, or not a folder
+            if song != self.songs.get(name):
+                updates[name] = song
+        if not updates:
+            return []
+
+        with self.lock:
+            # Copy so a reader on another thread never sees the dict change size
+            songs = dict(self.roots.get(root, {}))
+            for name, song in updates.items():
+                if song is None:
+                    songs.pop(name, None)
+                else:
+                    songs[name] = song
+            self.roots[root] = songs
+            if self.audio_dir == root:
+                self.songs = songs
+        self.save()
+        return list(updates)
+
+    def refresh_song(self, name):
+        """Rescan one song folder, e.g. after the app wrote its lyrics"""
+        self.update_songs([name])
+
+
+def bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def one_edit_apart(a, b):
+    """Whether b is a with one letter substituted, inserted, deleted, or two neighbours swapped"""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    start = 0
+    while start < len(a) and a[start] == b[start]:
+        start += 1
+    if len(a) < len(b):
+        return a[start:] == b[start + 1:]
+    if a[start + 1:] == b[start + 1:]:
+        return True
+    return (start + 1 < len(a) and a[start] == b[start + 1] and a[start + 1] == b[start]
+            and a[start + 2:] == b[start + 2:])
+
+
+class TrackSearch:
+    """In-memory, typo-tolerant search over song names.
+
+    Matches rank as exact, prefix, word prefix, substring, then fuzzy. Names
+    containing the query are found by intersecting letter-pair postings and
+    checking only those names. A fuzzy match has every query word either in
+    the name or one typo away from one of its words; such words are looked up
+    through their single-letter deletions. Only one-letter queries scan every name.
+    """
+
+    def __init__(self, names=()):
+        self.build(names)
+
+    def build(self, names):
+        self.names = list(names)
+        self.lowered = [name.lower() for name in self.names]
+        self.positions = {name: i for i, name in enumerate(self.names)}  # removed names leave a None behind
+        # Name indexes per letter pair and per word. Built as lists, which is
+        # quicker; a pair's list becomes a set the first time a query uses it.
+        self.postings = {}
+        self.word_names = {}
+        for i, name in enumerate(self.lowered):
+            for pair in bigrams(name):
+                self.postings.setdefault(pair, []).append(i)
+            for word in WORD_PATTERN.findall(name):
+                self.word_names.setdefault(word, []).append(i)
+        self.near = {}  # a word, or it with one letter deleted -> words
+        self.add_near(self.word_names)
+
+    def add_near(self, words):
+        for word in words:
+            if len(word) >= FUZZY_MIN_WORD - 1 and not word.isdigit():
+                for key in deletions(word) | {word}:
+                    self.near.setdefault(key, set()).add(word)
+
+    def add(self, names):
+        """Index more names, e.g. songs that just appeared in the library"""
+        new_words = []
+        for name in names:
+            if name in self.positions:
+                continue
+            i = self.positions[name] = len(self.names)
+            self.names.append(name)
+            lowered = name.lower()
+            self.lowered.append(lowered)
+            for pair in bigrams(lowered):
+                postings = self.postings.setdefault(pair, [])
+                if isinstance(postings, set):
+                    postings.add(i)
+                else:
+                    postings.append(i)
+            for word in WORD_PATTERN.findall(lowered):
+                if word not in self.word_names:
+                    new_words.append(word)
+                self.word_names.setdefault(word, []).append(i)
+        self.add_near(new_words)
+
+    def remove(self, names):
+        """Drop names from the index; ones it does not hold are ignored"""
+        for name in names:
+            i = self.positions.pop(name, None)
+            if i is None:
+                continue
+            lowered = self.lowered[i]
+            self.names[i] = self.lowered[i] = None
+            for pair in bigrams(lowered):
+                self.pair_names(pair).discard(i)
+            for word in set(WORD_PATTERN.findall(lowered)):
+                word_names = [j for j in self.word_names[word] if j != i]
+                if word_names:
+                    self.word_names[word] = word_names
+                    continue
+                del self.word_names[word]
+                for key in deletions(word) | {word}:
+                    near = self.near.get(key)
+                    if near is not None:
+                        near.discard(word)
+                        if not near:
+                            del self.near[key]
+
+    def pair_names(self, pair):
+        names = self.postings.get(pair, ())
+        if not isinstance(names, set):
+            names = self.postings[pair] = set(names)
+        return names
+
+    def containing(self, *texts):
+        """Indexes of the names that contain every one of texts"""
+        pairs = set().union(*(bigrams(text) for text in texts))
+        if not pairs:
+            # Single letters only; nearly every name has them anyway
+            if len(texts) == 1:
+                return {i for i, name in enumerate(self.lowered) if name is not None and texts[0] in name}
+            return {i for i, name in enumerate(self.lowered)
+                    if name is not None and all(text in name for text in texts)}
+        postings = sorted((self.pair_names(pair) for pair in pairs), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        if len(texts) == 1 and len(texts[0]) == 2:
+            return candidates
+        return {i for i in candidates if all(text in self.lowered[i] for text in texts)}
+
+    def typo_words(self, word):
+        """Words in the library one typo away from word"""
+        if len(word) < FUZZY_MIN_WORD or word.isdigit():
+            return set()
+        found = set()
+        for key in deletions(word) | {word}:
+            found.update(self.near.get(key, ()))
+        return {near for near in found if one_edit_apart(word, near)}
+
+    def search(self, query):
+        """Names matching the query, best first"""
+        query = query.strip().lower()
+        if not query:
+            return [name for name in self.names if name is not None]
+        words = query.split()
+        ranked = []
+
+        for i in self.containing(query):
+            name = self.lowered[i]
+            if name == query:
+                rank = 0
+            elif name.startswith(query):
+                rank = 1
+            elif f" {query}" in name:
+                rank = 2
+            else:
+                rank = 3
+            ranked.append((rank, name, i))
+        if len(words) > 1:
+            for i in self.containing(*words).difference(i for _, _, i in ranked):
+                ranked.append((3, self.lowered[i], i))
+        matched = {i for _, _, i in ranked}
+
+        # Fuzzy: names with some query word mistyped and every other word as typed
+        typo_names = {}
+        for word in set(words):
+            found = set()
+            for near in self.typo_words(word):
+                found.update(self.word_names[near])
+            if found:
+                typo_names[word] = found
+        fuzzy = []
+        if typo_names:
+            for i in set().union(*typo_names.values()) - matched:
+                name = self.lowered[i]
+                typos = 0
+                for word in words:
+                    if word in name:
+                        continue
+                    if i not in typo_names.get(word, ()):
+                        break
+                    typos += 1
+                else:
+                    # Fewer words with typos rank higher
+                    fuzzy.append((4 + typos, name, i))
+        ranked.extend(heapq.nsmallest(FUZZY_LIMIT, fuzzy))
+
+        ranked.sort()
+        return [self.names[i] for _, _, i in ranked]
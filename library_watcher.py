@@ -0,0 +1,148 @@
+import os
+import time
+import queue
+import threading
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    # Optional; without it the library is polled for changes instead
+    Observer = None
+
+# Polling fallback: seconds between checks of folder and lyrics/chords mtimes
+POLL_SECONDS = 5.0
+# Events are collected until the folder has been quiet this long...
+SETTLE_SECONDS = 0.5
+# ...or until the oldest pending change is this old, so a long copy still shows progress
+MAX_BATCH_SECONDS = 3.0
+
+
+class LibraryWatcher:
+    """Keeps the library and lyrics indexes in step with the audio directory.
+
+    File events (through watchdog, which uses inotify, ReadDirectoryChangesW or
+    FSEvents) or a periodic mtime poll are reduced to the song folders they
+    touch, and those are rescanned in batches on the watcher thread. Each batch
+    of changed song names is put on `changes` for the Tk thread to apply, so a
+    bulk copy of hundreds of folders turns into a handful of UI updates.
+    """
+
+    def __init__(self, library, lyrics_index):
+        self.library = library
+        self.lyrics_index = lyrics_index
+        self.changes = queue.Queue()
+        self.root = None
+        self.pending = set()
+        self.first_pending = None
+        self.last_event = 0.0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.observer = None
+
+    def start(self, audio_dir):
+        """Watch `audio_dir`, replacing any previous watch"""
+        self.stop()
+        self.root = os.path.abspath(audio_dir)
+        self.pending = set()
+        self.first_pending = None
+        self.stopped = threading.Event()
+        if Observer is not None:
+            try:
+                self.observer = Observer()
+                self.observer.schedule(self, self.root, recursive=True)
+                self.observer.start()
+            except Exception as e:
+                print(f"File watching unavailable, polling instead: {e}")
+                self.observer = None
+        self.thread = threading.Thread(target=self._run, args=(self.stopped,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.observer is not None:
+            try:
+                self.observer.stop()
+            except Exception:
+                pass
+            self.observer = None
+        if self.thread is not None:
+            self.stopped.set()
+            self.wake.set()
+            self.thread = None
+
+    def dispatch(self, event):
+        """watchdog callback: note which song folder the event belongs to"""
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        songs = set()
+        for path in paths:
+            if not path:
+                continue
+            relative = os.path.relpath(os.fsdecode(path), self.root)
+            song = relative.split(os.sep, 1)[0]
+            if song not in (".", "..") and not relative.startswith(".." + os.sep):
+                songs.add(song)
+        if songs:
+            with self.lock:
+                self.pending |= songs
+                now = time.monotonic()
+                self.last_event = now
+                if self.first_pending is None:
+                    self.first_pending = now
+            self.wake.set()
+
+    def _run(self, stopped):
+        while not stopped.is_set():
+            if self.observer is None:
+                self.wake.wait(POLL_SECONDS)
+                self.wake.clear()
+                if stopped.is_set():
+                    break
+                self._poll()
+                continue
+
+            self.wake.wait(SETTLE_SECONDS)
+            self.wake.clear()
+            with self.lock:
+                if not self.pending:
+                    continue
+                now = time.monotonic()
+                if (now - self.last_event < SETTLE_SECONDS
+                        and now - self.first_pending < MAX_BATCH_SECONDS):
+                    continue
+                songs = self.pending
+                self.pending = set()
+                self.first_pending = None
+            if not stopped.is_set():
+                self._apply(songs)
+
+    def _poll(self):
+        """Fallback: find changes from folder mtimes and the indexed text files' mtimes"""
+        try:
+            if self.library.audio_dir != self.root:
+                return
+            changed = set(self.library.scan())
+            if self.lyrics_index.root == self.root:
+                changed |= self.lyrics_index.stale_songs()
+        except OSError as e:
+            print(f"Library poll error: {e}")
+            return
+        if changed:
+            self._sync_lyrics(changed)
+            self.changes.put(changed)
+
+    def _apply(self, songs):
+        """Rescan the song folders named by file events"""
+        if self.library.audio_dir != self.root:
+            return
+        changed = set(self.library.update_songs(songs))
+        # Edited lyrics don't change the library entry but still need reindexing
+        self._sync_lyrics(songs)
+        if changed:
+            self.changes.put(changed)
+
+    def _sync_lyrics(self, songs):
+        try:
+            self.lyrics_index.sync(self.root, self.library.songs, songs)
+        except Exception as e:
+            print(f"Lyrics index error: {e}")
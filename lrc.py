@@ -0,0 +1,74 @@
+import re
+from bisect import bisect_right
+
+LRC_FILE = "lyrics.lrc"
+# [mm:ss], [mm:ss.xx] or [mm:ss:xx]
+TIME_TAG_PATTERN = re.compile(r"\[(\d{1,3}):(\d{1,2})(?:[.:](\d{1,3}))?\]")
+# The run of time tags a line starts with; a line can carry several for repeated lines
+LINE_TAGS_PATTERN = re.compile(r"[ \t]*(?:\[\d{1,3}:\d{1,2}(?:[.:]\d{1,3})?\][ \t]*)+")
+# [offset:+250] shifts every line 250 ms earlier
+OFFSET_PATTERN = re.compile(r"^\s*\[offset:\s*([+-]?\d+)\s*\]", re.IGNORECASE | re.MULTILINE)
+
+
+def format_timestamp(seconds):
+    """[mm:ss.xx] tag for a position"""
+    minutes, centiseconds = divmod(round(max(0.0, seconds) * 100), 6000)
+    return f"[{minutes:02d}:{centiseconds // 100:02d}.{centiseconds % 100:02d}]"
+
+
+def tag_seconds(match):
+    minutes, seconds, fraction = match.groups()
+    value = int(minutes) * 60 + int(seconds)
+    if fraction:
+        value += int(fraction) / 10 ** len(fraction)
+    return value
+
+
+def leading_tags(line):
+    """Length of the time tags at the start of a line (0 if it has none)"""
+    match = LINE_TAGS_PATTERN.match(line)
+    return match.end() if match else 0
+
+
+def has_timestamps(text):
+    return any(leading_tags(line) for line in text.split("\n"))
+
+
+class SyncedLyrics:
+    """Time-tagged lines of a lyrics text, sorted by time for lookup by position.
+
+    `lines` holds each entry's 1-based line number in the text it was parsed
+    from, so the caller can highlight it where the text is shown, and
+    `tag_ends` the column where its time tags end.
+    """
+
+    def __init__(self, times, lines, tag_ends):
+        self.times = times
+        self.lines = lines
+        self.tag_ends = tag_ends
+
+    @classmethod
+    def parse(cls, text):
+        """Entries for every line starting with time tags, or None if there are none"""
+        offset_match = OFFSET_PATTERN.search(text)
+        offset = int(offset_match.group(1)) / 1000.0 if offset_match else 0.0
+        entries = []
+        for line_number, line in enumerate(text.split("\n"), 1):
+            end = leading_tags(line)
+            if not end:
+                continue
+            for match in TIME_TAG_PATTERN.finditer(line, 0, end):
+                entries.append((max(0.0, tag_seconds(match) - offset), line_number, end))
+        if not entries:
+            return None
+        # Stable, so lines sharing a time keep their order in the text
+        entries.sort(key=lambda entry: entry[0])
+        return cls([entry[0] for entry in entries], [entry[1] for entry in entries],
+                   [entry[2] for entry in entries])
+
+    def __len__(self):
+        return len(self.times)
+
+    def index_at(self, seconds):
+        """Entry being sung at `seconds`, or -1 before the first one"""
+        return bisect_right(self.times, seconds) - 1
@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import threading
+
+DEFAULT_INDEX_FILE = "lyrics_index.json"
+INDEX_VERSION = 1
+TEXT_FILES = ("lyrics.txt", "chords.txt")
+# Characters that make up a word; '#' and '/' keep chords like C#m7 and G/B whole
+WORD_CHARS = r"\w#/'"
+TOKEN_PATTERN = re.compile(f"[{WORD_CHARS}]+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+MAX_RESULTS = 200
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def parse_query(query):
+    """Split a query into phrases: "quoted text" is one phrase, other words are one each"""
+    phrases = []
+    for quoted, word in QUERY_PATTERN.findall(query):
+        tokens = tokenize(quoted if quoted else word)
+        if tokens:
+            phrases.append(tokens)
+    return phrases
+
+
+def phrase_pattern(tokens):
+    """Regex for the lowercase tokens in order, on one line, separated only by non-word characters"""
+    gap = f"[^{WORD_CHARS}\\n]+"
+    first = re.escape(tokens[0])
+    rest = "".join(gap + re.escape(token) for token in tokens[1:])
+    # Starting with the literal word (word boundary checked behind it) lets re
+    # skip ahead with a fast substring scan; this is many times quicker
+    return re.compile(f"{first}(?<![{WORD_CHARS}]{first}){rest}(?![{WORD_CHARS}])")
+
+
+class LyricsIndex:
+    """Inverted index over every song's lyrics.txt and chords.txt.
+
+    The postings map each word to the documents containing it, so a query
+    only runs its phrase regex over documents that have every word. File
+    texts are kept in lyrics_index.json with their mtimes, so a restart only
+    rereads files that changed.
+    """
+
+    def __init__(self, index_file=DEFAULT_INDEX_FILE):
+        self.index_file = index_file
+        self.lock = threading.Lock()
+        self.root = None
+        self.docs = {}      # (song, file name) -> [mtime_ns, text]
+        self.postings = {}  # word -> set of (song, file name)
+        self.lowered = {}   # (song, file name) -> lowercase text, what queries run against
+        self.dirty = False
+
+    def _read_cache(self, root):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != INDEX_VERSION or data.get("root") != root:
+            return {}
+        return {(song, name): doc for song, name, *doc in data.get("docs", [])}
+
+    def save(self):
+        """Write the index if it changed, via a temp file"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"version": INDEX_VERSION, "root": self.root,
+                    "docs": [[song, name, *doc] for (song, name), doc in self.docs.items()]}
+            self.dirty = False
+        tmp_path = f"{self.index_file}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_file)
+        except OSError as e:
+            print(f"Failed to save lyrics index: {e}")
+
+    def sync(self, root, songs, changed=()):
+        """Bring the index in line with the library. Runs on a worker thread.
+
+        `songs` is the library index's song table; a new root is indexed in
+        full, otherwise only the `changed` songs are reread.
+        """
+        root = os.path.abspath(root)
+        if root != self.root:
+            cached = self._read_cache(root)
+            docs = {}
+            for song, entry in songs.items():
+                self._load_song(root, song, entry, cached, docs)
+            postings = {}
+            lowered = {}
+            for key, (_, text) in docs.items():
+                lowered[key] = text.lower()
+                for token in set(TOKEN_PATTERN.findall(lowered[key])):
+                    postings.setdefault(token, set()).add(key)
+            with self.lock:
+                self.root = root
+                self.docs = docs
+                self.postings = postings
+                self.lowered = lowered
+                self.dirty = docs.keys() != cached.keys() or any(
+                    docs[key][0] != cached[key][0] for key in docs)
+        else:
+            for song in changed:
+                fresh = {}
+                entry = songs.get(song)
+                if entry is not None:
+                    self._load_song(root, song, entry, self.docs, fresh)
+                with self.lock:
+                    for name in TEXT_FILES:
+                        key = (song, name)
+                        if fresh.get(key) != self.docs.get(key):
+                            self._replace(key, fresh.get(key))
+        self.save()
+
+    def _load_song(self, root, song, entry, cached, docs):
+        """Collect a song's text files, reusing cached text when the mtime matches"""
+        flags = {"lyrics.txt": entry.get("lyrics"), "chords.txt": entry.get("chords")}
+        for name in TEXT_FILES:
+            if not flags[name]:
+                continue
+            path = os.path.join(root, song, name)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                doc = cached.get((song, name))
+                if doc is None or doc[0] != mtime:
+                    with open(path, "r", encoding="utf-8", errors="replace") as f:
+                        doc = [mtime, f.read()]
+            except OSError:
+                continue
+            docs[(song, name)] = doc
+
+    def _replace(self, key, doc):
+        """Swap one document's text and postings. Caller holds the lock."""
+        old = self.docs.pop(key, None)
+        if old is not None:
+            for token in set(TOKEN_PATTERN.findall(self.lowered.pop(key))):
+                keys = self.postings.get(token)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.postings[token]
+        if doc is not None:
+            self.docs[key] = doc
+            self.lowered[key] = doc[1].lower()
+            for token in set(TOKEN_PATTERN.findall(self.lowered[key])):
+                self.postings.setdefault(token, set()).add(key)
+        self.dirty = True
+
+    def stale_songs(self):
+        """Songs whose indexed text files were modified or deleted since indexing"""
+        stale = set()
+        for (song, name), (mtime, _) in list(self.docs.items()):
+            try:
+                if os.stat(os.path.join(self.root, song, name)).st_mtime_ns == mtime:
+                    continue
+            except OSError:
+                pass
+            stale.add(song)
+        return stale
+
+    def update_file(self, song, name, text, mtime=0):
+        """Reindex one file the app just wrote"""
+        with self.lock:
+            self._replace((song, name), [mtime, text])
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Return [(song, file name, line number, line)] for lines matching the
+        first phrase, in songs that contain every phrase of the query"""
+        phrases = parse_query(query)
+        if not phrases:
+            return []
+        patterns = [phrase_pattern(tokens) for tokens in phrases]
+        results = []
+
+        with self.lock:
+            sets = [self.postings.get(token) for tokens in phrases for token in tokens]
+            if not all(sets):
+                return []
+            sets.sort(key=len)
+            candidates = sets[0].intersection(*sets[1:])
+
+            for key in sorted(candidates):
+                text = self.lowered[key]
+                if not all(pattern.search(text) for pattern in patterns[1:]):
+                    continue
+                lines = None
+                last_line = 0
+                for match in patterns[0].finditer(text):
+                    line_number = text.count("\n", 0, match.start()) + 1
+                    if line_number == last_line:
+                        continue
+                    last_line = line_number
+                    if lines is None:
+                        lines = self.docs[key][1].split("\n")
+                    results.append((key[0], key[1], line_number, lines[line_number - 1].strip()))
+                    if len(results) >= limit:
+                        return results
+        return results
@@ -0,0 +1,142 @@
+import os
+import json
+import hashlib
+import threading
+import argparse
+import numpy as np
+
+DEFAULT_CACHE_DIR = "pcm_cache"
+DEFAULT_CACHE_MB = 2048
+# Formats that are slow to decode; WAV is already raw PCM
+CACHED_FORMATS = (".mp3", ".ogg", ".flac")
+
+
+class PCMCache:
+    """Disk cache of decoded stems as raw PCM files, reopened with np.memmap.
+
+    Entries are keyed by absolute path, size, mtime and sample format, so
+    an edited file misses the cache. Samples are stored as float32 unless
+    the stems are loaded as int16. The least recently used entries are evicted once the
+    cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+
+    def handles(self, file_path):
+        """Whether this file is worth caching"""
+        return self.max_bytes > 0 and file_path.lower().endswith(CACHED_FORMATS)
+
+    def _key(self, file_path, dtype):
+        stat = os.stat(file_path)
+        ident = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{dtype}"
+        return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".pcm", base + ".json"
+
+    def load(self, file_path, dtype="float32"):
+        """Return (memmap, samplerate) for a cached file, or None on a miss"""
+        pcm_path, meta_path = self._paths(self._key(file_path, dtype))
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            data = np.memmap(pcm_path, dtype=meta["dtype"], mode="r",
+                             shape=(meta["frames"], meta["channels"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # Touch the entry so eviction sees it as recently used
+        try:
+            os.utime(pcm_path)
+        except OSError:
+            pass
+        return data, meta["samplerate"]
+
+    def store(self, file_path, data, samplerate):
+        """Write decoded samples to the cache, then evict old entries if needed"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = np.ascontiguousarray(data)
+        dtype = data.dtype.name
+        pcm_path, meta_path = self._paths(self._key(file_path, dtype))
+        meta = {
+            "source": os.path.abspath(file_path),
+            "samplerate": samplerate,
+            "frames": data.shape[0],
+            "channels": data.shape[1],
+            "dtype": dtype
+        }
+
+        # Write to temp names first so a crash never leaves a half-written entry
+        tmp_suffix = f".{threading.get_ident()}.tmp"
+        data.tofile(pcm_path + tmp_suffix)
+        os.replace(pcm_path + tmp_suffix, pcm_path)
+        with open(meta_path + tmp_suffix, "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + tmp_suffix, meta_path)
+
+        self.evict()
+
+    def _entries(self):
+        """List (last_used, size, key) for every complete entry"""
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(".pcm"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-len(".pcm")]))
+        return entries
+
+    def size(self):
+        """Total bytes of cached PCM"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self.lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(key)
+                total -= size
+
+    def purge(self):
+        """Delete every cached entry. Returns the number of bytes freed."""
+        with self.lock:
+            entries = self._entries()
+            for _, _, key in entries:
+                self._remove(key)
+            return sum(size for _, size, _ in entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the AudioMix decoded-PCM cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--purge", action="store_true", help="delete every cached stem")
+    args = parser.parse_args()
+
+    cache = PCMCache(args.cache_dir)
+    if args.purge:
+        freed = cache.purge()
+        print(f"Purged {freed / (1024 * 1024):.1f} MB from {args.cache_dir}")
+    else:
+        print(f"{args.cache_dir}: {cache.size() / (1024 * 1024):.1f} MB cached")
@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import soundfile as sf
+from audio_engine import SoundDevice, MixerEngine
+
+STEM_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg")
+OUTPUT_FORMATS = ("wav", "flac")
+# Offline chunks are much larger than the live block, since there is no latency to keep low
+DEFAULT_CHUNK = 65536
+# Frames the engine mixes at a time; a chunk is filled in blocks of this size,
+# so the per-block DSP buffers stay small whatever the file I/O chunk is
+ENGINE_BLOCK = 4096
+
+
+def parse_stem_values(pairs, option):
+    """Turn ["vocals=0.5", ...] into {"vocals": 0.5}"""
+    values = {}
+    for pair in pairs or []:
+        name, sep, value = pair.rpartition("=")
+        if not sep or not name:
+            raise SystemExit(f"{option} expects NAME=VALUE, got {pair!r}")
+        try:
+            values[name.lower()] = float(value)
+        except ValueError:
+            raise SystemExit(f"{option} value for {name!r} is not a number: {value!r}")
+    return values
+
+
+def stem_lookup(values, file_name):
+    """Find a per-stem setting by file name, with or without its extension"""
+    name = file_name.lower()
+    if name in values:
+        return values[name]
+    return values.get(os.path.splitext(name)[0])
+
+
+def load_song(song_dir, args):
+    """Decode every stem in the song folder and apply the per-stem settings"""
+    gains = parse_stem_values(args.gain, "--gain")
+    reverb_sends = parse_stem_values(args.stem_reverb, "--stem-reverb")
+    delay_sends = parse_stem_values(args.stem_delay, "--stem-delay")
+    muted = {name.lower(): True for name in args.mute or []}
+
+    stems = []
+    for file_name in sorted(os.listdir(song_dir)):
+        if not file_name.lower().endswith(STEM_EXTENSIONS):
+            continue
+        if stem_lookup(muted, file_name):
+            continue
+        stem = SoundDevice(os.path.join(song_dir, file_name))
+        gain = stem_lookup(gains, file_name)
+        stem.set_volume(1.0 if gain is None else gain)
+        send = stem_lookup(reverb_sends, file_name)
+        stem.set_reverb(args.reverb if send is None else send)
+        send = stem_lookup(delay_sends, file_name)
+        stem.set_delay(args.delay if send is None else send)
+        stem.playing = True
+        stems.append(stem)
+    return stems
+
+
+def configure_engine(engine, args):
+    """Apply the bus effect and EQ options"""
+    engine.set_reverb_room_size(args.room_size)
+    engine.set_reverb_damping(args.damping)
+    engine.set_delay_time(args.delay_time)
+    if args.bpm:
+        engine.set_delay_tempo(args.bpm, args.beats)
+    engine.set_delay_feedback(args.feedback)
+    engine.set_delay_wet(args.delay_wet)
+    engine.set_eq(low=args.eq_low, mid=args.eq_mid, high=args.eq_high)
+    engine.eq_enabled = not args.no_eq
+
+
+def mix_chunk(engine, chunk):
+    """Fill chunk with engine blocks of the stems. Returns frames mixed; fewer once the song ends."""
+    filled = 0
+    while filled < len(chunk):
+        frames = min(engine.blocksize, len(chunk) - filled)
+        written = engine.process_block(chunk[filled:filled + frames], frames)
+        filled += written
+        if written < frames:
+            break
+    return filled
+
+
+def tail_chunk(engine, chunk):
+    """Fill chunk with engine blocks of the effect tails. Returns frames rendered."""
+    filled = 0
+    while filled < len(chunk):
+        frames = min(engine.blocksize, len(chunk) - filled)
+        if not engine.process_tail(chunk[filled:filled + frames], frames):
+            break
+        filled += frames
+    return filled
+
+
+def render_song(song_dir, output_path, args):
+    """Render one song folder to an audio file. Returns (seconds of audio, peak)."""
+    stems = load_song(song_dir, args)
+    if not stems:
+        raise ValueError(f"No stems found in {song_dir}")
+
+    engine = MixerEngine(blocksize=min(args.chunk, ENGINE_BLOCK))
+    engine.load(stems)
+    configure_engine(engine, args)
+
+    subtype = args.subtype or None
+    clip = subtype not in ("FLOAT", "DOUBLE")
+    block = np.zeros((args.chunk, engine.channels), dtype=np.float32)
+    tail_frames = int(args.tail * engine.samplerate)
+    frames_written = 0
+    peak = 0.0
+
+    with sf.SoundFile(output_path, "w", samplerate=engine.samplerate,
+                      channels=engine.channels, subtype=subtype) as out:
+        while True:
+            written = mix_chunk(engine, block)
+            if written == 0:
+                break
+            peak = max(peak, float(np.abs(block[:written]).max()))
+            if clip:
+                np.clip(block, -1.0, 1.0, out=block)
+            out.write(block[:written])
+            frames_written += written
+
+        # Let the reverb and delay ring out, up to the requested tail length
+        while tail_frames > 0:
+            count = min(tail_chunk(engine, block), tail_frames)
+            if count == 0:
+                break
+            peak = max(peak, float(np.abs(block[:count]).max()))
+            if clip:
+                np.clip(block, -1.0, 1.0, out=block)
+            out.write(block[:count])
+            frames_written += count
+            tail_frames -= count
+
+    return frames_written / engine.samplerate, peak
+
+
+def output_path_for(song_dir, args, batch):
+    """Pick the output file for a song; with several songs -o names a directory"""
+    song_name = os.path.basename(os.path.normpath(song_dir))
+    if batch or not args.output or os.path.isdir(args.output):
+        directory = args.output or "."
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{song_name}.{args.format}")
+    return args.output
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Render AudioMix song folders to WAV/FLAC without a GUI or audio device")
+    parser.add_argument("songs", nargs="+", help="song folder(s) containing stems")
+    parser.add_argument("-o", "--output",
+                        help="output file, or output directory when rendering several songs")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="wav",
+                        help="file format when the output name is chosen automatically")
+    parser.add_argument("--subtype", help="soundfile subtype, e.g. PCM_16, PCM_24, FLOAT")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="frames per processing chunk")
+    parser.add_argument("--tail", type=float, default=5.0,
+                        help="maximum seconds of reverb/delay tail after the stems end")
+
+    stems = parser.add_argument_group("per-stem settings (NAME is the file name, extension optional)")
+    stems.add_argument("--gain", action="append", metavar="NAME=GAIN", help="linear stem gain, 1.0 = unchanged")
+    stems.add_argument("--mute", action="append", metavar="NAME", help="leave a stem out of the mix")
+    stems.add_argument("--stem-reverb", action="append", metavar="NAME=AMOUNT", help="reverb send for one stem")
+    stems.add_argument("--stem-delay", action="append", metavar="NAME=AMOUNT", help="delay send for one stem")
+
+    fx = parser.add_argument_group("effects")
+    fx.add_argument("--reverb", type=float, default=0.0, help="reverb send for every stem (0.0 - 1.0)")
+    fx.add_argument("--room-size", type=float, default=0.5)
+    fx.add_argument("--damping", type=float, default=0.5)
+    fx.add_argument("--delay", type=float, default=0.0, help="delay send for every stem (0.0 - 1.0)")
+    fx.add_argument("--delay-time", type=float, default=300.0, help="delay time in milliseconds")
+    fx.add_argument("--bpm", type=float, help="sync the delay time to this tempo")
+    fx.add_argument("--beats", type=float, default=1.0, help="delay length in beats when --bpm is given")
+    fx.add_argument("--feedback", type=float, default=0.35)
+    fx.add_argument("--delay-wet", type=float, default=1.0)
+    fx.add_argument("--eq-low", type=float, default=1.0, help="0.0 - 2.0, 1.0 is flat")
+    fx.add_argument("--eq-mid", type=float, default=1.0)
+    fx.add_argument("--eq-high", type=float, default=1.0)
+    fx.add_argument("--no-eq", action="store_true")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    batch = len(args.songs) > 1
+    failures = 0
+
+    for song_dir in args.songs:
+        output_path = output_path_for(song_dir, args, batch)
+        started = time.perf_counter()
+        try:
+            seconds, peak = render_song(song_dir, output_path, args)
+        except Exception as e:
+            print(f"Failed to render {song_dir}: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        elapsed = time.perf_counter() - started
+        speed = seconds / elapsed if elapsed > 0 else float("inf")
+        warning = "  (clipped)" if peak > 1.0 else ""
+        print(f"{output_path}: {seconds:.1f}s rendered in {elapsed:.1f}s "
+              f"({speed:.0f}x realtime), peak {peak:.2f}{warning}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import numpy as np
+import pytest
+
+import audio_engine
+from audio_engine import MixerEngine, SoundDevice
+
+SAMPLERATE = 44100
+BLOCK = 512
+
+
+def make_engine(seconds=1.0, level=0.5):
+    data = np.full((int(SAMPLERATE * seconds), 2), level, dtype=np.float32)
+    stem = SoundDevice.from_array(data, SAMPLERATE)
+    engine = MixerEngine(blocksize=BLOCK)
+    engine.load([stem])
+    stem.playing = True
+    return engine
+
+
+def test_seek_after_song_ended_moves_playhead():
+    engine = make_engine()
+    # The callback stopped at the end of the song but the stream is still open
+    engine.stream = object()
+    engine.playing = False
+    engine.seek(0.5)
+    assert engine.position == engine.length // 2
+    engine.stream = None
+
+
+def test_open_stream_applies_pending_seek(monkeypatch):
+    # Without sounddevice the stream fails to open after the seek is applied
+    monkeypatch.setattr(audio_engine, "sd", None)
+    engine = make_engine()
+    engine.seek_serial += 1
+    engine.seek_request = (engine.seek_serial, engine.length // 4, False)
+    with pytest.raises(RuntimeError):
+        engine._open_stream()
+    assert engine.position == engine.length // 4
+    assert engine.seek_request is None
+
+
+def test_incoming_song_feeds_the_effect_buses():
+    engine = make_engine(level=0.0)
+    data = np.full((SAMPLERATE, 2), 0.5, dtype=np.float32)
+    following = SoundDevice.from_array(data, SAMPLERATE)
+    following.set_reverb(1.0)
+    engine.queue_next([following], crossfade_seconds=0.5)
+    out = np.zeros((BLOCK, 2), dtype=np.float32)
+    for _ in range(engine.length // BLOCK):
+        engine.process_block(out, BLOCK)
+        if engine.next_song.position:
+            break
+    # Still fading in, yet already sending to the reverb
+    assert engine.song_serial == 0
+    assert engine.reverb_tail > 0
+
+
+def test_queued_song_follows_without_a_gap():
+    engine = make_engine(seconds=0.3)
+    data = np.full((SAMPLERATE, 2), 0.5, dtype=np.float32)
+    engine.queue_next([SoundDevice.from_array(data, SAMPLERATE)])
+    out = np.zeros((BLOCK, 2), dtype=np.float32)
+    for _ in range(engine.length // BLOCK + 1):
+        assert engine.process_block(out, BLOCK) == BLOCK
+        np.testing.assert_allclose(out, 0.5, atol=1e-3)
+
+
+def test_gapless_switch_when_the_song_ends_on_a_block_boundary():
+    data = np.full((20 * BLOCK, 2), 0.5, dtype=np.float32)
+    engine = MixerEngine(blocksize=BLOCK)
+    engine.load([SoundDevice.from_array(data, SAMPLERATE)])
+    engine.stems[0].playing = True
+    engine.queue_next([SoundDevice.from_array(data.copy(), SAMPLERATE)], crossfade_seconds=0.0)
+    out = np.zeros((BLOCK, 2), dtype=np.float32)
+    for _ in range(20):
+        assert engine.process_block(out, BLOCK) == BLOCK
+    assert engine.song_serial == 1
+    assert engine.position == 0
+    assert engine.process_block(out, BLOCK) == BLOCK
+    np.testing.assert_allclose(out, 0.5, atol=1e-3)
+
+
+def test_crossfaded_seek_clears_the_echoes():
+    engine = make_engine(seconds=2.0)
+    engine.stems[0].set_delay(1.0)
+    engine.set_delay_time(100.0)
+    engine.playing = True
+    out = np.zeros((BLOCK, 2), dtype=np.float32)
+    for _ in range(20):
+        engine._callback(out, BLOCK, None, None)
+    assert engine.delay.buffer.any()
+    # Seek into a silent stretch: only echoes from before the jump could sound there
+    engine.stems[0].data[engine.length // 2:] = 0
+    # With a stream open the jump is crossfaded on the audio thread
+    engine.stream = object()
+    engine.seek(0.75)
+    assert engine.seek_request is not None
+    engine._callback(out, BLOCK, None, None)
+    for _ in range(20):
+        engine._callback(out, BLOCK, None, None)
+        np.testing.assert_array_equal(out, 0.0)
+    engine.stream = None
+
+
+def test_crossfade_is_fixed_once_the_fade_is_due():
+    engine = make_engine(seconds=1.0)
+    data = np.full((SAMPLERATE, 2), 0.5, dtype=np.float32)
+    engine.queue_next([SoundDevice.from_array(data, SAMPLERATE)], crossfade_seconds=0.2)
+    assert engine.set_crossfade(0.3)
+    queued = engine.next_song
+    assert queued.crossfade_frames == len(queued.fade_in) == int(0.3 * SAMPLERATE)
+    # Inside the window the longer of the two fades would cover, the queued song stays as it is
+    engine.position = engine.length - int(0.4 * SAMPLERATE)
+    assert not engine.set_crossfade(0.5)
+    assert engine.next_song is queued
+    engine.position = engine.length - int(0.25 * SAMPLERATE)
+    assert not engine.set_crossfade(0.1)
+    assert engine.next_song is queued
+
+
+def test_finished_stems_are_handed_over_once():
+    engine = make_engine(seconds=0.1)
+    first = list(engine.stems)
+    data = np.full((SAMPLERATE, 2), 0.5, dtype=np.float32)
+    engine.queue_next([SoundDevice.from_array(data, SAMPLERATE)])
+    out = np.zeros((BLOCK, 2), dtype=np.float32)
+    while engine.song_serial == 0:
+        engine.process_block(out, BLOCK)
+    assert engine.take_finished_stems() == first
+    assert engine.take_finished_stems() == []
+
+
+def test_callback_errors_are_recorded(monkeypatch):
+    engine = make_engine()
+    engine.playing = True
+
+    def broken(outdata, frames):
+        raise RuntimeError("decoder died")
+
+    monkeypatch.setattr(engine, "process_block", broken)
+    out = np.ones((BLOCK, 2), dtype=np.float32)
+    with pytest.raises(RuntimeError):
+        engine._callback(out, BLOCK, None, None)
+    assert engine.stats.last_error == "RuntimeError('decoder died')"
+    assert not engine.playing
+    assert not out.any()
+
+
+def test_live_playback_lets_the_reverb_ring_out():
+    engine = make_engine(seconds=0.2)
+    engine.stems[0].set_reverb(1.0)
+    engine.playing = True
+    out = np.zeros((BLOCK, 2), dtype=np.float32)
+    song_blocks = -(-engine.length // BLOCK)
+    for _ in range(song_blocks):
+        assert not engine._render_callback(out, BLOCK, None)
+    # The stems are over but the reverb is still sounding
+    assert not engine._render_callback(out, BLOCK, None)
+    assert np.abs(out).max() > 1e-4
+    for _ in range(int(10 * SAMPLERATE / BLOCK)):
+        if engine._render_callback(out, BLOCK, None):
+            break
+    else:
+        pytest.fail("the tail never ended")
+    assert not engine.playing
+    assert engine.position == 0
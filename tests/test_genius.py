@@ -0,0 +1,205 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("requests")
+
+from genius import (BulkLyricsFetch, CHUNK_SIZE, FetchCancelled, GeniusClient, GeniusError,
+                    LyricsNotFound)
+
+PAGE = (
+    "<html><head><title>Artist - Song Lyrics | Genius</title></head><body>"
+    '<div data-lyrics-container="true">First line<br/>Rock &amp; roll</div>'
+    "</body></html>"
+)
+
+
+class StubGenius(BaseHTTPRequestHandler):
+    """Answers like the Genius API and song pages; behaviour is picked by path"""
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body, content_type="text/html"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        with server.lock:
+            server.hits[url.path] = server.hits.get(url.path, 0) + 1
+            hits = server.hits[url.path]
+        if url.path == "/search":
+            query = parse_qs(url.query)["q"][0]
+            server.authorization = self.headers.get("Authorization")
+            results = [] if query == "Nobody Nothing" else [
+                {"type": "artist", "result": {"url": f"{server.base}/artists/1"}},
+                {"type": "song", "result": {"url": f"{server.base}/song"}},
+            ]
+            self._reply(200, json.dumps({"response": {"hits": results}}), "application/json")
+        elif url.path == "/song":
+            self._reply(200, PAGE)
+        elif url.path == "/flaky":
+            if hits == 1:
+                self._reply(503, "busy")
+            else:
+                self._reply(200, PAGE)
+        elif url.path == "/down":
+            self._reply(503, "busy")
+        elif url.path == "/slow":
+            time.sleep(1.0)
+            self._reply(200, PAGE)
+        elif url.path == "/endless":
+            # A page that trickles in for far longer than any test waits
+            self.send_response(200)
+            self.send_header("Content-Length", str(CHUNK_SIZE * 100))
+            self.end_headers()
+            try:
+                for _ in range(100):
+                    self.wfile.write(b"x" * CHUNK_SIZE)
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except OSError:
+                pass
+        else:
+            self._reply(404, "not found")
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubGenius)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.hits = {}
+    httpd.base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_client(server, **kwargs):
+    return GeniusClient("secret", api_url=server.base, **kwargs)
+
+
+def test_fetch_searches_then_extracts_lyrics(server):
+    client = make_client(server)
+    try:
+        lyrics = client.fetch("Artist", "Song")
+    finally:
+        client.close()
+    assert server.authorization == "Bearer secret"
+    assert lyrics.startswith(f"Title: Artist - Song\nSource: {server.base}/song\n\n")
+    assert "First line" in lyrics
+    assert "Rock & roll" in lyrics
+
+
+def test_search_without_hits_is_not_found(server):
+    client = make_client(server)
+    try:
+        with pytest.raises(LyricsNotFound):
+            client.fetch("Nobody", "Nothing")
+    finally:
+        client.close()
+
+
+def test_503_is_retried(server):
+    client = make_client(server)
+    try:
+        text = client._get(f"{server.base}/flaky", threading.Event())
+    finally:
+        client.close()
+    assert "First line" in text
+    assert server.hits["/flaky"] == 2
+
+
+def test_gives_up_after_the_retries(server):
+    client = make_client(server, retries=1)
+    try:
+        with pytest.raises(GeniusError, match="503"):
+            client._get(f"{server.base}/down", threading.Event())
+    finally:
+        client.close()
+    assert server.hits["/down"] == 2
+
+
+def test_stalled_server_times_out(server):
+    client = make_client(server, timeout=(1, 0.2), retries=0)
+    started = time.monotonic()
+    try:
+        with pytest.raises(GeniusError, match="Could not reach"):
+            client._get(f"{server.base}/slow", threading.Event())
+    finally:
+        client.close()
+    assert time.monotonic() - started < 1.0
+
+
+def test_cancel_before_the_request_sends_nothing(server):
+    client = make_client(server)
+    cancelled = threading.Event()
+    cancelled.set()
+    try:
+        with pytest.raises(FetchCancelled):
+            client.fetch("Artist", "Song", cancelled=cancelled)
+    finally:
+        client.close()
+    assert server.hits == {}
+
+
+def test_cancel_during_a_download_stops_it(server):
+    client = make_client(server)
+    cancelled = threading.Event()
+    timer = threading.Timer(0.2, cancelled.set)
+    timer.start()
+    started = time.monotonic()
+    try:
+        with pytest.raises(FetchCancelled):
+            client._get(f"{server.base}/endless", cancelled)
+    finally:
+        timer.cancel()
+        client.close()
+    # The whole page would take 5 s to arrive
+    assert time.monotonic() - started < 2.0
+
+
+class StubClient:
+    """Stands in for GeniusClient in bulk jobs; fails for the titles it is told to"""
+
+    cache = None
+
+    def __init__(self, broken=()):
+        self.broken = broken
+
+    def fetch(self, artist, title, cancelled=None):
+        if title in self.broken:
+            raise ValueError("parser broke")
+        return f"Lyrics of {title}"
+
+
+def test_bulk_fetch_finishes_past_unexpected_errors(tmp_path):
+    root = tmp_path / "audio"
+    songs = {"Band - Good": {}, "Band - Broken": {}, "Band - Missing": {}}
+    (root / "Band - Good").mkdir(parents=True)
+    (root / "Band - Broken").mkdir()
+    state_file = str(tmp_path / "state.json")
+    job = BulkLyricsFetch(StubClient(broken=("Broken",)), str(root), songs, state_file=state_file)
+    job.start()
+    deadline = time.monotonic() + 5.0
+    while not job.done() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert job.done()
+    assert (root / "Band - Good" / "lyrics.txt").read_text(encoding="utf-8") == "Lyrics of Good"
+    # A parse error and an unwritable folder fail their song only, and are remembered
+    assert job.results == {"Band - Good": "saved", "Band - Broken": "failed", "Band - Missing": "failed"}
+    assert len(job.errors) == 2
@@ -0,0 +1,61 @@
+from library import FUZZY_LIMIT, TrackSearch, one_edit_apart
+
+NAMES = [
+    "Adele - Hello",
+    "Hello Nasty",
+    "Lionel Richie - Hello",
+    "Othello Overture",
+    "Queen - Love of My Life",
+    "Kool & The Gang - Ladies Night",
+]
+
+
+def test_ranks_exact_prefix_word_prefix_then_substring():
+    search = TrackSearch(NAMES + ["hello"])
+    assert search.search("hello") == [
+        "hello", "Hello Nasty", "Adele - Hello", "Lionel Richie - Hello", "Othello Overture"]
+
+
+def test_every_word_in_any_order():
+    search = TrackSearch(NAMES)
+    assert search.search("night kool") == ["Kool & The Gang - Ladies Night"]
+
+
+def test_swapped_and_missing_letters_still_match():
+    search = TrackSearch(NAMES + ["Love Night"])
+    assert search.search("lvoe nigt") == ["Love Night"]
+    assert search.search("queen lvoe") == ["Queen - Love of My Life"]
+
+
+def test_shared_words_do_not_make_everything_a_match():
+    names = [f"Artist {i:04d} - Title {i}" for i in range(2000)]
+    search = TrackSearch(names)
+    assert search.search("Artist 1234") == ["Artist 1234 - Title 1234"]
+
+
+def test_fuzzy_matches_are_capped():
+    names = [f"Band {i:04d} - Heart" for i in range(FUZZY_LIMIT * 2)]
+    search = TrackSearch(names)
+    assert len(search.search("haert")) == FUZZY_LIMIT
+
+
+def test_added_and_removed_names_match_a_fresh_build():
+    search = TrackSearch(NAMES)
+    search.search("hello")  # Queries turn the postings they use into sets
+    search.remove(["Hello Nasty", "Queen - Love of My Life"])
+    search.add(["Hello Goodbye", "Adele - Hello"])
+    fresh = TrackSearch(["Adele - Hello", "Lionel Richie - Hello", "Othello Overture",
+                         "Kool & The Gang - Ladies Night", "Hello Goodbye"])
+    for query in ("hello", "helo", "lvoe", "ladies nigt", "o"):
+        assert search.search(query) == fresh.search(query)
+    assert "Hello Nasty" not in search.search("")
+
+
+def test_one_edit_apart():
+    assert one_edit_apart("love", "lvoe")
+    assert one_edit_apart("night", "nigt")
+    assert one_edit_apart("night", "nights")
+    assert one_edit_apart("night", "light")
+    assert not one_edit_apart("night", "night")
+    assert not one_edit_apart("night", "thing")
+    assert not one_edit_apart("love", "vole")
@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+import soundfile as sf
+
+from audio_engine import MixerEngine, SoundDevice
+
+SAMPLERATE = 44100
+BLOCK = 512
+
+
+def write_tone(path, seconds=10.0):
+    t = np.arange(int(SAMPLERATE * seconds)) / SAMPLERATE
+    tone = (0.5 * np.sin(2 * np.pi * 440.0 * t)).astype(np.float32)[:, None]
+    sf.write(str(path), tone, SAMPLERATE)
+
+
+def play_blocks(engine, count):
+    """Pull blocks at roughly real-time pace; returns how many were audible"""
+    out = np.zeros((BLOCK, engine.channels), dtype=np.float32)
+    audible = 0
+    for _ in range(count):
+        engine.process_block(out, BLOCK)
+        if np.abs(out).max() > 0.1:
+            audible += 1
+        time.sleep(BLOCK / SAMPLERATE)
+    return audible
+
+
+def test_streamed_stem_recovers_after_seek_while_playing(tmp_path):
+    path = tmp_path / "tone.wav"
+    write_tone(path)
+    engine = MixerEngine(blocksize=BLOCK)
+    stem = SoundDevice(str(path), streaming=True)
+    engine.load([stem])
+    stem.playing = True
+    try:
+        assert play_blocks(engine, 100) > 90
+        # What the callback does for a seek during playback: every stem jumps
+        # while the playhead keeps advancing a block per callback
+        engine._seek_stems(engine.length // 2)
+        assert play_blocks(engine, 100) > 90
+    finally:
+        engine.load([])
+
+
+def test_streamed_stem_skips_ahead_after_short_read(tmp_path):
+    path = tmp_path / "tone.wav"
+    write_tone(path, seconds=2.0)
+    stem = SoundDevice(str(path), streaming=True)
+    try:
+        reader = stem.reader
+        deadline = time.monotonic() + 2.0
+        while reader.write_count < 4 * BLOCK and time.monotonic() < deadline:
+            time.sleep(0.001)
+        # The playhead moved on a block without reading; the buffered frames still serve it
+        chunk = reader.read(BLOCK, BLOCK)
+        assert len(chunk) == BLOCK
+        assert reader.seek_request is None
+        assert reader.base_frame + reader.read_count == 2 * BLOCK
+    finally:
+        stem.close()
@@ -0,0 +1,16 @@
+import numpy as np
+
+from waveform import BASE_BUCKET, PeakPyramid
+
+
+def test_spike_in_a_bucket_straddling_a_column_edge():
+    data = np.zeros((100 * BASE_BUCKET, 1), dtype=np.float32)
+    # 2.5 buckets per column: bucket 2 holds the end of column 0 and the start of column 1
+    spike = 2 * BASE_BUCKET + BASE_BUCKET // 4
+    data[spike] = 1.0
+    data[spike + 1] = -1.0
+    pyramid = PeakPyramid.from_blocks([data], len(data), 44100)
+    out = pyramid.envelope(40)
+    assert spike < len(data) / 40
+    np.testing.assert_array_equal(out[0], [-1.0, 1.0])
+    assert not out[3:].any()
@@ -0,0 +1,182 @@
+import os
+import threading
+import numpy as np
+import soundfile as sf
+
+# Frames per bucket of the finest level; each level above it is LEVEL_FACTOR times coarser
+BASE_BUCKET = 256
+LEVEL_FACTOR = 4
+# Stop adding levels once a level has fewer buckets than this
+MIN_LEVEL_BUCKETS = 64
+# Frames decoded per read when building from a file
+READ_FRAMES = BASE_BUCKET * 1024
+PEAKS_DIR = ".peaks"
+PEAKS_VERSION = 1
+
+
+class PeakPyramid:
+    """Min/max envelope of a stem at several resolutions.
+
+    levels[0] holds one (min, max) pair per BASE_BUCKET frames across all
+    channels; each following level merges LEVEL_FACTOR buckets of the one below.
+    Drawing at any width reads the smallest level that still has a bucket per
+    pixel, so it never goes back to the samples.
+    """
+
+    def __init__(self, levels, frames, samplerate):
+        self.levels = levels
+        self.frames = frames
+        self.samplerate = samplerate
+
+    @classmethod
+    def from_blocks(cls, blocks, frames, samplerate, scale=1.0):
+        """Build from an iterable of (n, channels) sample blocks"""
+        base = []
+        carry = None
+        for block in blocks:
+            if carry is not None:
+                block = np.concatenate((carry, block))
+            usable = len(block) - len(block) % BASE_BUCKET
+            carry = block[usable:]
+            if usable:
+                buckets = block[:usable].reshape(-1, BASE_BUCKET, block.shape[1])
+                base.append(np.stack((buckets.min(axis=(1, 2)), buckets.max(axis=(1, 2))), axis=1))
+        if carry is not None and len(carry):
+            base.append(np.array([[carry.min(), carry.max()]], dtype=carry.dtype))
+
+        level = np.concatenate(base).astype(np.float32) * scale if base else np.zeros((0, 2), np.float32)
+        levels = [level.astype(np.float16)]
+        while len(level) >= MIN_LEVEL_BUCKETS * LEVEL_FACTOR:
+            # Pad with a neutral bucket so the length divides evenly
+            pad = -len(level) % LEVEL_FACTOR
+            if pad:
+                level = np.concatenate((level, np.repeat(level[-1:], pad, axis=0)))
+            grouped = level.reshape(-1, LEVEL_FACTOR, 2)
+            level = np.stack((grouped[:, :, 0].min(axis=1), grouped[:, :, 1].max(axis=1)), axis=1)
+            levels.append(level.astype(np.float16))
+        return cls(levels, frames, samplerate)
+
+    def envelope(self, width, start=0, end=None):
+        """(width, 2) float32 min/max per column for frames start..end.
+
+        Frames past the end of the stem read as silence, so stems of different
+        lengths line up when drawn against the song length.
+        """
+        end = self.frames if end is None else end
+        out = np.zeros((width, 2), dtype=np.float32)
+        if width <= 0 or end <= start:
+            return out
+
+        frames_per_column = (end - start) / width
+        # Coarsest level whose buckets are still no wider than a column
+        level_index = 0
+        bucket = BASE_BUCKET
+        while (level_index + 1 < len(self.levels)
+               and bucket * LEVEL_FACTOR <= frames_per_column):
+            level_index += 1
+            bucket *= LEVEL_FACTOR
+        level = self.levels[level_index]
+        if not len(level):
+            return out
+
+        edges = start + np.arange(width + 1) * frames_per_column
+        first = np.clip((edges[:-1] // bucket).astype(np.int64), 0, len(level))
+        last = np.clip(np.ceil(edges[1:] / bucket).astype(np.int64), 0, len(level))
+        valid = first < last
+        if not valid.any():
+            return out
+        # reduceat covers [first[i], first[i + 1]); the extra index closes the last
+        # column. A bucket straddling a column edge starts the next column, so it
+        # is folded into this one as well. Columns past the end of the stem are
+        # zeroed afterwards.
+        indices = np.minimum(first, len(level) - 1)
+        if last[-1] < len(level):
+            indices = np.append(indices, last[-1])
+        straddling = level[np.clip(last - 1, 0, len(level) - 1)]
+        out[:, 0] = np.minimum(np.minimum.reduceat(level[:, 0], indices)[:width], straddling[:, 0])
+        out[:, 1] = np.maximum(np.maximum.reduceat(level[:, 1], indices)[:width], straddling[:, 1])
+        out[~valid] = 0.0
+        return out
+
+    def save(self, path, source_stat):
+        arrays = {f"level{i}": level for i, level in enumerate(self.levels)}
+        meta = np.array([PEAKS_VERSION, source_stat.st_size, source_stat.st_mtime_ns,
+                         self.frames, self.samplerate], dtype=np.int64)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, meta=meta, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, source_stat):
+        """Read a cached pyramid, or None if it is missing or stale"""
+        try:
+            with np.load(path) as cached:
+                meta = cached["meta"]
+                if (meta[0] != PEAKS_VERSION or meta[1] != source_stat.st_size
+                        or meta[2] != source_stat.st_mtime_ns):
+                    return None
+                count = len(cached.files) - 1
+                levels = [cached[f"level{i}"] for i in range(count)]
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(levels, int(meta[3]), int(meta[4]))
+
+
+def peaks_path(file_path):
+    """Cache file for a stem, kept in a .peaks folder inside the song folder"""
+    song_dir, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(song_dir, PEAKS_DIR, name + ".npz")
+
+
+def load_pyramid(file_path, data=None, scale=1.0):
+    """Return the stem's pyramid from the cache, building and caching it on a miss.
+
+    `data` can be the stem's already decoded samples, which saves decoding the
+    file again; otherwise the file is read in blocks. Runs on a worker thread.
+    """
+    stat = os.stat(file_path)
+    path = peaks_path(file_path)
+    pyramid = PeakPyramid.load(path, stat)
+    if pyramid is not None:
+        return pyramid
+
+    if data is not None:
+        info = sf.info(file_path)
+        blocks = (data[i:i + READ_FRAMES] for i in range(0, len(data), READ_FRAMES))
+        pyramid = PeakPyramid.from_blocks(blocks, len(data), info.samplerate, scale)
+    else:
+        with sf.SoundFile(file_path) as f:
+            blocks = f.blocks(READ_FRAMES, dtype="float32", always_2d=True)
+            pyramid = PeakPyramid.from_blocks(blocks, f.frames, f.samplerate)
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pyramid.save(path, stat)
+    except OSError as e:
+        # A read-only library still gets waveforms, just not cached ones
+        print(f"Waveform cache write error: {e}")
+    return pyramid
+
+
+def combined_envelope(pyramids, width, frames):
+    """Envelope of several stems drawn against a common length"""
+    out = np.zeros((width, 2), dtype=np.float32)
+    for pyramid in pyramids:
+        env = pyramid.envelope(width, 0, frames)
+        np.minimum(out[:, 0], env[:, 0], out=out[:, 0])
+        np.maximum(out[:, 1], env[:, 1], out=out[:, 1])
+    return out
+
+
+def envelope_points(envelope, height):
+    """Flat [x0, y0, x1, y1, ...] outline of an envelope, for one canvas polygon"""
+    width = len(envelope)
+    mid = height / 2.0
+    x = np.arange(width, dtype=np.float32)
+    points = np.empty(width * 4, dtype=np.float32)
+    # Along the top (max) left to right, then back along the bottom (min)
+    points[0:width * 2:2] = x
+    points[1:width * 2:2] = mid - envelope[:, 1] * mid
+    points[width * 2::2] = x[::-1]
+    points[width * 2 + 1::2] = mid - envelope[::-1, 0] * mid
+    return points.tolist()